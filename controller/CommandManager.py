@@ -47,6 +47,11 @@ class CommandController:
         sdb_parser.add_argument("state", choices=["true", "false"],
                                 help="Enable (true) or disable (false) database usage")
 
+        # Sframefile command (Save the frames as files or keep them in memory only)
+        sframefile_parser = subparsers.add_parser("sframefile", help="Enable or disable saving the frames as image files")
+        sframefile_parser.add_argument("state", choices=["true", "false"],
+                                       help="Save (true) or do not save (false) the frames to cache_directory")
+
         lavatar_parser = subparsers.add_parser("lavatar", help="List existing avatars")
         lmap_parser = subparsers.add_parser("lmap", help="List existing maps")
         lbrain_parser = subparsers.add_parser("lbrain", help="List existing brains")
@@ -46,6 +46,15 @@ class VisualizerEvent(Event):
         self.msg = msg
         self.map_path = map_path
 
+class FrameEvent(Event):
+    """
+    Frame Event with a frame of the simulation rendered in memory
+    """
+    def __init__(self, index: int, step: int, frame) -> None:
+        self.index = index
+        self.step = step
+        self.frame = frame
+
 class ActionStatusEvent(Event):
     """
     Status Event with a boolean status and message
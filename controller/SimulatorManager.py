@@ -11,6 +11,7 @@ class SimulatorManager:
         self.event_manager = event_manager
         self.event_manager.register(self)
         self.simulator = Simulator()
+        self.simulator.set_frame_listener(self.publish_frame)
         print("SimulatorManager is registered")
 
     def notify(self, event: Event) -> None:
@@ -60,6 +61,9 @@ class SimulatorManager:
             elif command["command"] == "sdb":
                 print("SimulatorManager received sdb command")
                 status, msg = self.set_database(command["state"] == "true")
+            elif command["command"] == "sframefile":
+                print("SimulatorManager received sframefile command")
+                status, msg = self.set_frame_files(command["state"] == "true")
 
 
 
@@ -199,17 +203,35 @@ class SimulatorManager:
             error_message = "[run] Simulator failed to start due to unset elements (missing brain, map, avatar, or task)."
             return False , error_message
         pre_animation_msg = f"[run] The task took {virtual_time} seconds of simulate time to finish.\n"
+        if not self.simulator.destination_reachable:
+            pre_animation_msg += (f"[run] The destination is not connected to the start, "
+                                  f"only {self.simulator.start_component_size} grids are reachable.\n")
         pre_animation_msg += f"[run] Task {'completed' if running_result else 'failed'}, starting processing animation... (Animation will depends on the max frame limitation)\n"
         pre_animation_msg += f"[run] Estimated duration: ~{estimated_time} seconds."
         self.event_manager.post_event(ActionStatusEvent(is_running,pre_animation_msg, "run_simulator"))
-        self.simulator.process_simulation_output()
-        success_msg = "[run] Simulator finished successfully, start to animate the process."
-        #result_msg = "[run] Task completed." if running_result else "[move] Task failed."
+        # The animation starts with the first frame published, the step log is already exported
         self.event_manager.post_event(
             VisualizerEvent("animation", self.simulator.target_map)
         )
+        self.simulator.process_simulation_output()
+        success_msg = "[run] Simulator finished successfully, the animation shows the process."
+        #result_msg = "[run] Task completed." if running_result else "[move] Task failed."
         return True, success_msg
 
+    def publish_frame(self, index: int, step: int, frame) -> None:
+        """
+        Post a frame rendered by the simulator to the visualizer.
+        """
+        self.event_manager.post_event(FrameEvent(index, step, frame))
+
+    def set_frame_files(self, enabled: bool) -> (bool, str):
+        self.simulator.set_frame_files(enabled)
+        if enabled:
+            message = "[sframefile] Frames will be saved to cache_directory and shown from memory."
+        else:
+            message = "[sframefile] Frames will only be shown from memory, no frame files are saved."
+        return True, message
+
 
 
     def set_database(self, database_available: bool) -> (bool, str):
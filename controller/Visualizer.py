@@ -8,6 +8,7 @@ from view.MainPage import *
 from view.TaskBarWidget import *
 import time
 import os
+import queue
 
 class Visualizer(QObject):
     """
@@ -18,6 +19,9 @@ class Visualizer(QObject):
     update_minimap_signal = pyqtSignal(str)
     start_visualizer_signal = pyqtSignal()
 
+    # Frames waiting for the main map; when it is full the oldest frame is dropped so the simulation never waits
+    frame_queue_size = 32
+
     def __init__(self, event_manager: EventManager) -> None:
         super().__init__()
         self.event_manager = event_manager
@@ -54,6 +58,12 @@ class Visualizer(QObject):
         self.update_minimap_signal.connect(self.main_page.update_minimap)
         self.start_visualizer_signal.connect(self.main_page.start_visualizer)
 
+        # In-memory frames from the simulator to the main map
+        self.frame_queue = queue.Queue(maxsize=self.frame_queue_size)
+        self.main_page.set_frame_queue(self.frame_queue)
+        # Set on the GUI thread once the main page is shown, read by queue_frame on the simulation thread
+        self.main_page_shown = False
+
     #TaskBar Singals
     def list_avatar(self):
         self.event_manager.post_event(SimulatorEvent({"command": "lavatar"}))
@@ -114,6 +124,41 @@ class Visualizer(QObject):
     def set_max_frame(self, max_frame):
         self.event_manager.post_event(SimulatorEvent({"command": "smaxframe", "frame_count": max_frame}, task_bar=True))
 
+    def queue_frame(self, event: FrameEvent) -> None:
+        """
+        Queue a frame published by the simulator for the main map. It is called on the simulation thread,
+        which converts and scales the frame, so the timer of the main page only has to show it.
+        When the animation is behind and the queue is full, the oldest frame is dropped and reported
+        in the command prompt, so the simulation never waits for the main page.
+        """
+        if not self.main_page_shown:
+            return
+        image = self.main_page.main_map.frame_to_image(event.frame)
+        try:
+            self.frame_queue.put_nowait((event.step, image))
+            return
+        except queue.Full:
+            pass
+        try:
+            dropped_step, _ = self.frame_queue.get_nowait()
+        except queue.Empty:
+            dropped_step = None
+        self.frame_queue.put_nowait((event.step, image))
+        if dropped_step is not None:
+            self.event_manager.post_event(ActionStatusEvent(
+                False, f"[run] The animation is behind, the frame of step {dropped_step} was dropped.",
+                "run_simulator"))
+
+    def clear_frame_queue(self) -> None:
+        """
+        Drop the frames of a previous run that were not shown yet.
+        """
+        while True:
+            try:
+                self.frame_queue.get_nowait()
+            except queue.Empty:
+                return
+
     def on_start(self):
         """
         Receive Start Signal from WelcomePage, and start the main page
@@ -121,6 +166,7 @@ class Visualizer(QObject):
         print("Visualizer is starting")
         self.window.close()
         self.main_page.show()
+        self.main_page_shown = True
 
     def execute_command(self, command: str) -> None:
         """
@@ -181,8 +227,11 @@ class Visualizer(QObject):
                 elif event.action_name == "stask":
                     self.main_page.taskbar.set_task(event.msg)
 
+        elif isinstance(event, FrameEvent):
+            self.queue_frame(event)
         elif isinstance(event, VisualizerEvent):
             if event.msg == "animation":
+                self.clear_frame_queue()
                 self.start_visualizer_signal.emit()  # via signal to prevent the timer started from other thread
             elif event.msg == "minimap":
                 if event.map_path in ["Louth_Crater_Normal", "Louth_Crater_Sharp"]:
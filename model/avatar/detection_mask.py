@@ -10,7 +10,10 @@ class DetectionMask:
         :param avatar_id: The ID of the Avatar for which the detection mask is calculated.
         """
         self.avatar_id = avatar_id
-        self.detectable_positions = set()
+        # The set of detectable offsets, built from stencil on first use by detectable_positions
+        self._detectable_positions = None
+        self.mask_range = 0
+        self.stencil = np.zeros((1, 1), dtype=bool)
         self.database_available = database_available
 
         if self.database_available:
@@ -51,49 +54,104 @@ class DetectionMask:
     def generate_mask(self):
         """
         Generate the detection mask based on sensors' range, field of view, and direction.
-        All detectable positions (dx, dy) are stored in self.detectable_positions.
+        stencil is the union of the sensors' stencils, centred on the Avatar:
+        stencil[dx + mask_range, dy + mask_range] is True when the offset (dx, dy) is detectable.
+        The set of detectable positions (dx, dy) is only built when detectable_positions is read.
         """
-        self.detectable_positions.clear()
+        self.mask_range = max([int(sensor.get_range()) for sensor in self.sensors], default=0)
+        self.stencil = np.zeros((2 * self.mask_range + 1, 2 * self.mask_range + 1), dtype=bool)
         for sensor in self.sensors:
             detection_range = int(sensor.get_range())
-            fov = sensor.get_fov()
-            direction = sensor.get_direction()
+            stencil = self.sensor_stencil(detection_range, sensor.get_fov(), sensor.get_direction())
+            offset = self.mask_range - detection_range
+            self.stencil[offset:offset + stencil.shape[0], offset:offset + stencil.shape[1]] |= stencil
+        self._detectable_positions = None
 
-            for dx in range(-detection_range, detection_range + 1):
-                for dy in range(-detection_range, detection_range + 1):
-                    distance = np.sqrt(dx ** 2 + dy ** 2)
-                    if distance <= detection_range:
-                        angle = np.degrees(np.arctan2(dy, dx)) % 360
+    @property
+    def detectable_positions(self):
+        """
+        All detectable positions (dx, dy) as a set, derived from the stencil the first time
+        they are read after generate_mask(). Sensing only uses the stencil.
+        """
+        if self._detectable_positions is None:
+            offset_x, offset_y = np.nonzero(self.stencil)
+            self._detectable_positions = set(zip((offset_x - self.mask_range).tolist(),
+                                                 (offset_y - self.mask_range).tolist()))
+        return self._detectable_positions
 
-                        min_angle = (direction - fov / 2) % 360
-                        max_angle = (direction + fov / 2) % 360
+    # Stencils of every (range, fov, direction) seen in this process, shared by all sensors alike
+    stencil_cache = {}
+
+    @classmethod
+    def sensor_stencil(cls, detection_range, fov, direction):
+        """
+        Return the read-only boolean stencil of one sensor, computed once per (range, fov, direction).
+        stencil[dx + detection_range, dy + detection_range] is True when (dx, dy) is within the range
+        and the field of view, the angle of (dx, dy) being measured from the x axis towards y.
+        """
+        key = (detection_range, fov, direction)
+        if key not in cls.stencil_cache:
+            offsets = np.arange(-detection_range, detection_range + 1)
+            dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+            distance = np.sqrt(dx ** 2 + dy ** 2)
+            angle = np.degrees(np.arctan2(dy, dx)) % 360
 
-                        if min_angle < max_angle:
-                            in_fov = min_angle <= angle <= max_angle
-                        else:
-                            in_fov = angle >= min_angle or angle <= max_angle
+            min_angle = (direction - fov / 2) % 360
+            max_angle = (direction + fov / 2) % 360
+            if min_angle < max_angle:
+                in_fov = (angle >= min_angle) & (angle <= max_angle)
+            else:
+                in_fov = (angle >= min_angle) | (angle <= max_angle)
 
-                        if in_fov:
-                            self.detectable_positions.add((dx, dy))
+            stencil = (distance <= detection_range) & in_fov
+            stencil.setflags(write=False)
+            cls.stencil_cache[key] = stencil
+        return cls.stencil_cache[key]
 
-    def apply_mask(self, detect_map, full_map, x, y):
+    def apply_mask(self, detect_map, full_map, x, y, known_mask=None):
         """
         Apply the detection mask to the full map, updating detect_map.
-        :param detect_map: 2D array to store detection results.
+        :param detect_map: 2D float array to store detection results.
         :param full_map: The full 2D map array.
         :param x: The Avatar's current X coordinate.
         :param y: The Avatar's current Y coordinate.
-        :return: The updated detect_map.
+        :param known_mask: Optional 2D boolean array, revealed cells are set to True.
+        :return: (the updated detect_map, number of cells revealed by this call).
+                 Without known_mask every detected cell counts as revealed.
+        """
+        indices, _ = self.reveal(detect_map, full_map, x, y, known_mask)
+        return detect_map, len(indices)
+
+    def reveal(self, detect_map, full_map, x, y, known_mask=None):
+        """
+        Apply the detection mask like apply_mask and return what changed.
+        The stencil is clipped to the part of the map around (x, y) and the detected cells
+        are copied with one masked assignment.
+        :return: (flat indices, values) of the cells revealed by this call, in row-major order;
+                 the indices address detect_map.flat and the values are the copied elevations.
+                 Without known_mask every detected cell counts as revealed.
         """
-        rows, cols = len(full_map), len(full_map[0])
+        full_map = np.asarray(full_map)
+        rows, cols = full_map.shape
+        top, left = x - self.mask_range, y - self.mask_range
+        row0, row1 = max(0, top), min(rows, x + self.mask_range + 1)
+        col0, col1 = max(0, left), min(cols, y + self.mask_range + 1)
+        if row0 >= row1 or col0 >= col1:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=detect_map.dtype)
 
-        for dx, dy in self.detectable_positions:
-            new_x, new_y = x + dx, y + dy
-            if 0 <= new_x < rows and 0 <= new_y < cols:
-                if full_map[new_x][new_y] is not None:
-                    detect_map[new_x][new_y] = full_map[new_x][new_y]
+        stencil = self.stencil[row0 - top:row1 - top, col0 - left:col1 - left]
+        window = (slice(row0, row1), slice(col0, col1))
+        if known_mask is not None:
+            revealed = stencil & ~known_mask[window]
+            known_mask[window] |= revealed
+        else:
+            revealed = stencil
 
-        return detect_map
+        values = full_map[window][revealed].astype(detect_map.dtype, copy=False)
+        detect_map[window][revealed] = values
+        revealed_rows, revealed_cols = np.nonzero(revealed)
+        indices = (revealed_rows + row0).astype(np.int64) * cols + (revealed_cols + col0)
+        return indices, values
 
     def refresh_sensors(self):
         """
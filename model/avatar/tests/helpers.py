@@ -0,0 +1,20 @@
+from model.avatar.avatar import Avatar
+from model.avatar.sensor import Sensor
+from model.simulator.environment import Environment
+
+
+def make_test_avatar(name, sensor_range=2, battery_consumption=0, energy_recharge_rate=20):
+    """
+    Build an off-database avatar with a single 360-degree sensor, its slope limit set for the default Environment.
+    :param name: Prefix of the avatar and sensor names, like "Planning" for PlanningBot and PlanningRadar.
+    """
+    sensor = Sensor(name=f"{name}Radar", range_=sensor_range, fov=360, battery_consumption=battery_consumption,
+                    description=f"Radar for {name.lower()} tests", direction=0, database_available=False)
+    avatar = Avatar(name=f"{name}Bot", weight=80, material="Titanium Alloy",
+                    description=f"Bot for {name.lower()} tests", battery_capacity=200,
+                    battery_consumption_rate=5, driving_force=280, speed=1,
+                    energy_recharge_rate=energy_recharge_rate, sensors=[sensor], database_available=False)
+    avatar.bind_sensor(sensor)
+    environment = Environment()
+    avatar.calculate_max_slope_difference(environment.get_friction(), environment.get_gravity(), 10)
+    return avatar
@@ -0,0 +1,116 @@
+import unittest
+
+import numpy as np
+
+from model.avatar.detection_mask import DetectionMask
+from model.avatar.sensor import Sensor
+
+
+def make_sensor(range_, fov, direction):
+    return Sensor(name=f"Stencil_{range_}_{fov}_{direction}", range_=range_, fov=fov, battery_consumption=1,
+                  description="Sensor for stencil tests", direction=direction, database_available=False)
+
+
+def scalar_positions(detection_range, fov, direction):
+    """The detectable offsets of one sensor, one offset at a time"""
+    positions = set()
+    for dx in range(-detection_range, detection_range + 1):
+        for dy in range(-detection_range, detection_range + 1):
+            if np.sqrt(dx ** 2 + dy ** 2) <= detection_range:
+                angle = np.degrees(np.arctan2(dy, dx)) % 360
+                min_angle = (direction - fov / 2) % 360
+                max_angle = (direction + fov / 2) % 360
+                if min_angle < max_angle:
+                    in_fov = min_angle <= angle <= max_angle
+                else:
+                    in_fov = angle >= min_angle or angle <= max_angle
+                if in_fov:
+                    positions.add((dx, dy))
+    return positions
+
+
+class TestDetectionMaskStencil(unittest.TestCase):
+
+    def test_stencil_matches_scalar_positions(self):
+        """Test the vectorized stencil against the per-offset range and field of view check"""
+        for detection_range, fov, direction in [(5, 360, 0), (7, 90, 45), (6, 120, 330), (4, 180, 270), (0, 360, 0)]:
+            detection_mask = DetectionMask(avatar_id=None, database_available=False)
+            detection_mask.refresh_sensors_without_database([make_sensor(detection_range, fov, direction)])
+            self.assertEqual(detection_mask.detectable_positions, scalar_positions(detection_range, fov, direction))
+
+    def test_stencil_union_of_sensors(self):
+        """Test several sensors combine into one stencil centred on the avatar"""
+        detection_mask = DetectionMask(avatar_id=None, database_available=False)
+        detection_mask.refresh_sensors_without_database([make_sensor(3, 360, 0), make_sensor(6, 60, 90)])
+
+        self.assertEqual(detection_mask.stencil.shape, (13, 13))
+        self.assertEqual(detection_mask.detectable_positions,
+                         scalar_positions(3, 360, 0) | scalar_positions(6, 60, 90))
+
+    def test_detectable_positions_built_on_demand(self):
+        """Test the set of detectable positions is only built when read and follows a new mask"""
+        detection_mask = DetectionMask(avatar_id=None, database_available=False)
+        self.assertEqual(detection_mask.detectable_positions, set())
+
+        detection_mask.refresh_sensors_without_database([make_sensor(40, 360, 0)])
+        self.assertIsNone(detection_mask._detectable_positions)
+        detect_map = np.zeros((10, 10), dtype=np.float32)
+        detection_mask.apply_mask(detect_map, np.ones((10, 10), dtype=np.float32), 5, 5)
+        self.assertIsNone(detection_mask._detectable_positions)
+
+        self.assertEqual(detection_mask.detectable_positions, scalar_positions(40, 360, 0))
+        detection_mask.refresh_sensors_without_database([make_sensor(2, 90, 0)])
+        self.assertEqual(detection_mask.detectable_positions, scalar_positions(2, 90, 0))
+
+    def test_apply_mask_clips_to_map(self):
+        """Test apply_mask against revealing every detectable offset inside the map one at a time"""
+        detection_mask = DetectionMask(avatar_id=None, database_available=False)
+        detection_mask.refresh_sensors_without_database([make_sensor(4, 360, 0), make_sensor(7, 90, 0)])
+        full_map = np.arange(15 * 12, dtype=np.float32).reshape(15, 12) + 1
+        detect_map = np.zeros_like(full_map)
+        known_mask = np.zeros(full_map.shape, dtype=bool)
+
+        for x, y in [(0, 0), (14, 11), (7, 5), (7, 6), (2, 10)]:
+            known_before = np.count_nonzero(known_mask)
+            expected_known = known_mask.copy()
+            for dx, dy in detection_mask.detectable_positions:
+                if 0 <= x + dx < 15 and 0 <= y + dy < 12:
+                    expected_known[x + dx, y + dy] = True
+
+            detect_map, revealed = detection_mask.apply_mask(detect_map, full_map, x, y, known_mask)
+            self.assertEqual(revealed, np.count_nonzero(expected_known) - known_before)
+            np.testing.assert_array_equal(known_mask, expected_known)
+            np.testing.assert_array_equal(detect_map, np.where(known_mask, full_map, 0))
+
+        _, revealed = detection_mask.apply_mask(detect_map, full_map, 7, 5, known_mask)
+        self.assertEqual(revealed, 0)
+
+    def test_reveal_returns_delta(self):
+        """Test reveal returns exactly the cells that became known, with their values"""
+        detection_mask = DetectionMask(avatar_id=None, database_available=False)
+        detection_mask.refresh_sensors_without_database([make_sensor(5, 360, 0)])
+        full_map = np.arange(20 * 20, dtype=np.float32).reshape(20, 20) + 1
+        detect_map = np.zeros_like(full_map)
+        known_mask = np.zeros(full_map.shape, dtype=bool)
+
+        for x, y in [(3, 3), (4, 3), (4, 4), (19, 0)]:
+            known_before = known_mask.copy()
+            indices, values = detection_mask.reveal(detect_map, full_map, x, y, known_mask)
+            np.testing.assert_array_equal(indices, np.flatnonzero(known_mask & ~known_before))
+            np.testing.assert_array_equal(values, full_map.flat[indices])
+
+        indices, values = detection_mask.reveal(detect_map, full_map, 4, 4, known_mask)
+        self.assertEqual(len(indices), 0)
+        self.assertEqual(len(values), 0)
+
+    def test_stencil_shared_between_sensors(self):
+        """Test identical sensors share one read-only stencil"""
+        first = DetectionMask.sensor_stencil(8, 270, 15)
+        second = DetectionMask.sensor_stencil(8, 270, 15)
+
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,13 @@ from .brain import Brain
 from .brain_greedy import BrainGreedy
 from .brain_Astar import BrainAStar
 from .brain_DFS import BrainDFS
+from .brain_planning import PlanningBrain
+from .brain_Astar_planner import BrainAStarPlanner
+from .brain_dial import BrainDial
+from .brain_dstar_lite import BrainDStarLite
+from .brain_hpa import BrainHPAStar
 
 
 #from .brain_Astar import BrainAStar
 #__all__ = ["Brain", "BrainTest", "BrainGreedy", "BrainAStar"]
-__all__ = ["Brain",  "BrainGreedy", "BrainAStar", "BrainDFS"]
\ No newline at end of file
+__all__ = ["Brain",  "BrainGreedy", "BrainAStar", "BrainDFS", "PlanningBrain", "BrainAStarPlanner", "BrainDial", "BrainDStarLite", "BrainHPAStar"]
\ No newline at end of file
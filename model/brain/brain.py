@@ -1,31 +1,85 @@
 # model/brain.py
 from abc import ABC, abstractmethod
 
-from model.simulator import Log, Task, Environment
+import numpy as np
+
+from model.simulator import Trail, TrailJournal, Task, Environment, TraversabilityMap, CostModel, EnergyModel, DistanceField, ClusterGraph
 from model.avatar import Avatar
 
 # The abstract class for Brain
 class Brain(ABC):
+    # Brains that can take a DistanceField of their destination from the Simulator
+    uses_distance_field = False
+    # Brains that can take the ClusterGraph of the map from the Simulator
+    uses_cluster_graph = False
+
     def __init__(self):
-        self.task_trail = []
-        self.detect_map = []
+        self.task_trail = Trail()
+        self.detect_map = np.empty((0, 0), dtype=np.float32)
+        self.known_mask = np.empty((0, 0), dtype=bool)
+        # (flat indices, values) of the grids revealed since the last logged step
+        self.step_reveals = []
         self.original_map = []
         self.current_task = None
         self.current_avatar = None
         self.current_environment = None
+        self.traversability = None
+        self.cost_model = None
+        self.energy_model = None
+        self.distance_field = None
+        self.cluster_graph = None
+        self.energy = 0
         self.time = 0
+        # Where the trail of each run is journaled as it is recorded, None for no journal
+        self.journal_path = None
 
     def set_original_map(self, original_map):
         self.original_map = original_map
+        self.traversability = None
+        self.cost_model = None
+        self.distance_field = None
+        self.cluster_graph = None
 
     def set_task(self, task: Task):
         self.current_task = task
+        self.distance_field = None
 
     def set_avatar(self, avatar: Avatar):
         self.current_avatar = avatar
+        self.traversability = None
+        self.cost_model = None
+        self.distance_field = None
+        self.cluster_graph = None
 
     def set_environment(self, environment: Environment):
         self.current_environment = environment
+        self.traversability = None
+        self.distance_field = None
+        self.cluster_graph = None
+
+    def set_traversability(self, traversability: TraversabilityMap):
+        """
+        Use a TraversabilityMap prepared by the Simulator for the current map, avatar and environment.
+        """
+        self.traversability = traversability
+
+    def set_cost_model(self, cost_model: CostModel):
+        """
+        Use a CostModel prepared by the Simulator for the current map and avatar.
+        """
+        self.cost_model = cost_model
+
+    def set_distance_field(self, distance_field: DistanceField):
+        """
+        Use a DistanceField prepared by the Simulator for the destination of the current task.
+        """
+        self.distance_field = distance_field
+
+    def set_cluster_graph(self, cluster_graph: ClusterGraph):
+        """
+        Use a ClusterGraph prepared by the Simulator for the current map, avatar and environment.
+        """
+        self.cluster_graph = cluster_graph
 
     def is_ready_to_run(self):
 
@@ -33,16 +87,153 @@ class Brain(ABC):
             return False
         return True
 
+    def set_journal_path(self, journal_path):
+        self.journal_path = journal_path
+
     def get_trail(self):
         return self.task_trail
 
+    def init_detect_map(self):
+        """
+        Reset the detect map to an all-unknown state with the shape of the original map, and start a new trail,
+        journaled to journal_path when it is set.
+        detect_map holds the revealed elevations, known_mask marks which cells have been revealed.
+        """
+        shape = np.shape(self.original_map)
+        self.detect_map = np.zeros(shape, dtype=np.float32)
+        self.known_mask = np.zeros(shape, dtype=bool)
+        self.step_reveals = []
+        # Close the journal of the previous trail before the new one reopens the file
+        self.task_trail.close_journal()
+        journal = TrailJournal(self.journal_path, shape) if self.journal_path is not None else None
+        self.task_trail = Trail(shape, journal=journal)
+
+    def sense(self, detection_mask, x, y):
+        """
+        Reveal the grids the sensors see from (x, y) into detect_map and known_mask.
+        :return: flat indices of the grids revealed by this call.
+        """
+        indices, values = detection_mask.reveal(self.detect_map, self.original_map, x, y, self.known_mask)
+        self.record_reveal(indices, values)
+        return indices
+
+    def reveal_cell(self, x, y):
+        """
+        Reveal a single grid the avatar touches without its sensors seeing it.
+        """
+        if self.known_mask[x, y]:
+            return
+        self.detect_map[x, y] = self.original_map[x, y]
+        self.known_mask[x, y] = True
+        rows, cols = self.known_mask.shape
+        self.record_reveal(np.array([x * cols + y], dtype=np.int64), self.detect_map[x, y:y + 1].copy())
+
+    def record_reveal(self, indices, values):
+        """
+        Called with every non-empty batch of revealed grids, subclasses extend it to update incrementally.
+        """
+        if len(indices):
+            self.step_reveals.append((indices, values))
+
+    def take_step_reveals(self):
+        """
+        Return the (flat indices, values) of all grids revealed since the previous call and forget them.
+        """
+        reveals, self.step_reveals = self.step_reveals, []
+        if not reveals:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=self.detect_map.dtype)
+        if len(reveals) == 1:
+            return reveals[0]
+        return (np.concatenate([indices for indices, _ in reveals]),
+                np.concatenate([values for _, values in reveals]))
+
+    def init_terrain_models(self):
+        """
+        Build the terrain models the brain needs when the Simulator did not provide them.
+        """
+        if self.traversability is None:
+            self.traversability = TraversabilityMap(self.original_map, self.current_avatar.max_slope)
+        if self.cost_model is None:
+            self.cost_model = CostModel(self.original_map, self.current_avatar.calculate_time_per_grid())
+
+    def init_energy(self):
+        """
+        Build the EnergyModel of the current avatar and environment and start with a full battery.
+        """
+        self.energy_model = EnergyModel(self.current_avatar, self.current_environment)
+        self.energy = self.energy_model.capacity
 
+    def spend_energy(self, amount, duration):
+        """
+        Pay the energy of one step and advance the time by its duration plus any recharge time.
+        :return: False when the avatar is stranded because the battery cannot recharge.
+        """
+        result = self.energy_model.consume(self.energy, amount)
+        if result is None:
+            print("The battery is empty and cannot recharge, task failed")
+            return False
+        self.energy, recharge_time = result
+        self.time += recharge_time + duration
+        return True
+
+    # Determine whether the position is movable, only revealed grids can be moved between
+    def movable(self, avatar_x, avatar_y, target_x, target_y):
+        if not (self.known_mask[avatar_x, avatar_y] and self.known_mask[target_x, target_y]):
+            return False
+        return self.traversability.can_move(avatar_x, avatar_y, target_x, target_y)
+
+    # The time needed to move to a neighbouring grid
+    def cost(self, avatar_x, avatar_y, target_x, target_y):
+        return self.cost_model.cost(avatar_x, avatar_y, target_x, target_y)
+
+    def log_step(self, x, y):
+        """
+        Record the current position, time, energy and the grids revealed since the previous step
+        in the trail, which rebuilds the detect map of any step from these deltas.
+        :return: the Log of the recorded step, for steps() to yield.
+        """
+        revealed_indices, revealed_values = self.take_step_reveals()
+        self.task_trail.record(x, y, self.time, self.energy, revealed_indices, revealed_values)
+        return self.task_trail[-1]
+
+    def start_trail(self):
+        """
+        Reveal and log only the start position, used when the task is known to be unreachable.
+        """
+        x, y = self.current_task.start_row, self.current_task.start_col
+        self.sense(self.current_avatar.get_detection_mask(), x, y)
+        self.log_step(x, y)
+        return self.task_trail
 
     @abstractmethod
-    def run(self):
+    def steps(self):
+        """
+        Run the current task as a generator: yield the Log of every step as soon as it is recorded,
+        so a consumer can export or render the run while it goes, and finish with (trail, success).
+        """
         pass
 
+    def run(self):
+        """
+        Run the current task to the end.
+        :return: (trail, success)
+        """
+        return self.run_to_end(self.steps())
+
+    @staticmethod
+    def run_to_end(steps):
+        """
+        Exhaust a steps() generator and return the (trail, success) it finishes with.
+        """
+        while True:
+            try:
+                next(steps)
+            except StopIteration as finished:
+                return finished.value
+
     def reset(self):
-        self.task_trail.clear()
         self.time = 0
-        self.detect_map = [[0 for _ in range(len(self.original_map[0]))] for _ in range(len(self.original_map))]
+        self.init_detect_map()
+        self.init_terrain_models()
+        self.init_energy()
+        return True
@@ -1,26 +1,20 @@
 #from model.fake import Log, Task, Environment, Avatar, DetectionMask
-import math
-
-from model.simulator import Simulator, Task, Environment, Log
-from model.avatar import Avatar, DetectionMask
 from . import Brain
-import time as Time
 import heapq  # priority queue
 
 class BrainAStar(Brain):
-    def run(self):
+    def steps(self):
         if not self.current_task:
             return [], False
 
         start = (self.current_task.start_row, self.current_task.start_col)
         end = (self.current_task.des_row, self.current_task.des_col)
 
-        self.detect_map = [[0 for _ in range(len(self.original_map[0]))] for _ in range(len(self.original_map))]
+        self.init_detect_map()
+        self.init_terrain_models()
         detection_mask = self.current_avatar.get_detection_mask()
 
-        energy = self.current_avatar.battery_capacity
-        max_energy = energy
-        energy_recharge = self.current_avatar.energy_recharge_rate
+        self.init_energy()
 
         def is_adjacent(x1, y1, x2, y2):
             return (abs(x1 - x2) + abs(y1 - y2)) == 1
@@ -65,9 +59,7 @@ class BrainAStar(Brain):
             #if find the end
             if (x, y) == end:
                 print("The destination is reachable, task succeeded")
-                log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map],
-                                time=self.time, energy=energy)
-                self.task_trail.append(log_entry)
+                yield self.log_step(x, y)
                 return self.task_trail, True
 
             if (x, y) in visited:
@@ -76,12 +68,10 @@ class BrainAStar(Brain):
             visited.add((x, y))
 
 
-            self.detect_map = detection_mask.apply_mask(self.detect_map, self.original_map, x, y)
+            self.sense(detection_mask, x, y)
 
             #update log
-            log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map],
-                            time=self.time, energy=energy)
-            self.task_trail.append(log_entry)
+            yield self.log_step(x, y)
 
             #is dead end?
             is_dead_end = True
@@ -118,16 +108,12 @@ class BrainAStar(Brain):
                     path.pop()
                     #update coordinates
                     x, y = last_x, last_y
-                    log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map],
-                                    time=self.time, energy=energy)
-                    self.task_trail.append(log_entry)
+                    yield self.log_step(x, y)
 
                 #record coordinates
                 if path:
                     x, y = path[-1]
-                log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map],
-                                time=self.time, energy=energy)
-                self.task_trail.append(log_entry)
+                yield self.log_step(x, y)
 
                 current_x = x
                 current_y = y
@@ -159,31 +145,11 @@ class BrainAStar(Brain):
                     )
 
                     #some updates
-                    energy -= (self.cost(x, y, nx, ny) + 1)
-                    self.time += (self.cost(x, y, nx, ny) + 1)
-
-                    if energy <= 0:
-                        while energy < max_energy:
-                            energy += energy_recharge
-                            self.time += 1
-                        energy = max_energy
+                    cost = self.cost(x, y, nx, ny)
+                    if not self.spend_energy(cost + 1, cost + 1):
+                        return self.task_trail, False
 
 
         #if cant find the end
         print("The destination is unreachable, task failed")
         return self.task_trail, False
-
-
-    def movable(self, avatar_x, avatar_y, target_x, target_y):
-        return self.current_avatar.get_movable(self.detect_map[avatar_x][avatar_y], self.detect_map[target_x][target_y])
-
-    def cost(self, avatar_x, avatar_y, target_x, target_y):
-        base_time = self.current_avatar.calculate_time_per_grid()
-        elevation_difference = abs(self.detect_map[avatar_x][avatar_y] - self.detect_map[target_x][target_y])
-        distance = 10
-        slope_factor = 1.0
-
-        # Calculate the actual time required based on elevation difference
-        actual_time = base_time * (1 + slope_factor * (elevation_difference / distance))
-
-        return math.ceil(actual_time)
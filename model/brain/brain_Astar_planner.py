@@ -0,0 +1,75 @@
+import heapq  # priority queue
+
+import numpy as np
+
+from .brain_planning import PlanningBrain
+
+
+# A* on parent-pointer arrays: every grid keeps only the flat index of its predecessor,
+# so a push costs O(1) instead of copying the whole path.
+class BrainAStarPlanner(PlanningBrain):
+    uses_distance_field = True
+
+    def plan(self, start_x, start_y, end_x, end_y):
+        rows, cols = self.detect_map.shape
+        start = start_x * cols + start_y
+        goal = end_x * cols + end_y
+        heuristic = self.heuristic(end_x, end_y)
+
+        g_score = np.full(rows * cols, np.inf)
+        parent = np.full(rows * cols, -1, dtype=np.int64)
+        closed = np.zeros(rows * cols, dtype=bool)
+
+        g_score[start] = 0
+        # Ties on f are broken towards the grid closer to the goal
+        h_start = heuristic(start_x, start_y)
+        open_set = [(h_start, h_start, start)]
+
+        while open_set:
+            f_score, h_score, node = heapq.heappop(open_set)
+            if closed[node]:
+                continue
+            if node == goal:
+                return self.trace_path(parent, goal, cols)
+            closed[node] = True
+
+            x, y = divmod(node, cols)
+            for dx, dy in self.directions:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < rows and 0 <= ny < cols):
+                    continue
+                neighbor = nx * cols + ny
+                if closed[neighbor]:
+                    continue
+
+                cost = self.edge_cost(x, y, nx, ny)
+                if cost is None:
+                    continue
+
+                new_g_score = g_score[node] + cost
+                if new_g_score < g_score[neighbor]:
+                    h_score = heuristic(nx, ny)
+                    if h_score == np.inf:
+                        # The destination cannot be reached from this grid at all
+                        continue
+                    g_score[neighbor] = new_g_score
+                    parent[neighbor] = node
+                    heapq.heappush(open_set, (new_g_score + h_score, h_score, neighbor))
+
+        return None
+
+    def heuristic(self, end_x, end_y):
+        """
+        Return the heuristic function h(x, y) of a search towards (end_x, end_y).
+        With a DistanceField of this destination it is the exact cost-to-go on the full terrain,
+        which leads the search straight along the best route. The field can exceed the optimistic
+        cost assumed for unknown grids, so plans are then no longer optimal for the known terrain alone.
+        Otherwise it is the Manhattan distance at the flat-ground time, which never overestimates.
+        """
+        field = self.distance_field
+        if field is not None and field.destination == (end_x, end_y):
+            distances = field.distances
+            return lambda x, y: distances[x, y]
+
+        base_time = self.cost_model.base_time
+        return lambda x, y: base_time * (abs(x - end_x) + abs(y - end_y))
@@ -1,11 +1,8 @@
-import math
 from collections import deque
-from model.simulator import Simulator, Task, Environment, Log
-from model.avatar import Avatar, DetectionMask
 from . import Brain
 
 class BrainDFS(Brain):
-    def run(self):
+    def steps(self):
         if not self.current_task:
             return [], False
 
@@ -13,12 +10,11 @@ class BrainDFS(Brain):
         end = (self.current_task.des_row, self.current_task.des_col)
 
         rows, cols = len(self.original_map), len(self.original_map[0])
-        self.detect_map = [[114514 for _ in range(cols)] for _ in range(rows)]
+        self.init_detect_map()
+        self.init_terrain_models()
         detection_mask = self.current_avatar.get_detection_mask()
 
-        energy = self.current_avatar.battery_capacity
-        max_energy = energy
-        energy_recharge = self.current_avatar.energy_recharge_rate * self.current_environment.get_light_intensity()
+        self.init_energy()
 
         stack = deque()
         visited = set()
@@ -34,10 +30,8 @@ class BrainDFS(Brain):
             visited.add((x, y))
 
 
-            self.detect_map = detection_mask.apply_mask(self.detect_map, self.original_map, x, y)
-            log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map],
-                            time=self.time, energy=energy)
-            self.task_trail.append(log_entry)
+            self.sense(detection_mask, x, y)
+            yield self.log_step(x, y)
 
             # if reach end
             if (x, y) == end:
@@ -62,14 +56,8 @@ class BrainDFS(Brain):
                 # Simulate energy consumption and time increase (taking the cost of the first step)
                 nx, ny = neighbors[0]
                 cost = self.cost(x, y, nx, ny) + 1
-                if energy < cost:
-                    while energy < max_energy:
-                        energy += energy_recharge
-                        self.time += 1
-                    energy = max_energy
-
-                energy -= cost
-                self.time += cost
+                if not self.spend_energy(cost, cost):
+                    return self.task_trail, False
             else:
                 # Dead end, fall back
                 print(f"Dead end at ({x}, {y}), backtracking...")
@@ -81,20 +69,11 @@ class BrainDFS(Brain):
                     backtrack.add((last_x, last_y))
 
                     # Simulate movement, consumption, and recording
-                    if energy < 1:
-                        while energy < max_energy:
-                            energy += energy_recharge
-                            self.time += 1
-                        energy = max_energy
+                    if not self.spend_energy(1, 1):
+                        return self.task_trail, False
 
-                    energy -= 1
-                    self.time += 1
-
-                    self.detect_map = detection_mask.apply_mask(self.detect_map, self.original_map, last_x, last_y)
-                    log_entry = Log(index_x=last_x, index_y=last_y,
-                                    detect_map=[row[:] for row in self.detect_map],
-                                    time=self.time, energy=energy)
-                    self.task_trail.append(log_entry)
+                    self.sense(detection_mask, last_x, last_y)
+                    yield self.log_step(last_x, last_y)
 
                     # Find out if there are new directions to go
                     has_new_path = False
@@ -112,20 +91,3 @@ class BrainDFS(Brain):
 
         print("The destination is unreachable, task failed")
         return self.task_trail, False
-
-    def reset(self):
-        self.task_trail.clear()
-        self.time = 0
-        self.detect_map = [[114514 for _ in range(len(self.original_map[0]))] for _ in range(len(self.original_map))]
-        return True
-
-    def movable(self, avatar_x, avatar_y, target_x, target_y):
-        return self.current_avatar.get_movable(self.detect_map[avatar_x][avatar_y], self.detect_map[target_x][target_y])
-
-    def cost(self, avatar_x, avatar_y, target_x, target_y):
-        base_time = self.current_avatar.calculate_time_per_grid()
-        elevation_difference = abs(self.detect_map[avatar_x][avatar_y] - self.detect_map[target_x][target_y])
-        distance = 10
-        slope_factor = 1.0
-        actual_time = base_time * (1 + slope_factor * (elevation_difference / distance))
-        return math.ceil(actual_time)
@@ -0,0 +1,57 @@
+from .brain_planning import PlanningBrain
+
+
+# Dial's algorithm: a shortest-path search with a bucket queue instead of a heap.
+# Every edge costs a small positive integer, so the open grids are kept in a ring of buckets
+# indexed by their integer priority: a push appends to a bucket and a pop takes from the
+# current one, both O(1).
+# The priority is g + h with the flat-ground Manhattan heuristic. The heuristic is consistent,
+# so this is Dijkstra on the reduced costs c - h(u) + h(v) >= 0 and priorities never decrease;
+# one edge raises the priority by at most CostModel.max_cost + base_time, which sizes the ring.
+class BrainDial(PlanningBrain):
+    def plan(self, start_x, start_y, end_x, end_y):
+        rows, cols = self.detect_map.shape
+        start = start_x * cols + start_y
+        goal = end_x * cols + end_y
+        base_time = self.cost_model.base_time
+
+        self.refresh_planning_costs()
+        moves = [(dx * cols + dy, dx, dy, self.planning_cost_lists[(dx, dy)]) for dx, dy in self.directions]
+        ring_size = self.cost_model.max_cost + base_time + 1
+        buckets = [[] for _ in range(ring_size)]
+
+        # Only the grids the search touches get an entry
+        g_score = {start: 0}
+        parent = {start: -1}
+        current = base_time * (abs(start_x - end_x) + abs(start_y - end_y))
+        buckets[current % ring_size].append(start)
+        queued = 1
+
+        while queued:
+            bucket = buckets[current % ring_size]
+            while bucket:
+                node = bucket.pop()
+                queued -= 1
+                x, y = divmod(node, cols)
+                g = g_score[node]
+                # Skip entries left behind when the grid was reached at a lower priority
+                if g + base_time * (abs(x - end_x) + abs(y - end_y)) != current:
+                    continue
+                if node == goal:
+                    return self.trace_path(parent, goal, cols)
+
+                for offset, dx, dy, cost in moves:
+                    edge_cost = cost[node]
+                    if edge_cost < 0:
+                        continue
+                    neighbor = node + offset
+                    new_g_score = g + edge_cost
+                    if new_g_score < g_score.get(neighbor, new_g_score + 1):
+                        g_score[neighbor] = new_g_score
+                        parent[neighbor] = node
+                        priority = new_g_score + base_time * (abs(x + dx - end_x) + abs(y + dy - end_y))
+                        buckets[priority % ring_size].append(neighbor)
+                        queued += 1
+            current += 1
+
+        return None
@@ -0,0 +1,189 @@
+import heapq  # priority queue
+
+import numpy as np
+
+from .brain_planning import PlanningBrain
+
+
+# D* Lite: an incremental search from the destination back to the avatar.
+# g_score and rhs (the one-step lookahead of g) are kept for the whole run, so when the sensors
+# reveal new grids only the vertices whose edges changed are repaired and the search resumes
+# from there instead of starting over. key_modifier keeps the old queue keys valid while the
+# avatar, which the heuristic is measured to, moves on.
+class BrainDStarLite(PlanningBrain):
+    def plan(self, start_x, start_y, end_x, end_y):
+        rows, cols = self.detect_map.shape
+        start = start_x * cols + start_y
+        goal = end_x * cols + end_y
+
+        new_run = self.planning_cost_lists is None
+        revealed = self.refresh_planning_costs()
+        self.moves = [(dx * cols + dy, self.planning_cost_lists[(dx, dy)]) for dx, dy in self.directions]
+
+        if new_run or goal != self.search_goal:
+            self.init_search(start, goal, cols)
+        else:
+            self.key_modifier += self.heuristic(self.search_start, start)
+            self.set_search_start(start)
+            self.repair(revealed)
+
+        self.compute_shortest_path()
+        return self.extract_path()
+
+    def init_search(self, start, goal, cols):
+        size = len(self.planning_cost_lists[self.directions[0]])
+        self.search_goal = goal
+        self.search_cols = cols
+        self.set_search_start(start)
+        self.key_modifier = 0
+        self.g_score = [np.inf] * size
+        self.rhs = [np.inf] * size
+        self.rhs[goal] = 0
+        # Lazy deletion: a heap entry is live only while open_keys still maps its grid to its key
+        self.open_keys = {goal: self.calculate_key(goal)}
+        self.open_set = [(self.open_keys[goal], goal)]
+
+    def set_search_start(self, start):
+        self.search_start = start
+        self.start_x, self.start_y = divmod(start, self.search_cols)
+
+    def heuristic(self, node, other):
+        x, y = divmod(node, self.search_cols)
+        other_x, other_y = divmod(other, self.search_cols)
+        return self.cost_model.base_time * (abs(x - other_x) + abs(y - other_y))
+
+    def calculate_key(self, node):
+        """
+        Queue key of node: the D* Lite priority min(g, rhs) + h + key_modifier, then a tie-breaker.
+        On equal priorities underconsistent grids (g < rhs) come first, by smaller g as in plain
+        D* Lite; the others go by larger rhs, like A* preferring larger g, so a search over the
+        unknown flat ground heads for the avatar instead of filling every grid with the same priority.
+        """
+        g_score, rhs = self.g_score[node], self.rhs[node]
+        x, y = divmod(node, self.search_cols)
+        distance = abs(x - self.start_x) + abs(y - self.start_y)
+        if g_score < rhs:
+            return g_score + self.cost_model.base_time * distance + self.key_modifier, 0, g_score
+        return rhs + self.cost_model.base_time * distance + self.key_modifier, 1, -rhs
+
+    def update_vertex(self, node):
+        if self.g_score[node] != self.rhs[node]:
+            key = self.calculate_key(node)
+            self.open_keys[node] = key
+            heapq.heappush(self.open_set, (key, node))
+        else:
+            self.open_keys.pop(node, None)
+
+    def best_successor(self, node):
+        """
+        Return (cost through the best neighbour, that neighbour) of node, (inf, -1) when it has none.
+        """
+        best, best_neighbor = np.inf, -1
+        for offset, cost in self.moves:
+            edge_cost = cost[node]
+            if edge_cost >= 0:
+                value = edge_cost + self.g_score[node + offset]
+                if value < best:
+                    best, best_neighbor = value, node + offset
+        return best, best_neighbor
+
+    def predecessors(self, node):
+        """
+        Yield (grid, edge cost) of every grid that can move into node.
+        """
+        size = len(self.g_score)
+        for offset, cost in self.moves:
+            previous = node - offset
+            if 0 <= previous < size and cost[previous] >= 0:
+                yield previous, cost[previous]
+
+    def repair(self, revealed):
+        """
+        Recompute rhs of every grid with an edge touching a newly revealed grid.
+        """
+        rows, cols = self.detect_map.shape
+        affected = set()
+        for node in revealed.tolist():
+            affected.add(node)
+            x, y = divmod(node, cols)
+            for dx, dy in self.directions:
+                if 0 <= x + dx < rows and 0 <= y + dy < cols:
+                    affected.add(node + dx * cols + dy)
+
+        for node in affected:
+            if node != self.search_goal:
+                self.rhs[node] = self.best_successor(node)[0]
+            self.update_vertex(node)
+
+    def top(self):
+        while self.open_set and self.open_keys.get(self.open_set[0][1]) != self.open_set[0][0]:
+            heapq.heappop(self.open_set)
+        if not self.open_set:
+            return (np.inf, 1, -np.inf), -1
+        return self.open_set[0]
+
+    def compute_shortest_path(self):
+        start = self.search_start
+        g_score, rhs = self.g_score, self.rhs
+
+        while True:
+            top_key, node = self.top()
+            if node == -1 or not (top_key < self.calculate_key(start) or rhs[start] > g_score[start]):
+                return
+
+            new_key = self.calculate_key(node)
+            if top_key < new_key:
+                # The avatar moved since this key was computed
+                self.open_keys[node] = new_key
+                heapq.heappush(self.open_set, (new_key, node))
+                continue
+
+            heapq.heappop(self.open_set)
+            del self.open_keys[node]
+
+            if g_score[node] > rhs[node]:
+                g_score[node] = rhs[node]
+                for previous, edge_cost in self.predecessors(node):
+                    if previous != self.search_goal:
+                        rhs[previous] = min(rhs[previous], edge_cost + g_score[node])
+                    self.update_vertex(previous)
+            else:
+                old_g_score = g_score[node]
+                g_score[node] = np.inf
+                for previous, edge_cost in [(node, None)] + list(self.predecessors(node)):
+                    if previous != self.search_goal and (edge_cost is None or rhs[previous] == edge_cost + old_g_score):
+                        rhs[previous] = self.best_successor(previous)[0]
+                    self.update_vertex(previous)
+
+    def extract_path(self):
+        """
+        Follow the cheapest neighbours from the avatar down to the destination.
+        Between equally cheap neighbours the one closing the shorter of the row and column
+        distances to the destination is taken, so the path runs straight once it is lined up.
+        """
+        node = self.search_start
+        if self.rhs[node] == np.inf:
+            return None
+
+        cols = self.search_cols
+        goal_x, goal_y = divmod(self.search_goal, cols)
+        g_score = self.g_score
+        path = [node]
+        while node != self.search_goal:
+            best, candidates = np.inf, []
+            for offset, cost in self.moves:
+                edge_cost = cost[node]
+                if edge_cost >= 0:
+                    value = edge_cost + g_score[node + offset]
+                    if value < best:
+                        best, candidates = value, [node + offset]
+                    elif value == best:
+                        candidates.append(node + offset)
+            if best == np.inf or len(path) > len(g_score):
+                return None
+
+            node = candidates[0]
+            if len(candidates) > 1:
+                node = max(candidates, key=lambda candidate: abs(abs(goal_x - candidate // cols) - abs(goal_y - candidate % cols)))
+            path.append(node)
+        return np.divmod(np.array(path, dtype=np.int64), cols)
@@ -1,14 +1,9 @@
 #from model.fake import Log, Task, Environment, Avatar, DetectionMask
-import math
-
-from model.simulator import Simulator, Task, Environment, Log
-from model.avatar import Avatar, DetectionMask
 from . import Brain
-import time as Time
 from collections import deque
 
 class BrainGreedy(Brain):
-    def run(self):
+    def steps(self):
 
         # The parents stack to keep track of the parent position
         parents = deque()
@@ -22,11 +17,10 @@ class BrainGreedy(Brain):
         # Initialization
         x, y = self.current_task.start_row, self.current_task.start_col
         end_x, end_y = self.current_task.des_row, self.current_task.des_col
-        self.detect_map = [[114514 for _ in range(len(self.original_map[0]))] for _ in range(len(self.original_map))]
+        self.init_detect_map()
+        self.init_terrain_models()
         detection_mask = self.current_avatar.get_detection_mask()
-        energy = self.current_avatar.battery_capacity
-        max_energy = energy
-        energy_recharge = self.current_avatar.energy_recharge_rate* (self.current_environment.get_light_intensity())
+        self.init_energy()
 
 
         # Start running the simulation
@@ -36,15 +30,14 @@ class BrainGreedy(Brain):
             #Time.sleep(1)
 
             # Apply the detection mask
-            self.detect_map = detection_mask.apply_mask(self.detect_map, self.original_map, x, y)
+            self.sense(detection_mask, x, y)
             #print("The current position is ({0}, {1}), the value is {2}".format(x, y, self.detect_map[x][y]))
 
             # Add the current position to the visit set
             visited.add((x, y))
 
 
-            log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map], time=self.time, energy=energy)
-            self.task_trail.append(log_entry)
+            yield self.log_step(x, y)
 
             # Read in the parent
             (parent_x, parent_y) = parents[-1] if parents else (x, y)
@@ -61,14 +54,8 @@ class BrainGreedy(Brain):
             else:
                 c = self.current_avatar.battery_consumption_rate * 10
                 # Recharge if the avatar cannot move due to energy
-                if c > energy:
-                    while energy < max_energy:
-                        energy += energy_recharge
-                        self.time += 1
-                    energy = max_energy
-
-                energy -= c
-                self.time += self.cost(x,y,next_x,next_y)
+                if not self.spend_energy(c, self.cost(x, y, next_x, next_y)):
+                    break
 
                 # Add the parent position to the stack if not back tracking
                 if next_x != parent_x or next_y != parent_y:
@@ -80,35 +67,11 @@ class BrainGreedy(Brain):
 
         # Check whether the mission succeed
         if x == end_x and y == end_y:
-            log_entry = Log(index_x=x, index_y=y, detect_map=[row[:] for row in self.detect_map], time=self.time, energy=energy)
-            self.task_trail.append(log_entry)
+            yield self.log_step(x, y)
             return self.task_trail, True
 
         return self.task_trail, False
 
-    def reset(self):
-        self.task_trail.clear()
-        self.time = 0
-        self.detect_map = [[114514 for _ in range(len(self.original_map[0]))] for _ in range(len(self.original_map))]
-        return True
-
-    # Determine whether the position is movable
-    def movable(self, avatar_x, avatar_y, target_x, target_y):
-        return self.current_avatar.get_movable(self.detect_map[avatar_x][avatar_y], self.detect_map[target_x][target_y])
-
-
-
-    def cost(self, avatar_x, avatar_y, target_x, target_y):
-        base_time = self.current_avatar.calculate_time_per_grid()
-        elevation_difference = abs(self.detect_map[avatar_x][avatar_y] - self.detect_map[target_x][target_y])
-        distance = 10
-        slope_factor = 1.0
-
-        # Calculate the actual time required based on elevation difference
-        actual_time = base_time * (1 + slope_factor * (elevation_difference / distance))
-
-        return math.ceil(actual_time)
-
     # Choose the best direction to go
     def choose_best_direction(self,avatar_x, avatar_y, goal_x, goal_y, visited, parents):
         directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
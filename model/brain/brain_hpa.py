@@ -0,0 +1,85 @@
+import numpy as np
+
+from model.simulator import ClusterGraph, ReachabilityIndex
+from model.simulator.cluster_graph import search_window
+from .brain_planning import PlanningBrain
+
+
+# Hierarchical A* (HPA*): the route is searched once on the ClusterGraph of the map and
+# only refined on the grid, on the terrain the avatar knows, a cluster or so ahead of it.
+# The route comes from the full terrain, so it stays valid while the map is revealed;
+# a blocked plan only refines the current stretch again.
+class BrainHPAStar(PlanningBrain):
+    uses_cluster_graph = True
+
+    def __init__(self):
+        super().__init__()
+        self.reachability = None
+
+    def plan(self, start_x, start_y, end_x, end_y):
+        rows, cols = self.detect_map.shape
+        start = start_x * cols + start_y
+        goal = end_x * cols + end_y
+
+        if self.planning_cost_lists is None:
+            # A new run: forget the route and the reachability of the previous one
+            self.route = None
+            self.reachability = None
+        self.refresh_planning_costs()
+        if self.cluster_graph is None:
+            self.cluster_graph = ClusterGraph(self.traversability, self.cost_model)
+
+        if self.route is None or self.route[-1] != goal:
+            self.route = self.cluster_graph.abstract_route(start, goal)
+            if self.route is None:
+                if not self.connected(start_x, start_y, end_x, end_y):
+                    return None
+                # The abstract graph missed a connection, refine() falls back to a search of the whole map
+                self.route = [start, goal]
+            self.route_target = 1
+            self.plan_waypoints = []
+        else:
+            # Skip the route grids the avatar has walked through on the previous plan
+            for plan_index, route_index in self.plan_waypoints:
+                if plan_index <= self.plan_cursor:
+                    self.route_target = route_index + 1
+
+        # Refine the route until the plan spans about one cluster
+        path = [start]
+        self.plan_waypoints = []
+        route_index = self.route_target
+        while route_index < len(self.route) and (len(path) < 2 or len(path) < self.cluster_graph.cluster_size):
+            target = self.route[route_index]
+            piece = self.refine(path[-1], target, self.route[route_index - 1])
+            if piece is None:
+                return None
+            path.extend(piece[1:])
+            self.plan_waypoints.append((len(path) - 1, route_index))
+            route_index += 1
+
+        return np.divmod(np.array(path, dtype=np.int64), cols)
+
+    def connected(self, start_x, start_y, end_x, end_y):
+        """
+        Check on the full terrain whether the avatar can travel from (start_x, start_y) to (end_x, end_y).
+        """
+        if self.reachability is None:
+            self.reachability = ReachabilityIndex(self.traversability)
+        return self.reachability.connected(start_x, start_y, end_x, end_y)
+
+    def refine(self, source, target, previous):
+        """
+        Plan on the known terrain from source to the route grid target, inside the clusters of
+        source, target and the route grid before target, or on the whole map if that fails.
+        :return: the flat grids of the path, both ends included, or None if target cannot be reached.
+        """
+        rows, cols = self.detect_map.shape
+        for window in [self.cluster_graph.window_of(source, target, previous), (0, rows, 0, cols)]:
+            _, parent = search_window(self.planning_cost_lists, cols, source, window, [target])
+            if target in parent:
+                path = [target]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+        return None
@@ -0,0 +1,187 @@
+from abc import abstractmethod
+
+import numpy as np
+
+from .brain import Brain
+
+
+# The abstract class for brains that plan a full path on the known terrain and follow it.
+# Unknown cells are assumed to be passable at the flat-ground cost, the avatar walks the plan
+# one grid at a time, senses after every step and replans once a revealed edge blocks the plan.
+class PlanningBrain(Brain):
+    directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+    def __init__(self):
+        super().__init__()
+        self.planning_cost_lists = None
+        # Flat indices of the grids revealed since planning_cost_lists was last refreshed
+        self.unplanned_reveals = []
+
+    def steps(self):
+        if not self.current_task:
+            return [], False
+
+        x, y = self.current_task.start_row, self.current_task.start_col
+        end_x, end_y = self.current_task.des_row, self.current_task.des_col
+
+        self.init_detect_map()
+        self.init_terrain_models()
+        detection_mask = self.current_avatar.get_detection_mask()
+
+        self.init_energy()
+
+        # The current plan, stored as row/col arrays with the cursor on the avatar position
+        self.plan_rows = np.empty(0, dtype=np.int64)
+        self.plan_cols = np.empty(0, dtype=np.int64)
+        self.plan_cursor = 0
+        self.revealed_count = 0
+        self.planning_cost_lists = None
+        self.unplanned_reveals = []
+
+        while True:
+            self.revealed_count += len(self.sense(detection_mask, x, y))
+            yield self.log_step(x, y)
+
+            if (x, y) == (end_x, end_y):
+                print("The destination is reachable, task succeeded")
+                return self.task_trail, True
+
+            next_pos = self.next_step(x, y, end_x, end_y)
+            if next_pos is None:
+                print("The destination is unreachable, task failed")
+                return self.task_trail, False
+
+            nx, ny = next_pos
+            cost = self.cost(x, y, nx, ny)
+            if not self.spend_energy(cost + 1, cost):
+                return self.task_trail, False
+            x, y = nx, ny
+
+    @abstractmethod
+    def plan(self, start_x, start_y, end_x, end_y):
+        """
+        Plan a path on the current knowledge of the terrain.
+        :return: (rows, cols) arrays of the path, both ends included, or None if no path exists.
+        """
+        pass
+
+    def next_step(self, x, y, end_x, end_y):
+        """
+        Return the next grid of the current plan, replanning when the plan is missing or blocked.
+        Returns None when the destination cannot be reached.
+        """
+        while True:
+            # The plan can only have become blocked if the sensors revealed something since it was checked;
+            # a grid touched on the way is checked by movable() before the avatar moves onto it
+            blocked = self.revealed_count > 0 and self.plan_blocked()
+            self.revealed_count = 0
+            if self.plan_cursor >= len(self.plan_rows) - 1 or blocked:
+                plan = self.plan(x, y, end_x, end_y)
+                if plan is None:
+                    return None
+                self.plan_rows, self.plan_cols = plan
+                self.plan_cursor = 0
+
+            nx = int(self.plan_rows[self.plan_cursor + 1])
+            ny = int(self.plan_cols[self.plan_cursor + 1])
+
+            # Touch the next grid when the sensors could not see it
+            self.reveal_cell(nx, ny)
+
+            if self.movable(x, y, nx, ny):
+                self.plan_cursor += 1
+                return nx, ny
+
+            self.plan_cursor = len(self.plan_rows)
+
+    def plan_blocked(self):
+        """
+        Check whether any edge left in the plan joins two known grids the avatar cannot move between.
+        """
+        rows = self.plan_rows[self.plan_cursor:]
+        cols = self.plan_cols[self.plan_cursor:]
+        known = self.known_mask[rows, cols]
+        both_known = known[:-1] & known[1:]
+        if not both_known.any():
+            return False
+
+        step_rows = np.diff(rows)
+        step_cols = np.diff(cols)
+        passable = np.zeros(len(step_rows), dtype=bool)
+        for (dx, dy), edge in self.traversability.edges.items():
+            selected = (step_rows == dx) & (step_cols == dy)
+            passable[selected] = edge[rows[:-1][selected], cols[:-1][selected]]
+        return bool((both_known & ~passable).any())
+
+    def edge_cost(self, avatar_x, avatar_y, target_x, target_y):
+        """
+        Planning cost of one edge: the real cost between known grids, None if it cannot be climbed,
+        and the flat-ground cost when either grid is still unknown.
+        """
+        if self.known_mask[avatar_x, avatar_y] and self.known_mask[target_x, target_y]:
+            if not self.movable(avatar_x, avatar_y, target_x, target_y):
+                return None
+            return self.cost(avatar_x, avatar_y, target_x, target_y)
+        return self.cost_model.base_time
+
+    def planning_costs(self):
+        """
+        Vectorized edge_cost of every edge, as one integer raster per move like CostModel.edges.
+        Edges that leave the map or cannot be climbed between known grids are -1.
+        """
+        known = self.known_mask
+        inside = np.ones(known.shape, dtype=bool)
+        costs = {}
+        for (dx, dy), passable in self.traversability.edges.items():
+            both_known = known & self.traversability.shift_to_source(known, dx, dy)
+            usable = self.traversability.shift_to_source(inside, dx, dy) & (passable | ~both_known)
+            cost = np.where(both_known, self.cost_model.get_edge(dx, dy), self.cost_model.base_time)
+            costs[(dx, dy)] = np.where(usable, cost, -1)
+        return costs
+
+    def record_reveal(self, indices, values):
+        super().record_reveal(indices, values)
+        if len(indices) and self.planning_cost_lists is not None:
+            self.unplanned_reveals.append(indices)
+
+    def refresh_planning_costs(self):
+        """
+        Keep planning_cost_lists, the planning costs as one flat list per move, up to date with the
+        revealed grids. The first call converts planning_costs(); later calls only redo the edges
+        touching the grids revealed since the previous call, as recorded by record_reveal().
+        :return: flat indices of the grids revealed since the previous call.
+        """
+        if self.planning_cost_lists is None:
+            self.planning_cost_lists = {move: cost.ravel().tolist() for move, cost in self.planning_costs().items()}
+            self.unplanned_reveals = []
+            return np.flatnonzero(self.known_mask)
+
+        revealed = np.concatenate(self.unplanned_reveals) if self.unplanned_reveals else np.empty(0, dtype=np.int64)
+        self.unplanned_reveals = []
+        rows, cols = self.known_mask.shape
+        for node in revealed.tolist():
+            x, y = divmod(node, cols)
+            for dx, dy in self.directions:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < rows and 0 <= ny < cols):
+                    continue
+                # The edge leaving the revealed grid and the one coming back into it
+                for (sx, sy, tx, ty) in ((x, y, nx, ny), (nx, ny, x, y)):
+                    cost = self.edge_cost(sx, sy, tx, ty)
+                    self.planning_cost_lists[(tx - sx, ty - sy)][sx * cols + sy] = -1 if cost is None else cost
+        return revealed
+
+    @staticmethod
+    def trace_path(parent, goal, width):
+        """
+        Follow the parent pointers back from goal and return the (rows, cols) arrays of the path.
+        parent holds the flat index of each grid's predecessor, -1 for the start.
+        """
+        path = [goal]
+        node = parent[goal]
+        while node != -1:
+            path.append(int(node))
+            node = parent[node]
+        path.reverse()
+        rows, cols = np.divmod(np.array(path, dtype=np.int64), width)
+        return rows, cols
@@ -0,0 +1,214 @@
+import unittest
+
+import numpy as np
+
+from model.avatar.tests.helpers import make_test_avatar
+from model.simulator import Task, Environment, DistanceField, ClusterGraph
+from model.brain import BrainAStar, BrainAStarPlanner, BrainDial, BrainDStarLite, BrainHPAStar
+
+
+def make_brain(brain, terrain, task):
+    brain.set_original_map(terrain)
+    brain.set_avatar(make_test_avatar("Planning"))
+    brain.set_environment(Environment())
+    brain.set_task(task)
+    brain.reset()
+    return brain
+
+
+class TestPlanningBrains(unittest.TestCase):
+
+    def setUp(self):
+        """A flat map split by a cliff with a single gap at the bottom row"""
+        self.terrain = np.zeros((20, 20), dtype=np.float32)
+        self.terrain[:19, 10] = 1000.0
+
+    def assert_adjacent_trail(self, trail):
+        for previous, current in zip(trail, trail[1:]):
+            step = abs(previous.get_index_x() - current.get_index_x()) + abs(previous.get_index_y() - current.get_index_y())
+            self.assertLessEqual(step, 1, "Consecutive logs must be neighbouring grids")
+
+    def test_astar_planner_reaches_destination_around_cliff(self):
+        """Test the parent-pointer A* brain detours through the gap in the cliff"""
+        brain = make_brain(BrainAStarPlanner(), self.terrain, Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertTrue(success)
+        self.assertEqual((trail[-1].get_index_x(), trail[-1].get_index_y()), (0, 19))
+        self.assertIn((19, 10), [(log.get_index_x(), log.get_index_y()) for log in trail])
+        self.assert_adjacent_trail(trail)
+
+    def test_astar_planner_with_distance_field(self):
+        """Test the parent-pointer A* brain walks the route of the distance field of its destination"""
+        brain = make_brain(BrainAStarPlanner(), self.terrain, Task(0, 0, 0, 19))
+        field = DistanceField(brain.traversability, brain.cost_model, 0, 19)
+        brain.set_distance_field(field)
+        trail, success = brain.run()
+
+        self.assertTrue(success)
+        positions = [(log.get_index_x(), log.get_index_y()) for log in trail]
+        travel_time = sum(brain.cost(*a, *b) for a, b in zip(positions, positions[1:]))
+        self.assertEqual(travel_time, field.cost_to_go(0, 0))
+        self.assert_adjacent_trail(trail)
+
+    def test_astar_planner_reports_unreachable(self):
+        """Test the parent-pointer A* brain fails once the cliff is closed"""
+        self.terrain[:, 10] = 1000.0
+        brain = make_brain(BrainAStarPlanner(), self.terrain, Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertFalse(success)
+        self.assert_adjacent_trail(trail)
+
+    def test_dial_reaches_destination_around_cliff(self):
+        """Test the bucket-queue Dijkstra brain detours through the gap in the cliff"""
+        brain = make_brain(BrainDial(), self.terrain, Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertTrue(success)
+        self.assertEqual((trail[-1].get_index_x(), trail[-1].get_index_y()), (0, 19))
+        self.assertIn((19, 10), [(log.get_index_x(), log.get_index_y()) for log in trail])
+        self.assert_adjacent_trail(trail)
+
+    def test_dstar_lite_reaches_destination_around_cliff(self):
+        """Test the D* Lite brain detours through the gap in the cliff"""
+        brain = make_brain(BrainDStarLite(), self.terrain, Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertTrue(success)
+        self.assertEqual((trail[-1].get_index_x(), trail[-1].get_index_y()), (0, 19))
+        self.assert_adjacent_trail(trail)
+
+    def test_dstar_lite_reports_unreachable(self):
+        """Test the D* Lite brain fails once the cliff is closed"""
+        self.terrain[:, 10] = 1000.0
+        brain = make_brain(BrainDStarLite(), self.terrain, Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertFalse(success)
+        self.assert_adjacent_trail(trail)
+
+    def test_dstar_lite_repair_matches_fresh_search(self):
+        """Test a repaired D* Lite plan costs as much as a plan searched from scratch"""
+        dstar_lite = make_brain(BrainDStarLite(), self.terrain, Task(0, 0, 0, 19))
+        dial = make_brain(BrainDial(), self.terrain, Task(0, 0, 0, 19))
+        dstar_lite.plan(0, 0, 0, 19)
+
+        # Reveal the cliff and move the avatar, then plan again with both brains
+        for brain in [dstar_lite, dial]:
+            revealed = np.zeros(self.terrain.shape, dtype=bool)
+            revealed[:, 8:13] = ~brain.known_mask[:, 8:13]
+            brain.known_mask |= revealed
+            brain.detect_map[revealed] = self.terrain[revealed]
+            brain.record_reveal(np.flatnonzero(revealed), self.terrain[revealed])
+
+        def plan_cost(brain, plan):
+            return sum(brain.edge_cost(x, y, nx, ny) for x, y, nx, ny in
+                       zip(plan[0], plan[1], plan[0][1:], plan[1][1:]))
+
+        repaired = dstar_lite.plan(2, 3, 0, 19)
+        fresh = dial.plan(2, 3, 0, 19)
+        self.assertEqual(plan_cost(dstar_lite, repaired), plan_cost(dial, fresh))
+        self.assertIn((19, 10), list(zip(repaired[0], repaired[1])))
+
+    def make_hpa_brain(self, task):
+        brain = make_brain(BrainHPAStar(), self.terrain, task)
+        brain.set_cluster_graph(ClusterGraph(brain.traversability, brain.cost_model, cluster_size=5))
+        return brain
+
+    def test_hpa_reaches_destination_around_cliff(self):
+        """Test the hierarchical brain detours through the gap in the cliff across several clusters"""
+        brain = self.make_hpa_brain(Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertTrue(success)
+        self.assertEqual((trail[-1].get_index_x(), trail[-1].get_index_y()), (0, 19))
+        self.assertIn((19, 10), [(log.get_index_x(), log.get_index_y()) for log in trail])
+        self.assert_adjacent_trail(trail)
+
+    def test_hpa_reports_unreachable(self):
+        """Test the hierarchical brain fails once the cliff is closed"""
+        self.terrain[:, 10] = 1000.0
+        brain = self.make_hpa_brain(Task(0, 0, 0, 19))
+        trail, success = brain.run()
+
+        self.assertFalse(success)
+        self.assert_adjacent_trail(trail)
+
+    def test_hpa_falls_back_to_flat_search(self):
+        """Test the hierarchical brain still reaches a connected destination its abstract graph misses"""
+        brain = make_brain(BrainHPAStar(), self.terrain, Task(0, 0, 0, 19))
+        graph = ClusterGraph(brain.traversability, brain.cost_model, cluster_size=5, build=False)
+        graph.index_edges()
+        brain.set_cluster_graph(graph)
+        self.assertIsNone(graph.abstract_route(0, 19))
+
+        trail, success = brain.run()
+
+        self.assertTrue(success)
+        self.assertEqual((trail[-1].get_index_x(), trail[-1].get_index_y()), (0, 19))
+        self.assert_adjacent_trail(trail)
+
+    def test_astar_run_matches_steps(self):
+        """Test the A* brain records the same trail run to the end as stepped one log at a time"""
+        trail, success = make_brain(BrainAStar(), self.terrain, Task(0, 0, 0, 19)).run()
+
+        steps = make_brain(BrainAStar(), self.terrain, Task(0, 0, 0, 19)).steps()
+        logs = []
+        while True:
+            try:
+                logs.append(next(steps))
+            except StopIteration as finished:
+                stepped_trail, stepped_success = finished.value
+                break
+
+        self.assertTrue(success)
+        self.assertEqual(stepped_success, success)
+        self.assertEqual(len(logs), len(trail))
+        self.assertEqual(len(stepped_trail), len(trail))
+        for log, expected in zip(logs, trail):
+            self.assertEqual((log.get_index_x(), log.get_index_y(), log.get_time(), log.get_energy()),
+                             (expected.get_index_x(), expected.get_index_y(), expected.get_time(), expected.get_energy()))
+            np.testing.assert_array_equal(log.get_known_mask(), expected.get_known_mask())
+
+    def test_astar_step_costs_travel_time_plus_one(self):
+        """Test every A* step along a corridor charges its travel time plus one, recharging to full when needed"""
+        brain = make_brain(BrainAStar(), np.zeros((1, 40), dtype=np.float32), Task(0, 0, 0, 39))
+        trail, success = brain.run()
+        self.assertTrue(success)
+        self.assertEqual(len(trail), 40)
+
+        capacity = brain.current_avatar.battery_capacity
+        recharge_rate = brain.current_avatar.energy_recharge_rate
+        time, energy = 0, capacity
+        recharged = False
+        for previous, log in zip(trail, trail[1:]):
+            step = brain.cost(previous.get_index_x(), previous.get_index_y(), log.get_index_x(), log.get_index_y()) + 1
+            if energy < step:
+                time += -(-(capacity - energy) // recharge_rate)
+                energy = capacity
+                recharged = True
+            time, energy = time + step, energy - step
+            self.assertEqual((log.get_time(), log.get_energy()), (time, energy))
+        self.assertTrue(recharged)
+
+    def test_planning_costs_match_edge_cost(self):
+        """Test the vectorized planning costs against edge_cost on a partly revealed map"""
+        brain = make_brain(BrainDial(), self.terrain, Task(0, 0, 0, 19))
+        brain.known_mask[5:15, 5:15] = True
+        planning_costs = brain.planning_costs()
+        rows, cols = self.terrain.shape
+
+        for x in range(rows):
+            for y in range(cols):
+                for dx, dy in brain.directions:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < rows and 0 <= ny < cols:
+                        expected = brain.edge_cost(x, y, nx, ny)
+                    else:
+                        expected = None
+                    self.assertEqual(planning_costs[(dx, dy)][x, y], -1 if expected is None else expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
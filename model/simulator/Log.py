@@ -1,11 +1,46 @@
+import numpy as np
+
+
 class Log:
-    def __init__(self, index_x=0, index_y=0, detect_map=None, time=0,  energy=0):
+    # Trails hand out a Log per step read, so keep them small
+    __slots__ = ("index_x", "index_y", "detect_map", "known_mask", "revealed_indices", "revealed_values",
+                 "time", "energy", "trail", "step", "local_grids", "local_grid_strs")
+
+    # A cell of a local grid: its elevation, whether it is known and whether it is inside the map
+    local_grid_dtype = np.dtype([("elevation", np.float32), ("known", bool), ("inside", bool)])
+
+    def __init__(self, index_x=0, index_y=0, detect_map=None, time=0,  energy=0, known_mask=None,
+                 revealed_indices=None, revealed_values=None):
         self.index_x = index_x
         self.index_y = index_y
-        self.detect_map = detect_map if detect_map is not None else []
+        self.detect_map = detect_map if detect_map is not None else np.empty((0, 0), dtype=np.float32)
+        # known_mask marks the revealed cells of detect_map, a missing mask means every cell is known
+        self.known_mask = known_mask if known_mask is not None else np.ones(np.shape(self.detect_map), dtype=bool)
+        # The cells revealed since the previous Log, as flat indices into detect_map and their values
+        self.revealed_indices = revealed_indices if revealed_indices is not None else np.empty(0, dtype=np.int64)
+        self.revealed_values = revealed_values if revealed_values is not None else np.empty(0, dtype=np.float32)
         self.time = time
         self.energy = energy
-        self.local_grid = self.get_local_grid_str()
+        # Set on the Log views of a Trail, which rebuild their maps from the Trail
+        self.trail = None
+        self.step = None
+        # Local grids are only built when asked for, once per size
+        self.local_grids = {}
+        self.local_grid_strs = {}
+
+    @classmethod
+    def view(cls, trail, step, index_x, index_y, time, energy):
+        """
+        Return the Log of step in trail, reading its maps, delta and local grid from the trail.
+        """
+        log = cls.__new__(cls)
+        log.index_x, log.index_y, log.time, log.energy = index_x, index_y, time, energy
+        log.detect_map = log.known_mask = None
+        log.revealed_indices, log.revealed_values = trail.delta_at(step)
+        log.trail, log.step = trail, step
+        log.local_grids = {}
+        log.local_grid_strs = {}
+        return log
 
     def get_index_x(self):
         return self.index_x
@@ -14,8 +49,21 @@ class Log:
         return self.index_y
 
     def get_detect_map(self):
+        if self.trail is not None:
+            return self.trail.maps_at(self.step)[0]
         return self.detect_map
 
+    def get_known_mask(self):
+        if self.trail is not None:
+            return self.trail.maps_at(self.step)[1]
+        return self.known_mask
+
+    def get_revealed(self):
+        """
+        Return (flat indices, values) of the cells revealed since the previous Log.
+        """
+        return self.revealed_indices, self.revealed_values
+
     def get_time(self):
         return self.time
 
@@ -24,28 +72,69 @@ class Log:
 
     def __str__(self):
         return (f"Log Point - X: {self.index_x}, Y: {self.index_y}, Time: {self.time}, "
-                f"Energy: {self.energy}, Detect Map: {self.detect_map}")
+                f"Energy: {self.energy}, Detect Map: {self.get_detect_map()}")
+
+    def get_local_grid(self, size=3):
+        """
+        Return the grid of 2 * (size // 2) + 1 cells a side around the Log position,
+        as a structured array of local_grid_dtype.
+        """
+        if size not in self.local_grids:
+            if self.trail is not None:
+                self.local_grids[size] = self.trail.local_grid_at(self.step, size)
+            else:
+                detect_map = np.asarray(self.detect_map, dtype=np.float32)
+                cells, inside = self.grid_cells(detect_map.shape, np.array([self.index_x]), np.array([self.index_y]), size)
+                known = inside & np.asarray(self.known_mask, dtype=bool).ravel()[cells]
+                self.local_grids[size] = self.make_local_grid(detect_map.ravel()[cells], known, inside)[0]
+        return self.local_grids[size]
 
     def get_local_grid_str(self, size=3):
-        if self.detect_map is None or not self.detect_map:
+        if self.trail is None and np.size(self.detect_map) == 0:
             return "[Empty detection map]"
+        if size not in self.local_grid_strs:
+            self.local_grid_strs[size] = self.format_local_grid(self.get_local_grid(size))
+        return self.local_grid_strs[size]
+
+    @staticmethod
+    def grid_cells(shape, index_x, index_y, size):
+        """
+        Return the flat cells of the local grids around the positions (index_x, index_y), clipped to the map,
+        and whether each cell is inside the map, both of shape (positions, width, width).
+        """
+        rows, cols = shape
+        offsets = np.arange(-(size // 2), size // 2 + 1)
+        grid_rows = np.asarray(index_x)[:, None, None] + offsets[None, :, None]
+        grid_cols = np.asarray(index_y)[:, None, None] + offsets[None, None, :]
+        inside = (grid_rows >= 0) & (grid_rows < rows) & (grid_cols >= 0) & (grid_cols < cols)
+        cells = np.clip(grid_rows, 0, rows - 1) * cols + np.clip(grid_cols, 0, cols - 1)
+        return cells, inside
 
-        half = size // 2
-        rows = len(self.detect_map)
-        cols = len(self.detect_map[0]) if rows > 0 else 0
+    @classmethod
+    def make_local_grid(cls, elevations, known, inside):
+        grid = np.zeros(known.shape, dtype=cls.local_grid_dtype)
+        grid["elevation"] = np.where(known, elevations, 0)
+        grid["known"] = known
+        grid["inside"] = inside
+        return grid
 
+    @staticmethod
+    def format_local_grid(grid):
+        """
+        Format a local grid as one line, the Log position shown as 'x' and unknown cells as '?'.
+        """
+        half = len(grid) // 2
         lines = []
-        for i in range(self.index_x - half, self.index_x + half + 1):
+        for i, row in enumerate(grid.tolist()):
             line = ""
-            for j in range(self.index_y - half, self.index_y + half + 1):
-                if i == self.index_x and j == self.index_y:
+            for j, (elevation, known, inside) in enumerate(row):
+                if i == half and j == half:
                     cell = f"{'x':^5}"
-                elif 0 <= i < rows and 0 <= j < cols:
-                    val = self.detect_map[i][j]
-                    if val == 114514:
+                elif inside:
+                    if not known:
                         cell = f"{'?':^5}"
                     else:
-                        cell = f"{int(val):^5}"
+                        cell = f"{int(elevation):^5}"
                 else:
                     cell = " " * 5
                 line += cell
@@ -53,4 +142,4 @@ class Log:
         return " ".join(lines)
 
     def print_log(self):
-        print(self.__str__())
\ No newline at end of file
+        print(self.__str__())
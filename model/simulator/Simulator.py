@@ -3,20 +3,30 @@ import glob
 import os
 import time
 import csv
+import shutil
 import uuid
-from collections import deque
-from itertools import cycle
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
 from sympy import false
-from matplotlib.colors import LightSource
+from matplotlib.cm import ScalarMappable
+from matplotlib.collections import LineCollection
 
 from model.simulator.MapManager import MapManager
 from model.simulator.Log import Log
 from model.simulator.environment import Environment
 from model.simulator.task import Task
+from model.simulator.traversability import TraversabilityMap
+from model.simulator.cost_model import CostModel
+from model.simulator.reachability import ReachabilityIndex
+from model.simulator.distance_field import DistanceField
+from model.simulator.cluster_graph import ClusterGraph
+from model.simulator.run_archive import RunArchive
+from model.simulator.map_layers import MapLayers
+from model.simulator.frame_renderer import FrameRenderer, init_frame_worker, render_frame
+from model.simulator.frame_rasterizer import RasterFrameRenderer
 from model.avatar import Avatar, DetectionMask,  Sensor
 import model.brain as Brain
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
@@ -45,7 +55,7 @@ class Simulator:
         target_environment (Environment): The current environment setup for the simulation.
         target_task (Task or None): The specific task assigned to this simulation.
         map_manager (MapManager): Handles map-related operations and management.
-        result_trail (list of Log or None): A list to log the paths taken by the avatar during simulation.
+        result_trail (Trail of Log or None): The logs of the path taken by the avatar during simulation.
         map_minValue (float): Minimum value in the map data (e.g., elevation).
         map_maxValue (float): Maximum value in the map data.
         path_finding_result (bool): Flag to indicate if a valid pathfinding result was found.
@@ -56,11 +66,41 @@ class Simulator:
         database_available (bool): Indicates whether database integration is enabled/available.
         avatars (list): A list to store multiple Avatar instances if needed. (Used in of_database mode)
         max_image (int): Maximum number of images that can be handled/generated.
+        target_map_name (str or None): Name of the map currently stored in target_map.
+        traversability_cache (dict): TraversabilityMap objects keyed by (map, avatar, slope limit, environment).
+        cost_model_cache (dict): CostModel objects keyed by (map, avatar, time per grid).
+        reachability_cache (dict): ReachabilityIndex objects keyed like traversability_cache.
+        fail_fast_unreachable (bool): Skip running the brain when the destination is not connected to the start.
+        destination_reachable (bool): Whether the destination of the last run was connected to the start.
+        start_component_size (int): Number of grids reachable from the start of the last run.
+        distance_field_cache (OrderedDict): DistanceField objects keyed by (traversability key, time per grid, destination),
+            least recently used first.
+        max_distance_fields (int): Number of DistanceField objects kept in distance_field_cache.
+        cluster_graph_cache (dict): ClusterGraph objects keyed by (traversability key, time per grid),
+            also saved next to the map file.
+        archive_directory_path (str): Directory the RunArchive of every processed run is saved in.
+        max_run_archives (int): Number of run archives kept, the oldest deleted first.
+        run_archive (RunArchive or None): The archive of the last processed run.
+        journal_path (str or None): File the brain journals the trail of each run to while it runs, None for no journal.
+        frame_renderer (FrameRenderer or None): The renderer of the frames of the current map and task,
+            keyed by frame_renderer_key.
+        map_layers_cache (dict): MapLayers objects keyed by (map, min value, max value), also saved next to the map file.
+        render_workers (int): Number of processes plot_results renders the frames with, 1 to render in this process.
+        pool_frames_per_worker (int): Frames each worker must get for plot_results to start the pool, fewer
+            frames are rendered in this process, where they do not pay for starting and initializing the workers.
+        frame_render_stats (tuple or None): (frames, seconds, workers) of the last plot_results.
+        frame_backends (dict): Frame renderer classes by name, "matplotlib" for FrameRenderer
+            and "numpy" for RasterFrameRenderer.
+        frame_backend (str): Name of the frame renderer the frames are drawn with.
+        frame_files (bool): Whether the frames are saved as elevation_map_{n}.png files in result_directory_path.
+        frame_listener (callable or None): Called with (frame index, step, frame as an RGB array)
+            for every frame rendered, in the order of the frames.
         """
 
         self.target_map=[]
+        self.target_map_name=None
         self.target_avatar=None
-        self.brain_list=["greedy","astar", "dfs"]
+        self.brain_list=["greedy","astar", "dfs", "astar_planner", "dial", "dstar_lite", "hpa"]
         self.avatar_manager=None
         self.target_brain=None
         self.target_environment=Environment()
@@ -72,6 +112,9 @@ class Simulator:
         self.path_finding_result = False
 
         self.path_finding_counter = 0
+        # Whether the CSV export and the frames of result_trail were written while it ran
+        self.output_streamed = False
+        self.frames_streamed = False
 
         self.result_directory_path = "cache_directory"
         self.result_directory_path_2 = "cache_directory_2"
@@ -79,6 +122,29 @@ class Simulator:
         self.database_available = database_available
         self.avatars = []
         self.max_image = 200
+        self.traversability_cache = {}
+        self.cost_model_cache = {}
+        self.reachability_cache = {}
+        self.fail_fast_unreachable = True
+        self.destination_reachable = False
+        self.start_component_size = 0
+        self.distance_field_cache = OrderedDict()
+        self.max_distance_fields = 8
+        self.cluster_graph_cache = {}
+        self.archive_directory_path = "run_archive"
+        self.max_run_archives = 50
+        self.run_archive = None
+        self.journal_path = None
+        self.frame_renderer = None
+        self.frame_renderer_key = None
+        self.map_layers_cache = {}
+        self.render_workers = 1
+        self.pool_frames_per_worker = 100
+        self.frame_render_stats = None
+        self.frame_backends = {"matplotlib": FrameRenderer, "numpy": RasterFrameRenderer}
+        self.frame_backend = "matplotlib"
+        self.frame_files = True
+        self.frame_listener = None
 
     def set_avatar(self, name):
         """
@@ -250,6 +316,61 @@ class Simulator:
             print("The max image number is out of range [100,400]")
             return False
 
+    def set_render_workers(self, number:int):
+        """
+        Set the number of processes plot_results renders the frames with, 0 for one per CPU. Returns True if successful.
+        The pool is off by default; plot_results starts at most one worker per pool_frames_per_worker frames,
+        and renders in this process when that is a single worker.
+        """
+        if number < 0:
+            print("The render worker number cannot be negative")
+            return False
+        self.render_workers = number if number > 0 else (os.cpu_count() or 1)
+        return True
+
+    def set_frame_backend(self, name:str):
+        """
+        Choose the frame renderer by name, one of frame_backends. Returns True if successful.
+        """
+        if name not in self.frame_backends:
+            print(f"The frame backend {name} is not one of {list(self.frame_backends)}")
+            return False
+        self.frame_backend = name
+        return True
+
+    def set_frame_files(self, enabled:bool):
+        """
+        Choose whether the frames are saved as image files; a frame_listener gets them either way.
+        """
+        self.frame_files = bool(enabled)
+        return True
+
+    def set_frame_listener(self, listener):
+        """
+        Publish every rendered frame to listener, called with (frame index, step, frame as an RGB array),
+        or stop publishing with None.
+        """
+        if listener is not None and not callable(listener):
+            print("The frame listener must be callable")
+            return False
+        self.frame_listener = listener
+        return True
+
+    def set_fail_fast(self, enabled:bool):
+        """
+        Choose whether tasks whose destination is not connected to the start are failed without running the brain.
+        """
+        self.fail_fast_unreachable = enabled
+        return True
+
+    def set_journal(self, path):
+        """
+        Journal the trail of each run to path as the brain records it, or stop journaling when path is None.
+        A TrailJournalReader on path can follow the run from another process, or recover it after a crash.
+        """
+        self.journal_path = path
+        return True
+
     def set_map(self, name:str):
         """
         set the target_map to the user wanted
@@ -262,6 +383,7 @@ class Simulator:
             return False
         else:
             (self.target_map, self.map_minValue, self.map_maxValue) = (t_map, t_min, t_max)
+            self.target_map_name = name
             if self.target_brain is not None:
                 self.target_brain.set_original_map(self.target_map)
             #self.current_map = t_map
@@ -335,6 +457,14 @@ class Simulator:
                 self.target_brain = Brain.BrainAStar()
             case "dfs":
                 self.target_brain = Brain.BrainDFS()
+            case "astar_planner":
+                self.target_brain = Brain.BrainAStarPlanner()
+            case "dial":
+                self.target_brain = Brain.BrainDial()
+            case "dstar_lite":
+                self.target_brain = Brain.BrainDStarLite()
+            case "hpa":
+                self.target_brain = Brain.BrainHPAStar()
             case _:
                 return False
 
@@ -359,18 +489,200 @@ class Simulator:
         return True
 
 
+    def get_traversability_key(self):
+        """
+        Return the (map, avatar, slope limit, friction, gravity) key the movability of the terrain depends on.
+        """
+        return (self.target_map_name, self.target_avatar.id, self.target_avatar.max_slope,
+                self.target_environment.get_friction(), self.target_environment.get_gravity())
+
+    def get_traversability(self):
+        """
+        Return the TraversabilityMap of the current map, avatar and environment.
+        It is built once per traversability key and served from the cache afterwards.
+        """
+        key = self.get_traversability_key()
+        if key not in self.traversability_cache:
+            self.traversability_cache[key] = TraversabilityMap(self.target_map, self.target_avatar.max_slope)
+        return self.traversability_cache[key]
+
+    def get_cost_model(self):
+        """
+        Return the CostModel of the current map and avatar.
+        It is built once per (map, avatar, time per grid) and served from the cache afterwards.
+        """
+        base_time = self.target_avatar.calculate_time_per_grid()
+        key = (self.target_map_name, self.target_avatar.id, base_time)
+        if key not in self.cost_model_cache:
+            self.cost_model_cache[key] = CostModel(self.target_map, base_time)
+        return self.cost_model_cache[key]
+
+    def get_reachability(self):
+        """
+        Return the ReachabilityIndex of the current map, avatar and environment.
+        It is built once per traversability key and served from the cache afterwards.
+        """
+        key = self.get_traversability_key()
+        if key not in self.reachability_cache:
+            self.reachability_cache[key] = ReachabilityIndex(self.get_traversability())
+        return self.reachability_cache[key]
+
+    def check_reachability(self):
+        """
+        Check whether the destination of the target task is connected to its start for the current slope limit.
+        :return: (connected, number of grids reachable from the start)
+        """
+        reachability = self.get_reachability()
+        start_x, start_y = self.target_task.start_row, self.target_task.start_col
+        connected = reachability.connected(start_x, start_y, self.target_task.des_row, self.target_task.des_col)
+        return connected, reachability.component_size(start_x, start_y)
+
+    def get_distance_field(self):
+        """
+        Return the DistanceField towards the destination of the target task.
+        It is built once per destination of the current map, avatar and environment, so repeated
+        tasks to the same destination cost a lookup; the least recently used fields are dropped
+        beyond max_distance_fields.
+        """
+        cost_model = self.get_cost_model()
+        destination = (self.target_task.des_row, self.target_task.des_col)
+        key = (self.get_traversability_key(), cost_model.base_time, destination)
+        if key in self.distance_field_cache:
+            self.distance_field_cache.move_to_end(key)
+        else:
+            self.distance_field_cache[key] = DistanceField(self.get_traversability(), cost_model, *destination)
+            while len(self.distance_field_cache) > self.max_distance_fields:
+                self.distance_field_cache.popitem(last=False)
+        return self.distance_field_cache[key]
+
+    def get_cluster_graph(self):
+        """
+        Return the ClusterGraph of the current map, avatar and environment.
+        It is loaded from the file saved next to the map when there is one, built and saved otherwise,
+        and served from the cache afterwards.
+        """
+        traversability, cost_model = self.get_traversability(), self.get_cost_model()
+        key = (self.get_traversability_key(), cost_model.base_time)
+        if key in self.cluster_graph_cache:
+            return self.cluster_graph_cache[key]
+
+        checksum = ClusterGraph.terrain_checksum(traversability, cost_model)
+        path = os.path.join(self.map_manager.map_path,
+                            f"{self.target_map_name}.clusters_{ClusterGraph.cluster_size}_{checksum:08x}.npz")
+        cluster_graph = None
+        if os.path.exists(path):
+            cluster_graph = ClusterGraph.load(path, traversability, cost_model)
+        if cluster_graph is None:
+            cluster_graph = ClusterGraph(traversability, cost_model)
+            try:
+                cluster_graph.save(path)
+            except OSError as e:
+                print(f"Error saving cluster graph {path}: {e}")
+
+        self.cluster_graph_cache[key] = cluster_graph
+        return cluster_graph
+
+    def get_map_layers(self):
+        """
+        Return the MapLayers of the current map, the static layers every frame is composited from.
+        They are loaded from the file saved next to the map when there is one, built and saved otherwise,
+        and served from the cache afterwards, so switching back to a map does not rebuild them.
+        """
+        key = (self.target_map_name, self.map_minValue, self.map_maxValue)
+        if key in self.map_layers_cache:
+            return self.map_layers_cache[key]
+
+        checksum = MapLayers.map_checksum(self.target_map, self.map_minValue, self.map_maxValue)
+        path = os.path.join(self.map_manager.map_path, f"{self.target_map_name}.layers_{checksum:08x}.npz")
+        map_layers = None
+        if os.path.exists(path):
+            map_layers = MapLayers.load(path, self.target_map, self.map_minValue, self.map_maxValue)
+        if map_layers is None:
+            map_layers = MapLayers(self.target_map, self.map_minValue, self.map_maxValue)
+            try:
+                map_layers.save(path)
+            except OSError as e:
+                print(f"Error saving map layers {path}: {e}")
+
+        self.map_layers_cache[key] = map_layers
+        return map_layers
+
+    def prepare_brain(self):
+        """
+        Hand the cached terrain models of the current map, avatar and environment to the target brain,
+        and the distance field of the destination or the cluster graph to brains that use them.
+        """
+        self.target_brain.set_journal_path(self.journal_path)
+        if len(self.target_map) != 0 and self.target_avatar is not None:
+            self.target_brain.set_traversability(self.get_traversability())
+            self.target_brain.set_cost_model(self.get_cost_model())
+            if self.target_brain.uses_distance_field and self.target_task is not None:
+                self.target_brain.set_distance_field(self.get_distance_field())
+            if self.target_brain.uses_cluster_graph:
+                self.target_brain.set_cluster_graph(self.get_cluster_graph())
+
+    def run_steps(self):
+        """
+        Reset and run the target brain on the target task as a generator, yielding the Log of every step
+        as the brain records it, and finishing with (trail, success).
+        When fail_fast_unreachable is set and the destination is not connected to the start,
+        the brain is skipped and the trail only holds the start position.
+        The journal of the trail, if any, is closed when the run ends or the generator is closed.
+        The body only starts on the first step, after run_streamed() has opened the step output.
+        """
+        self.frame_render_stats = None
+        self.prepare_brain()
+        self.target_brain.reset()
+
+        try:
+            self.destination_reachable, self.start_component_size = self.check_reachability()
+            if self.fail_fast_unreachable and not self.destination_reachable:
+                print(f"The destination is not connected to the start ({self.start_component_size} grids reachable), task failed")
+                trail = self.target_brain.start_trail()
+                yield trail[-1]
+                return trail, False
+
+            return (yield from self.target_brain.steps())
+        finally:
+            self.target_brain.get_trail().close_journal()
+
+    def run_brain(self):
+        """
+        Reset and run the target brain on the target task to the end.
+        :return: (trail, success)
+        """
+        self.output_streamed = False
+        self.frames_streamed = False
+        return self.target_brain.run_to_end(self.run_steps())
+
+    def run_streamed(self, render=False):
+        """
+        Run the target brain, piping each step into the CSV export as it is recorded,
+        and into the frames as well when render is set.
+        :return: (trail, success)
+        """
+        steps = self.run_steps()
+        self.start_step_output(render)
+        try:
+            while True:
+                try:
+                    log = next(steps)
+                except StopIteration as finished:
+                    return finished.value
+                self.write_step_output(log)
+        finally:
+            self.finish_step_output()
+
     # Run the simulation and generate the results
     def run(self):
         if self.target_brain.is_ready_to_run():
             self.path_finding_result = False
             self.clear_directory()
-            self.target_brain.reset()
             self.path_finding_counter = 0
-            self.result_trail, self.path_finding_result=self.target_brain.run()
-            self.export_logs_to_csv()
-            self.plot_results()
+            self.result_trail, self.path_finding_result = self.run_streamed(render=True)
             self.plot_full_map()
             self.generate_simulation_report()
+            self.save_run_archive()
             return True, self.path_finding_result
         else:
             print("The target brain is not ready yet")
@@ -382,7 +694,7 @@ class Simulator:
     """
     def run_simulation(self):
         """
-        Run the simulation using the target brain if ready.
+        Run the simulation using the target brain if ready, exporting the logs while it runs.
         Returns success flag, path result, estimated time, and virtual time.
         """
         if self.target_brain is None:
@@ -392,9 +704,8 @@ class Simulator:
         if self.target_brain.is_ready_to_run():
             self.path_finding_result = False
             self.clear_directory()
-            self.target_brain.reset()
             self.path_finding_counter = 0
-            self.result_trail, self.path_finding_result = self.target_brain.run()
+            self.result_trail, self.path_finding_result = self.run_streamed()
 
             total_logs = len(self.result_trail)
             step = max(1, total_logs // self.max_image + 1)
@@ -415,10 +726,13 @@ class Simulator:
             print("No result trail to process.")
             return
 
-        self.export_logs_to_csv()
-        self.plot_results()
+        if not self.output_streamed:
+            self.export_logs_to_csv()
+        if not self.frames_streamed:
+            self.plot_results()
         self.plot_full_map()
         self.generate_simulation_report()
+        self.save_run_archive()
 
     # The overall function to plot the result
     def plot_results(self):
@@ -431,122 +745,113 @@ class Simulator:
         if total_logs == 0:
             print("No result trail found.")
             return
+        if not self.frame_files and self.frame_listener is None:
+            print("Frame files are off and no frame listener is set. Skipping the frames.")
+            return
 
         step = max(1, total_logs // self.max_image + 1)
         trail_length = 3 + step
-        img_index = 0
 
-        for i in range(0, total_logs, step):
-            if self.path_finding_counter >= self.max_image:
-                print("Maximum image count reached. Skipping further image generation.")
-                break
+        frame_steps = np.arange(0, total_logs, step)
+        if len(frame_steps) > self.max_image - self.path_finding_counter:
+            print("Maximum image count reached. Skipping further image generation.")
+            frame_steps = frame_steps[:max(0, self.max_image - self.path_finding_counter)]
+        index_x, index_y = self.result_trail.get_index_x(), self.result_trail.get_index_y()
 
+        frames = []
+        for img_index, i in enumerate(frame_steps.tolist()):
             start_index = max(0, i - trail_length + 1)
-            recent_positions = [
-                (log.get_index_x(), log.get_index_y()) for log in self.result_trail[start_index:i + 1]
-            ]
-
-            log = self.result_trail[i]
-            save_path = os.path.join(self.result_directory_path, f'elevation_map_{img_index}.png')
-            print(f"Saving elevation map to {save_path}")
-
-            self.plot_elevation_map(
-                elevation_data=log.get_detect_map(),
-                undetected_val=114514,
-                avatar_positions=recent_positions,
-                save_path=save_path
-            )
-            self.path_finding_counter += 1
-            img_index += 1
+            recent_positions = list(zip(index_x[start_index:i + 1].tolist(), index_y[start_index:i + 1].tolist()))
+            frames.append((i, recent_positions, self.get_frame_path(img_index)))
 
-    def plot_elevation_map(self, elevation_data, undetected_val, avatar_positions=None,
-                           save_path=None, show_colorbar=False):
+        start_time = time.perf_counter()
+        workers = min(self.render_workers, len(frames) // self.pool_frames_per_worker)
+        if workers > 1:
+            self.render_frames_in_pool(frames, workers)
+        else:
+            workers = 1
+            # Replay the detect maps of the sampled steps from the trail deltas
+            for img_index, ((i, recent_positions, _), (_, _, known_mask)) in enumerate(zip(
+                    frames, self.result_trail.iter_maps(frame_steps))):
+                self.output_frame(img_index, i, known_mask, recent_positions)
+        self.path_finding_counter += len(frames)
+
+        elapsed = time.perf_counter() - start_time
+        self.frame_render_stats = (len(frames), elapsed, workers)
+        if frames:
+            print(f"Rendered {len(frames)} {self.frame_backend} frames in {elapsed:.2f} s with {workers} worker(s), "
+                  f"{len(frames) / max(elapsed, 1e-9):.1f} frames/s")
+
+    def render_frames_in_pool(self, frames, workers):
         """
-        Plot a single elevation map with optional avatar trail and save or show it.
-        It adds the original map as the background and add light and shadowing.
+        Render frames, (step, avatar positions, save path or None) tuples, over a pool of worker processes.
+        Every worker is initialized once with the map layers, the task and the trail, and rebuilds
+        the known mask of its frames from the trail; each frame is saved under its own index,
+        so the files are the same whatever order the workers finish in. With a frame_listener,
+        the workers send the frames back and they are published in order.
         """
+        initargs = (self.frame_backends[self.frame_backend], self.get_map_layers(), self.target_task, self.result_trail,
+                    self.frame_listener is not None)
+        chunksize = max(1, len(frames) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_frame_worker, initargs=initargs) as executor:
+            for img_index, (save_path, frame) in enumerate(executor.map(render_frame, frames, chunksize=chunksize)):
+                if save_path:
+                    print(f"Saved map to {save_path}")
+                if self.frame_listener is not None:
+                    self.frame_listener(img_index, frames[img_index][0], frame)
+
+    def get_frame_path(self, index):
+        """
+        Return the file frame index is saved to, or None when frame_files is off.
+        """
+        if not self.frame_files:
+            return None
+        return os.path.join(self.result_directory_path, f'elevation_map_{index}.png')
 
-        fig, ax = plt.subplots(figsize=(10, 10), dpi=100)
-
-        elevation_data = np.array(elevation_data, dtype=np.float32)
-
-        if self.target_map is not None:
-            current_map = np.array(self.target_map, dtype=np.float32)
-            cmap_bg = plt.get_cmap('terrain')
-            norm_bg = mcolors.Normalize(vmin=self.map_minValue, vmax=self.map_maxValue)
-            ax.imshow(current_map, cmap=cmap_bg, norm=norm_bg, alpha=0.6)
-
-        masked_data = np.ma.masked_where(elevation_data == undetected_val, elevation_data)
-
-        if masked_data.mask.all():
-            print("Warning: All elevation data is masked. No detected terrain to plot.")
-
-        cmap = plt.get_cmap('terrain')
-        cmap.set_bad(alpha=0)
-        norm = mcolors.Normalize(vmin=self.map_minValue, vmax=self.map_maxValue)
-
-        ls = LightSource(azdeg=315, altdeg=45)
-        hillshade = ls.hillshade(masked_data.filled(np.mean(elevation_data)), vert_exag=1, dx=1, dy=1)
-
-        ax.imshow(hillshade, cmap='gray', alpha=0.5)
-        img = ax.imshow(masked_data, cmap=cmap, norm=norm, alpha=0.7)
-        ax.contour(masked_data, levels=15, colors='black', linewidths=0.5, alpha=0.5)
-
-        # Draw avatar trail if available
-        if avatar_positions:
-            num_positions = len(avatar_positions)
-            trail_colors = ['yellow', 'orange', 'orangered', 'red']
-            color_cycle = cycle(trail_colors)
-
-            for i in range(1, num_positions):
-                start_pos = avatar_positions[i - 1]
-                end_pos = avatar_positions[i]
-                color = next(color_cycle)
-                ax.plot([start_pos[1], end_pos[1]], [start_pos[0], end_pos[0]], color=color, linewidth=2)
-
-            # Draw avatar's current position with direction
-            curr_pos = avatar_positions[-1]
-            if len(avatar_positions) > 1:
-                prev_pos = avatar_positions[-2]
-                dx = curr_pos[1] - prev_pos[1]
-                dy = curr_pos[0] - prev_pos[0]
-
-                if abs(dx) > abs(dy):
-                    marker = '>' if dx > 0 else '<'
-                else:
-                    marker = '^' if dy < 0 else 'v'
-            else:
-                marker = '>'
-
-            ax.plot(curr_pos[1], curr_pos[0], marker=marker, color='red', markersize=8)
-
-        if self.target_task:
-            start_x, start_y = self.target_task.start_row, self.target_task.start_col
-            end_x, end_y = self.target_task.des_row, self.target_task.des_col
-
-            # Plot start location (green circle)
-            ax.plot(start_y, start_x, marker='o', color='green', markersize=10, label="Start")
-
-            # Plot end location (blue square)
-            ax.plot(end_y, end_x, marker='s', color='blue', markersize=10, label="End")
-
-        ax.set_axis_off()
-        plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-        if show_colorbar:
-            axins = inset_axes(ax, width="3%", height="30%", loc='upper right', borderpad=2)
-            cbar = plt.colorbar(img, cax=axins)
-            cbar.ax.yaxis.set_label_position('left')
-            cbar.ax.yaxis.set_ticks_position('left')
-            cbar.set_label("")
-
+    def output_frame(self, index, step, known_mask, avatar_positions, show_colorbar=False, publish_index=None):
+        """
+        Render frame index of the run, showing step, save it when frame_files is set
+        and publish it to the frame_listener if there is one, as publish_index when it is given.
+        """
+        save_path = self.get_frame_path(index)
+        if save_path is None and self.frame_listener is None:
+            return
+        frame = self.plot_elevation_map(known_mask, avatar_positions, save_path=save_path,
+                                        show_colorbar=show_colorbar, return_image=self.frame_listener is not None)
+        if self.frame_listener is not None:
+            self.frame_listener(index if publish_index is None else publish_index, step, frame)
 
+    def plot_elevation_map(self, known_mask, avatar_positions=None, save_path=None, show_colorbar=False,
+                           return_image=False):
+        """
+        Plot a single elevation map with optional avatar trail and save it.
+        It adds the original map as the background and add light and shadowing.
+        Cells outside known_mask are left transparent.
+        The frames of a map and task share one FrameRenderer, which keeps its figure between frames.
+        The detect map holds the target map's values on the known grids, so the frame is drawn
+        from the cached MapLayers of the target map cut to known_mask.
+        :return: the frame as an RGB array when return_image is set.
+        """
+        frame = self.get_frame_renderer().render(known_mask, avatar_positions, save_path, show_colorbar, return_image)
         if save_path:
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            plt.savefig(save_path, bbox_inches='tight', pad_inches=0)
-            plt.close(fig)
             print(f"Saved map to {save_path}")
-        else:
+        elif not return_image:
             plt.show()
+        return frame if return_image else None
+
+    def get_frame_renderer(self):
+        """
+        Return the frame renderer of frame_backend for the current map and task,
+        replacing the one of a previous backend, map or task.
+        """
+        key = (self.frame_backend, self.target_map_name, id(self.target_map), self.map_minValue, self.map_maxValue,
+               tuple(self.target_task.get_task_information()) if self.target_task else None)
+        if self.frame_renderer is None or self.frame_renderer_key != key:
+            if self.frame_renderer is not None:
+                self.frame_renderer.close()
+            self.frame_renderer = self.frame_backends[self.frame_backend](self.get_map_layers(), self.target_task)
+            self.frame_renderer_key = key
+        return self.frame_renderer
 
     # Save the result to a log file
     def save_log_to_file(self):
@@ -564,19 +869,20 @@ class Simulator:
         file_path = os.path.join(folder, log_filename)
 
         with open(file_path, "w") as file:
-            for log in self.result_trail:
+            for step, detect_map, known_mask in self.result_trail.iter_maps():
+                log = self.result_trail[step]
                 file.write("\n")
                 file.write(
                     f"Avatar Position: ({log.index_x}, {log.index_y}) | Time: {log.time} | Energy: {log.energy}\n"
                 )
                 file.write("Detection Map:\n")
 
-                for i, row in enumerate(log.detect_map):
+                for i, row in enumerate(detect_map):
                     for j, value in enumerate(row):
                         if i == log.index_x and j == log.index_y:
                             file.write(f"({'{:.1f}'.format(value)}) ")
                         else:
-                            file.write(f"{'*' if value == 114514 else '{:5.1f}'.format(value):>5} ")
+                            file.write(f"{'*' if not known_mask[i, j] else '{:5.1f}'.format(value):>5} ")
                     file.write("\n")
 
                 file.write("\n")
@@ -586,6 +892,65 @@ class Simulator:
         self.log_counter += 1
 
 
+    def get_run_metadata(self):
+        """
+        Return the map, avatar, brain, environment and task of the last run, and its result, as a JSON-friendly dict.
+        """
+        trail = self.result_trail
+        return {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "map": self.target_map_name,
+            "avatar": self.target_avatar.name if self.target_avatar else None,
+            "brain": type(self.target_brain).__name__ if self.target_brain else None,
+            "friction": self.target_environment.get_friction() if self.target_environment else None,
+            "gravity": self.target_environment.get_gravity() if self.target_environment else None,
+            "task": self.target_task.get_task_information() if self.target_task else None,
+            "success": bool(self.path_finding_result),
+            "total_time": trail.get_time()[-1].item() if len(trail) else 0,
+            "energy_used": (trail.get_energy()[0] - trail.get_energy()[-1]).item() if len(trail) else 0,
+        }
+
+    def save_run_archive(self):
+        """
+        Save result_trail and the metadata of its run as a RunArchive in archive_directory_path,
+        named after the time, map and brain of the run, and delete the oldest archives past max_run_archives.
+        :return: the RunArchive, or None when there is no trail or it cannot be saved.
+        """
+        if not self.result_trail:
+            return None
+        metadata = self.get_run_metadata()
+        name = "_".join([time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:6],
+                         str(metadata["map"]), str(metadata["brain"])])
+        path = os.path.join(self.archive_directory_path, name)
+        try:
+            os.makedirs(self.archive_directory_path, exist_ok=True)
+            self.run_archive = RunArchive.save(path, self.result_trail, metadata)
+        except OSError as e:
+            print(f"Error saving run archive {path}: {e}")
+            return None
+        print(f"Run archived to {path}")
+
+        names = self.get_run_archive_names()
+        for old_name in names[:max(0, len(names) - self.max_run_archives)]:
+            shutil.rmtree(os.path.join(self.archive_directory_path, old_name), ignore_errors=True)
+        return self.run_archive
+
+    def get_run_archive_names(self):
+        """
+        :return: the names of the saved run archives, oldest first.
+        """
+        if not os.path.isdir(self.archive_directory_path):
+            return []
+        return sorted(name for name in os.listdir(self.archive_directory_path)
+                      if os.path.isfile(os.path.join(self.archive_directory_path, name, RunArchive.metadata_filename)))
+
+    def load_run_archive(self, name):
+        """
+        Open a saved run archive by name; its trail replays any step without rerunning the brain.
+        :return: the RunArchive, or None when there is no such archive.
+        """
+        return RunArchive.load(os.path.join(self.archive_directory_path, name))
+
     # Clear the cash directory
     def clear_directory(self, pattern="*.png"):
         """
@@ -613,42 +978,47 @@ class Simulator:
         final_pos = self.result_trail[-1].get_index_x(), self.result_trail[-1].get_index_y()
         print(f"Starting progressive reveal from final position: {final_pos}")
 
-        last_detected_map = np.array(self.result_trail[-1].get_detect_map(), dtype=np.float32)
-        detected_map = np.full_like(self.target_map, fill_value=114514, dtype=np.float32)
-        detected_map[last_detected_map != 114514] = self.target_map[last_detected_map != 114514]
-        avatar_path = [(log.get_index_x(), log.get_index_y()) for log in self.result_trail]
-
-        height, width = self.target_map.shape
-        corner_coords = [(0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)]
-        max_radius = max(np.hypot(final_pos[0] - x, final_pos[1] - y) for x, y in corner_coords)
+        trail_known_mask = np.array(self.result_trail[-1].get_known_mask(), dtype=bool)
+        avatar_path = list(zip(self.result_trail.get_index_x().tolist(), self.result_trail.get_index_y().tolist()))
 
         file_counter = self.path_finding_counter
 
-        for step in range(expansion_steps + 1):
-            current_radius = (step / expansion_steps) * max_radius
-            for i in range(self.target_map.shape[0]):
-                for j in range(self.target_map.shape[1]):
-                    if np.sqrt((i - final_pos[0]) ** 2 + (j - final_pos[1]) ** 2) <= current_radius:
-                        detected_map[i, j] = self.target_map[i, j]
-
-            save_path = os.path.join(self.result_directory_path, f"elevation_map_{file_counter}.png")
-            print(f"Saving transition step {step + 1}/{expansion_steps} to {save_path}")
+        reveals = self.progressive_reveal(self.target_map, trail_known_mask, final_pos, expansion_steps)
+        for step, (_, known_mask) in enumerate(reveals):
+            print(f"Rendering transition step {step + 1}/{expansion_steps}")
 
             show_colorbar = step == expansion_steps
 
-            self.plot_elevation_map(
-                elevation_data=detected_map,
-                undetected_val=114514,
-                avatar_positions=avatar_path,
-                save_path=save_path,
-                show_colorbar=show_colorbar,
-            )
+            # The reveal frames all show the last step of the run
+            self.output_frame(file_counter, len(self.result_trail) - 1, known_mask, avatar_path,
+                              show_colorbar=show_colorbar)
 
             file_counter += 1
 
-        print(f"Final full map saved as elevation_map_{file_counter - 1}.png")
+        if self.frame_files:
+            print(f"Final full map saved as elevation_map_{file_counter - 1}.png")
         self.path_finding_counter = file_counter
 
+    @staticmethod
+    def progressive_reveal(full_map, known_mask, position, expansion_steps):
+        """
+        Reveal full_map in expansion_steps + 1 steps of growing radius around position, on top of known_mask,
+        the last step reaching every corner.
+        The distance of every grid from position is computed once, each step is a threshold on it.
+        :return: a generator of (detected_map, known_mask) per step.
+        """
+        height, width = np.shape(full_map)
+        corner_coords = [(0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)]
+        max_radius = max(np.hypot(position[0] - x, position[1] - y) for x, y in corner_coords)
+
+        rows, cols = np.ogrid[:height, :width]
+        distance = np.sqrt((rows - position[0]) ** 2 + (cols - position[1]) ** 2)
+
+        for step in range(expansion_steps + 1):
+            current_radius = (step / expansion_steps) * max_radius
+            step_known_mask = known_mask | (distance <= current_radius)
+            yield np.where(step_known_mask, full_map, 0).astype(np.float32), step_known_mask
+
     def plot_full_map_set_map(self, save_path=None, task=None):
         """
         Plot and optionally save the full static terrain map with start and end points.
@@ -656,23 +1026,17 @@ class Simulator:
 
         fig, ax = plt.subplots(figsize=(10, 10), dpi=100)
 
-        terrain_map = np.array(self.target_map, dtype=np.float32)
-        cmap = plt.get_cmap('terrain')
-        norm = mcolors.Normalize(vmin=self.map_minValue, vmax=self.map_maxValue)
-
-        ls = LightSource(azdeg=315, altdeg=45)
-        hillshade = ls.hillshade(terrain_map, vert_exag=1, dx=1, dy=1)
-
-        ax.imshow(hillshade, cmap='gray', alpha=0.5)
-        img = ax.imshow(terrain_map, cmap=cmap, norm=norm, alpha=0.7)
-        ax.contour(terrain_map, levels=15, colors='black', linewidths=0.5, alpha=0.5)
+        layers = self.get_map_layers()
+        ax.imshow(layers.hillshade, cmap='gray', alpha=0.5)
+        ax.imshow(layers.terrain_rgba, alpha=0.7)
+        ax.add_collection(LineCollection(layers.contour_segments, colors='black', linewidths=0.5, alpha=0.5))
 
         ax.set_axis_off()
         plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
 
 
         axins = inset_axes(ax, width="3%", height="30%", loc='upper right', borderpad=2)
-        cbar = plt.colorbar(img, cax=axins)
+        cbar = plt.colorbar(ScalarMappable(norm=layers.norm, cmap=layers.cmap), cax=axins)
         cbar.ax.yaxis.set_label_position('left')
         cbar.ax.yaxis.set_ticks_position('left')
         cbar.set_label("")
@@ -703,6 +1067,36 @@ class Simulator:
             print("No result trail to export.")
             return
 
+        friction = self.target_environment.get_friction() if self.target_environment else 0
+        file_path, csvfile, writer = self.open_log_csv(csv_filename)
+        if writer is None:
+            return
+
+        with csvfile:
+            trail = self.result_trail
+            elevations, known = trail.position_elevations()
+            local_grids = trail.local_grids()
+            for log_id, (x, y, time_val, energy_val) in enumerate(zip(
+                    trail.get_index_x().tolist(), trail.get_index_y().tolist(),
+                    trail.get_time().tolist(), trail.get_energy().tolist())):
+                writer.writerow({
+                    "log_id": log_id,
+                    "x": x,
+                    "y": y,
+                    "time": time_val,
+                    "energy": energy_val,
+                    "elevation": elevations[log_id] if known[log_id] else "N/A",
+                    "friction": friction,
+                    "local_grid": Log.format_local_grid(local_grids[log_id])
+                })
+
+        print(f"Logs exported to {file_path}")
+
+    def open_log_csv(self, csv_filename="log_export.csv"):
+        """
+        Replace the CSV export in the result directory with a new file holding only the header.
+        :return: (file path, open file, csv.DictWriter), the file and writer None if the old file cannot be deleted.
+        """
         file_path = os.path.join(self.result_directory_path, csv_filename)
         os.makedirs(self.result_directory_path, exist_ok=True)
 
@@ -712,40 +1106,97 @@ class Simulator:
                 print(f"Old log file deleted: {file_path}")
             except Exception as e:
                 print(f"Error deleting file {file_path}: {e}")
+                return file_path, None, None
+
+        csvfile = open(file_path, mode='w', newline='')
+        fieldnames = [
+            "log_id", "x", "y", "time", "energy",
+            "elevation", "friction", "local_grid"
+        ]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        return file_path, csvfile, writer
+
+    def start_step_output(self, render=False, csv_filename="log_export.csv"):
+        """
+        Open the CSV export, and reset the frames when render is set,
+        before the steps of a run are piped into write_step_output().
+        """
+        self.output_streamed = True
+        self.frames_streamed = render
+        self.step_csv_path, self.step_csv_file, self.step_csv_writer = self.open_log_csv(csv_filename)
+        self.step_friction = self.target_environment.get_friction() if self.target_environment else 0
+        self.frame_stride = 1
+        self.frame_steps = []
+        # Frames handed to the frame_listener, which keep counting up when thin_frames() renumbers the files
+        self.frames_published = 0
+
+    def write_step_output(self, log):
+        """
+        Write the CSV row of a step as soon as the brain records it, and its frame when the step falls on frame_stride.
+        The length of the run is not known yet, so the frames start on every step; once max_image frames
+        are written the stride doubles and every other frame is dropped, keeping the frames evenly spread.
+        """
+        step = log.step
+        if self.step_csv_writer is not None:
+            grid = log.get_local_grid()
+            centre = grid[len(grid) // 2, len(grid) // 2]
+            self.step_csv_writer.writerow({
+                "log_id": step,
+                "x": log.get_index_x(),
+                "y": log.get_index_y(),
+                "time": log.get_time(),
+                "energy": log.get_energy(),
+                "elevation": centre["elevation"] if centre["known"] else "N/A",
+                "friction": self.step_friction,
+                "local_grid": Log.format_local_grid(grid)
+            })
+
+        if not self.frames_streamed or self.max_image <= 0 or step % self.frame_stride != 0:
+            return
+        if len(self.frame_steps) >= self.max_image:
+            self.thin_frames()
+            if step % self.frame_stride != 0:
                 return
 
-        friction = self.target_environment.get_friction() if self.target_environment else 0
+        trail = log.trail
+        start_index = max(0, step - (3 + self.frame_stride) + 1)
+        recent_positions = list(zip(trail.get_index_x()[start_index:step + 1].tolist(),
+                                    trail.get_index_y()[start_index:step + 1].tolist()))
+        self.output_frame(len(self.frame_steps), step, log.get_known_mask(), recent_positions,
+                          publish_index=self.frames_published)
+        self.frame_steps.append(step)
+        self.frames_published += 1
 
-        with open(file_path, mode='w', newline='') as csvfile:
-            fieldnames = [
-                "log_id", "x", "y", "time", "energy",
-                "elevation", "friction", "local_grid"
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for log_id, log in enumerate(self.result_trail):
-                x = log.get_index_x()
-                y = log.get_index_y()
-                detect_map = log.get_detect_map()
-
-                elevation = (
-                    detect_map[x][y] if 0 <= x < len(detect_map) and 0 <= y < len(detect_map[0])
-                    else "N/A"
-                )
-
-                writer.writerow({
-                    "log_id": log_id,
-                    "x": x,
-                    "y": y,
-                    "time": log.get_time(),
-                    "energy": log.get_energy(),
-                    "elevation": elevation,
-                    "friction": friction,
-                    "local_grid": log.local_grid
-                })
+    def thin_frames(self):
+        """
+        Double frame_stride, deleting the frames off the new stride and renumbering the others in order.
+        Frames already published to the frame_listener stay published.
+        Frames without a file, saved while frame_files was off or deleted since, are skipped.
+        """
+        self.frame_stride *= 2
+        for index in range(len(self.frame_steps)):
+            path = os.path.join(self.result_directory_path, f'elevation_map_{index}.png')
+            if not index or not os.path.isfile(path):
+                continue
+            try:
+                if index % 2:
+                    os.remove(path)
+                else:
+                    os.replace(path, os.path.join(self.result_directory_path, f'elevation_map_{index // 2}.png'))
+            except OSError as e:
+                print(f"Error thinning frame {path}: {e}")
+        self.frame_steps = self.frame_steps[::2]
 
-        print(f"Logs exported to {file_path}")
+    def finish_step_output(self):
+        """
+        Close the CSV export of a run piped through write_step_output() and count its frames.
+        """
+        if self.step_csv_file is not None:
+            self.step_csv_file.close()
+            print(f"Logs exported to {self.step_csv_path}")
+        if self.frames_streamed:
+            self.path_finding_counter = len(self.frame_steps)
 
 
     def generate_simulation_report(self):
@@ -827,6 +1278,14 @@ class Simulator:
                     file.write("Algorithm: Greedy pathfinding\n")
                 elif brain_type == "BrainAStar":
                     file.write("Algorithm: A* pathfinding\n")
+                elif brain_type == "BrainAStarPlanner":
+                    file.write("Algorithm: A* pathfinding with replanning on revealed terrain\n")
+                elif brain_type == "BrainDial":
+                    file.write("Algorithm: Dijkstra pathfinding with a bucket queue (Dial's algorithm)\n")
+                elif brain_type == "BrainDStarLite":
+                    file.write("Algorithm: D* Lite pathfinding, repairing the search around revealed terrain\n")
+                elif brain_type == "BrainHPAStar":
+                    file.write("Algorithm: Hierarchical A* (HPA*) pathfinding on map clusters\n")
             else:
                 file.write("No brain has been set.\n")
             file.write("\n")
@@ -887,12 +1346,16 @@ class Simulator:
             file.write("SIMULATION RESULTS\n")
             file.write("-" * 80 + "\n")
             file.write(f"Path Finding Success: {self.path_finding_result}\n")
+            file.write(f"Destination Reachable: {self.destination_reachable} "
+                       f"({self.start_component_size} grids reachable from the start)\n")
 
             if self.result_trail:
-                num_steps = len(self.result_trail)
-                total_time = self.result_trail[-1].get_time() if num_steps > 0 else 0
-                start_energy = self.result_trail[0].get_energy() if num_steps > 0 else 0
-                end_energy = self.result_trail[-1].get_energy() if num_steps > 0 else 0
+                trail = self.result_trail
+                num_steps = len(trail)
+                times, energies = trail.get_time(), trail.get_energy()
+                total_time = times[-1]
+                start_energy = energies[0]
+                end_energy = energies[-1]
                 energy_used = start_energy - end_energy
 
                 file.write(f"Number of Steps: {num_steps}\n")
@@ -900,6 +1363,15 @@ class Simulator:
                 file.write(f"Starting Energy: {start_energy:.2f}\n")
                 file.write(f"Ending Energy: {end_energy:.2f}\n")
                 file.write(f"Energy Used: {energy_used:.2f}\n")
+                column_bytes, delta_bytes, keyframe_bytes = trail.nbytes()
+                file.write(f"Trail Memory: {(column_bytes + delta_bytes + keyframe_bytes) / 2 ** 20:.2f} MB "
+                           f"({column_bytes / 2 ** 20:.2f} MB of step columns, {delta_bytes / 2 ** 20:.2f} MB of deltas, "
+                           f"{keyframe_bytes / 2 ** 20:.2f} MB of keyframes; "
+                           f"{trail.snapshot_nbytes() / 2 ** 20:.2f} MB as a map copy per step)\n")
+                if self.frame_render_stats is not None and self.frame_render_stats[0] > 0:
+                    frames, seconds, workers = self.frame_render_stats
+                    file.write(f"Frame Rendering: {frames} {self.frame_backend} frames in {seconds:.2f} s with {workers} worker(s), "
+                               f"{frames / max(seconds, 1e-9):.1f} frames/s\n")
                 file.write("\n")
 
                 # Path Details
@@ -908,19 +1380,11 @@ class Simulator:
                 file.write(f"{'Step':>5} | {'Position':^10} | {'Time':>10} | {'Energy':>10} | {'Elevation':>10}\n")
                 file.write("-" * 80 + "\n")
 
-                for i, log in enumerate(self.result_trail):
-                    x, y = log.get_index_x(), log.get_index_y()
-                    time_val = log.get_time()
-                    energy_val = log.get_energy()
-
-                    # Get elevation from detection map if available
-                    elevation = "Unknown"
-                    detect_map = log.get_detect_map()
-                    if detect_map and 0 <= x < len(detect_map) and 0 <= y < len(detect_map[0]):
-                        elev_val = detect_map[x][y]
-                        if elev_val != 114514:  # Check if detected
-                            elevation = f"{elev_val:.2f}"
-
+                # Elevation from the detection map where the position was detected
+                elevations, known = trail.position_elevations()
+                for i, (x, y, time_val, energy_val) in enumerate(zip(
+                        trail.get_index_x().tolist(), trail.get_index_y().tolist(), times.tolist(), energies.tolist())):
+                    elevation = f"{elevations[i]:.2f}" if known[i] else "Unknown"
                     file.write(f"{i:5d} | ({x:3d},{y:3d}) | {time_val:10.2f} | {energy_val:10.2f} | {elevation:>10}\n")
 
                 # Include a sample of local terrain grids for key points
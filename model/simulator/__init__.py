@@ -1,7 +1,19 @@
 from .task import Task
+from .traversability import TraversabilityMap
+from .cost_model import CostModel
+from .energy_model import EnergyModel
+from .reachability import ReachabilityIndex
+from .distance_field import DistanceField
+from .cluster_graph import ClusterGraph
+from .trail import Trail
+from .run_archive import RunArchive
+from .trail_journal import TrailJournal, TrailJournalReader
+from .map_layers import MapLayers
+from .frame_renderer import FrameRenderer
+from .frame_rasterizer import RasterFrameRenderer
 from .MapManager import MapManager
 from .Simulator import Simulator
 from .environment import Environment
 from .Log import Log
 
-__all__ = ["Task", "MapManager", "Simulator", "Environment", "Log"]
+__all__ = ["Task", "MapManager", "Simulator", "Environment", "Log", "Trail", "RunArchive", "TrailJournal", "TrailJournalReader", "MapLayers", "FrameRenderer", "RasterFrameRenderer", "TraversabilityMap", "CostModel", "EnergyModel", "ReachabilityIndex", "DistanceField", "ClusterGraph"]
@@ -0,0 +1,287 @@
+import heapq  # priority queue
+import zlib
+
+import numpy as np
+
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def edge_cost_lists(traversability, cost_model):
+    """
+    Return the cost of every edge as one flat list per (dx, dy) move, -1 where the avatar cannot move.
+    This is the layout of PlanningBrain.planning_cost_lists for a fully known map.
+    """
+    return {(dx, dy): np.where(traversability.get_edge(dx, dy), cost_model.get_edge(dx, dy), -1).ravel().tolist()
+            for dx, dy in DIRECTIONS}
+
+
+def search_window(cost_lists, cols, source, window, targets=None):
+    """
+    Dijkstra from the flat grid source over the grids inside window.
+    :param cost_lists: Edge costs as returned by edge_cost_lists.
+    :param window: (first row, end row, first col, end col), ends excluded.
+    :param targets: Flat grids to reach; the search stops once all of them are settled. None searches the whole window.
+    :return: (distance, parent) dicts of the settled grids, parent is -1 for the source.
+    """
+    row0, row1, col0, col1 = window
+    moves = [(dx * cols + dy, dx, dy, cost_lists[(dx, dy)]) for dx, dy in DIRECTIONS]
+    remaining = None if targets is None else set(targets)
+
+    distance = {source: 0}
+    parent = {source: -1}
+    settled = set()
+    open_set = [(0, source)]
+
+    while open_set:
+        node_distance, node = heapq.heappop(open_set)
+        if node in settled:
+            continue
+        settled.add(node)
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        x, y = divmod(node, cols)
+        for offset, dx, dy, cost in moves:
+            edge_cost = cost[node]
+            if edge_cost < 0 or not (row0 <= x + dx < row1 and col0 <= y + dy < col1):
+                continue
+            neighbor = node + offset
+            new_distance = node_distance + edge_cost
+            if new_distance < distance.get(neighbor, np.inf):
+                distance[neighbor] = new_distance
+                parent[neighbor] = node
+                heapq.heappush(open_set, (new_distance, neighbor))
+
+    return {node: distance[node] for node in settled}, parent
+
+
+class ClusterGraph:
+    """
+    Abstract graph of a map for hierarchical (HPA*) path finding.
+
+    The map is split into square clusters of cluster_size grids. Along every border between
+    two neighbouring clusters, each run of crossable edges whose grids are also joined along the
+    border on both sides is an entrance, so every crossing edge of an entrance is reachable from
+    any other inside the two clusters. A short entrance gets one transition in its middle, an
+    entrance of long_entrance grids or more one at each end.
+    The two grids of a transition are abstract nodes joined by the crossing edge, and the
+    abstract nodes of one cluster are joined by the cost of the shortest path inside the cluster.
+    A query then searches the small abstract graph, and only the route it returns is refined
+    on the grid, one cluster at a time.
+
+    Building the graph runs one search per abstract node, so it is done once per map, avatar
+    and environment and kept on disk with save() and load(); checksum identifies the terrain
+    models it was built from, and version the way the graph was built.
+    """
+
+    cluster_size = 20
+    long_entrance = 6
+    version = 2
+
+    def __init__(self, traversability, cost_model, cluster_size=None, build=True):
+        if cluster_size is not None:
+            self.cluster_size = cluster_size
+        self.shape = traversability.shape
+        self.base_time = cost_model.base_time
+        self.cost_lists = edge_cost_lists(traversability, cost_model)
+        self.checksum = self.terrain_checksum(traversability, cost_model)
+
+        self.node_cells = np.empty(0, dtype=np.int64)
+        self.edge_source = np.empty(0, dtype=np.int64)
+        self.edge_target = np.empty(0, dtype=np.int64)
+        self.edge_cost = np.empty(0, dtype=np.int64)
+        if build:
+            self.build(traversability)
+
+    @staticmethod
+    def terrain_checksum(traversability, cost_model):
+        checksum = 0
+        for dx, dy in DIRECTIONS:
+            checksum = zlib.crc32(traversability.get_edge(dx, dy).tobytes(), checksum)
+            checksum = zlib.crc32(cost_model.get_edge(dx, dy).tobytes(), checksum)
+        return checksum
+
+    def cluster_of(self, node):
+        x, y = divmod(node, self.shape[1])
+        return x // self.cluster_size, y // self.cluster_size
+
+    def window_of(self, *nodes):
+        """
+        Return the window (first row, end row, first col, end col) covering the clusters of all nodes.
+        """
+        clusters = [self.cluster_of(node) for node in nodes]
+        rows, cols = self.shape
+        return (min(cluster[0] for cluster in clusters) * self.cluster_size,
+                min(rows, (max(cluster[0] for cluster in clusters) + 1) * self.cluster_size),
+                min(cluster[1] for cluster in clusters) * self.cluster_size,
+                min(cols, (max(cluster[1] for cluster in clusters) + 1) * self.cluster_size))
+
+    def build(self, traversability):
+        rows, cols = self.shape
+        size = self.cluster_size
+        cells = {}
+        sources, targets, costs = [], [], []
+
+        def add_node(cell):
+            return cells.setdefault(cell, len(cells))
+
+        def add_transitions(crossable, along, first_cell, step, across):
+            # crossable[i] tells whether the edge from first_cell + i * step to that grid + across is open,
+            # along[i] whether grid i and grid i + 1 are joined on both sides of the border
+            for start in range(0, len(crossable), size):
+                position = start
+                end = min(start + size, len(crossable))
+                while position < end:
+                    if not crossable[position]:
+                        position += 1
+                        continue
+                    # An entrance only runs on while the border grids stay joined to each other,
+                    # otherwise one transition could not stand for every crossing edge of the run
+                    run_start = position
+                    position += 1
+                    while position < end and crossable[position] and along[position - 1]:
+                        position += 1
+                    run = range(run_start, position)
+                    picks = [run[0], run[-1]] if len(run) >= self.long_entrance else [run[len(run) // 2]]
+                    for pick in picks:
+                        cell = first_cell + pick * step
+                        node, other = add_node(cell), add_node(cell + across)
+                        sources.extend([node, other])
+                        targets.extend([other, node])
+                        costs.extend([self.cost_lists[self.move_of(across)][cell],
+                                      self.cost_lists[self.move_of(-across)][cell + across]])
+
+        for border in range(size, rows, size):
+            along = traversability.east[border - 1, :] & traversability.east[border, :]
+            add_transitions(traversability.south[border - 1, :].tolist(), along.tolist(), (border - 1) * cols, 1, cols)
+        for border in range(size, cols, size):
+            along = traversability.south[:, border - 1] & traversability.south[:, border]
+            add_transitions(traversability.east[:, border - 1].tolist(), along.tolist(), border - 1, cols, 1)
+
+        self.node_cells = np.array(list(cells), dtype=np.int64)
+        for cluster_nodes in self.group_by_cluster().values():
+            for index, node in enumerate(cluster_nodes):
+                others = cluster_nodes[index + 1:]
+                if not others:
+                    continue
+                cell = int(self.node_cells[node])
+                distance, _ = search_window(self.cost_lists, cols, cell, self.window_of(cell),
+                                            [int(self.node_cells[other]) for other in others])
+                for other in others:
+                    other_cell = int(self.node_cells[other])
+                    if other_cell in distance:
+                        # Edge costs are symmetric, so one search gives both directions
+                        sources.extend([node, other])
+                        targets.extend([other, node])
+                        costs.extend([distance[other_cell]] * 2)
+
+        self.edge_source = np.array(sources, dtype=np.int64)
+        self.edge_target = np.array(targets, dtype=np.int64)
+        self.edge_cost = np.array(costs, dtype=np.int64)
+        self.index_edges()
+
+    def move_of(self, offset):
+        return {-self.shape[1]: (-1, 0), self.shape[1]: (1, 0), -1: (0, -1), 1: (0, 1)}[offset]
+
+    def group_by_cluster(self):
+        clusters = {}
+        for node, cell in enumerate(self.node_cells.tolist()):
+            clusters.setdefault(self.cluster_of(cell), []).append(node)
+        return clusters
+
+    def index_edges(self):
+        self.adjacency = [[] for _ in range(len(self.node_cells))]
+        for source, target, cost in zip(self.edge_source.tolist(), self.edge_target.tolist(), self.edge_cost.tolist()):
+            self.adjacency[source].append((target, cost))
+        self.cluster_nodes = self.group_by_cluster()
+
+    def save(self, path):
+        np.savez_compressed(path, node_cells=self.node_cells, edge_source=self.edge_source,
+                            edge_target=self.edge_target, edge_cost=self.edge_cost,
+                            shape=np.array(self.shape), cluster_size=self.cluster_size, checksum=self.checksum,
+                            version=self.version)
+
+    @classmethod
+    def load(cls, path, traversability, cost_model, cluster_size=None):
+        """
+        Load a graph saved with save(), or return None when it was built from other terrain models or cluster size,
+        or by another version of build().
+        """
+        graph = cls(traversability, cost_model, cluster_size, build=False)
+        with np.load(path) as data:
+            if ("version" not in data or int(data["version"]) != graph.version
+                    or tuple(data["shape"]) != graph.shape or int(data["cluster_size"]) != graph.cluster_size
+                    or int(data["checksum"]) != graph.checksum):
+                return None
+            graph.node_cells = data["node_cells"]
+            graph.edge_source = data["edge_source"]
+            graph.edge_target = data["edge_target"]
+            graph.edge_cost = data["edge_cost"]
+        graph.index_edges()
+        return graph
+
+    def abstract_route(self, start, goal):
+        """
+        Search the abstract graph from the flat grid start to the flat grid goal.
+        Start and goal are linked to the abstract nodes of their clusters, and to each other
+        when they share a cluster.
+        :return: The flat grids of the route, start and goal included, or None if goal cannot be reached.
+        """
+        if start == goal:
+            return [start]
+
+        cols = self.shape[1]
+        start_node, goal_node = len(self.node_cells), len(self.node_cells) + 1
+        cells = self.node_cells.tolist() + [start, goal]
+
+        def links(cell):
+            nodes = self.cluster_nodes.get(self.cluster_of(cell), [])
+            distance, _ = search_window(self.cost_lists, cols, cell, self.window_of(cell), [cells[node] for node in nodes])
+            return {node: distance[cells[node]] for node in nodes if cells[node] in distance}
+
+        start_links = links(start)
+        goal_links = links(goal)
+        if self.cluster_of(start) == self.cluster_of(goal):
+            distance, _ = search_window(self.cost_lists, cols, start, self.window_of(start), [goal])
+            if goal in distance:
+                start_links[goal_node] = distance[goal]
+
+        goal_x, goal_y = divmod(goal, cols)
+
+        def heuristic(node):
+            x, y = divmod(cells[node], cols)
+            return self.base_time * (abs(x - goal_x) + abs(y - goal_y))
+
+        g_score = {start_node: 0}
+        parent = {start_node: -1}
+        closed = set()
+        open_set = [(heuristic(start_node), start_node)]
+        while open_set:
+            _, node = heapq.heappop(open_set)
+            if node in closed:
+                continue
+            if node == goal_node:
+                route = []
+                while node != -1:
+                    route.append(cells[node])
+                    node = parent[node]
+                route.reverse()
+                return route
+            closed.add(node)
+
+            if node == start_node:
+                neighbors = list(start_links.items())
+            else:
+                neighbors = self.adjacency[node]
+                if node in goal_links:
+                    neighbors = neighbors + [(goal_node, goal_links[node])]
+            for neighbor, cost in neighbors:
+                new_g_score = g_score[node] + cost
+                if new_g_score < g_score.get(neighbor, np.inf):
+                    g_score[neighbor] = new_g_score
+                    parent[neighbor] = node
+                    heapq.heappush(open_set, (new_g_score + heuristic(neighbor), neighbor))
+
+        return None
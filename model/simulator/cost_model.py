@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class CostModel:
+    """
+    Precomputed integer time cost of every edge of the grid for one map and one avatar.
+
+    Moving between two neighbouring grids takes
+        ceil(base_time * (1 + slope_factor * elevation_difference / distance))
+    where base_time is Avatar.calculate_time_per_grid().
+    Each direction is stored as an integer raster with the shape of the map:
+    north[i, j] is the cost of moving from (i, j) to (i - 1, j), and likewise south, west and east.
+    Edges leaving the map cost 0 and are never traversable.
+    max_cost bounds the cost of every edge, including the flat-ground base_time.
+    """
+
+    distance = 10
+    slope_factor = 1.0
+
+    def __init__(self, terrain, base_time):
+        terrain = np.asarray(terrain, dtype=np.float32)
+        rows, cols = terrain.shape
+        self.shape = (rows, cols)
+        self.base_time = base_time
+
+        vertical = self.time_for_difference(np.abs(terrain[1:, :] - terrain[:-1, :]))
+        horizontal = self.time_for_difference(np.abs(terrain[:, 1:] - terrain[:, :-1]))
+
+        self.north = np.zeros((rows, cols), dtype=np.int64)
+        self.south = np.zeros((rows, cols), dtype=np.int64)
+        self.west = np.zeros((rows, cols), dtype=np.int64)
+        self.east = np.zeros((rows, cols), dtype=np.int64)
+        self.north[1:, :] = vertical
+        self.south[:-1, :] = vertical
+        self.west[:, 1:] = horizontal
+        self.east[:, :-1] = horizontal
+        self.max_cost = int(max(self.north.max(), self.west.max(), base_time))
+
+        # Look up the raster by the (dx, dy) move used in the brains
+        self.edges = {(-1, 0): self.north, (1, 0): self.south, (0, -1): self.west, (0, 1): self.east}
+
+    def time_for_difference(self, elevation_difference):
+        """
+        Vectorized travel time for an array of absolute elevation differences.
+        """
+        actual_time = self.base_time * (1 + self.slope_factor * (elevation_difference / self.distance))
+        return np.ceil(actual_time).astype(np.int64)
+
+    def cost(self, x, y, target_x, target_y):
+        """
+        Return the time needed to move from (x, y) to the neighbouring grid (target_x, target_y).
+        """
+        return int(self.edges[(target_x - x, target_y - y)][x, y])
+
+    def get_edge(self, dx, dy):
+        """
+        Return the integer cost raster of the (dx, dy) move.
+        """
+        return self.edges[(dx, dy)]
@@ -0,0 +1,76 @@
+import heapq  # priority queue
+
+import numpy as np
+
+
+class DistanceField:
+    """
+    Cost-to-go from every grid to one destination, computed once with a reverse Dijkstra
+    over the traversable edges of the terrain and their travel times.
+
+    distances[i, j] is the least time needed to travel from (i, j) to the destination,
+    np.inf when the destination cannot be reached. next_hop holds the flat index of the
+    neighbour to move to from each grid, so a path from any start is read off the field
+    instead of being searched for.
+    """
+
+    def __init__(self, traversability, cost_model, des_x, des_y):
+        rows, cols = traversability.shape
+        self.shape = (rows, cols)
+        self.destination = (des_x, des_y)
+
+        # Plain lists are much faster than NumPy scalars inside the search loop
+        moves = [(dx, dy, dx * cols + dy,
+                  traversability.get_edge(dx, dy).ravel().tolist(),
+                  cost_model.get_edge(dx, dy).ravel().tolist())
+                 for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]]
+
+        distances = [np.inf] * (rows * cols)
+        next_hop = [-1] * (rows * cols)
+        goal = des_x * cols + des_y
+        distances[goal] = 0
+        open_set = [(0, goal)]
+
+        while open_set:
+            distance, node = heapq.heappop(open_set)
+            if distance > distances[node]:
+                continue
+            x, y = divmod(node, cols)
+
+            # Relax the edges that lead into node: the neighbour (x - dx, y - dy) moving by (dx, dy)
+            for dx, dy, offset, passable, cost in moves:
+                px, py = x - dx, y - dy
+                if not (0 <= px < rows and 0 <= py < cols):
+                    continue
+                previous = node - offset
+                if not passable[previous]:
+                    continue
+                new_distance = distance + cost[previous]
+                if new_distance < distances[previous]:
+                    distances[previous] = new_distance
+                    next_hop[previous] = node
+                    heapq.heappush(open_set, (new_distance, previous))
+
+        self.distances = np.array(distances, dtype=np.float64).reshape(rows, cols)
+        self.next_hop = np.array(next_hop, dtype=np.int64)
+
+    def cost_to_go(self, x, y):
+        """
+        Return the least time from (x, y) to the destination, np.inf when it cannot be reached.
+        """
+        return float(self.distances[x, y])
+
+    def path_from(self, start_x, start_y):
+        """
+        Descend the field from (start_x, start_y) to the destination.
+        :return: (rows, cols) arrays of the path, both ends included, or None if the destination cannot be reached.
+        """
+        if np.isinf(self.distances[start_x, start_y]):
+            return None
+
+        rows, cols = self.shape
+        goal = self.destination[0] * cols + self.destination[1]
+        path = [start_x * cols + start_y]
+        while path[-1] != goal:
+            path.append(int(self.next_hop[path[-1]]))
+        return np.divmod(np.array(path, dtype=np.int64), cols)
@@ -0,0 +1,52 @@
+import math
+
+
+class EnergyModel:
+    """
+    Battery accounting of one avatar in one environment, shared by all brains.
+
+    The battery holds at most battery_capacity and recharges by
+    energy_recharge_rate * light_intensity per time unit while the avatar stands still.
+    Every step also powers the sensors, which costs the sum of their battery_consumption.
+    When a step needs more energy than is left, the avatar first recharges to full.
+    """
+
+    def __init__(self, avatar, environment):
+        self.capacity = avatar.battery_capacity
+        self.recharge_rate = avatar.energy_recharge_rate * environment.get_light_intensity()
+
+        sensors = avatar.get_sensors() if avatar.database_available else avatar.sensors
+        self.sensor_consumption = sum(sensor.get_battery_consumption() for sensor in sensors)
+
+    def can_recharge(self):
+        return self.recharge_rate > 0
+
+    def recharge_time(self, energy):
+        """
+        Return the number of time units needed to recharge from energy to a full battery.
+        """
+        if energy >= self.capacity:
+            return 0
+        return math.ceil((self.capacity - energy) / self.recharge_rate)
+
+    def step_consumption(self, amount):
+        """
+        Return the energy one step really takes: the move itself plus the sensors.
+        """
+        return amount + self.sensor_consumption
+
+    def consume(self, energy, amount):
+        """
+        Take one step costing amount of energy, recharging to full first if the battery cannot cover it.
+        :param energy: The energy left before the step.
+        :param amount: The energy of the move, without the sensors.
+        :return: (energy left after the step, time spent recharging),
+                 or None when the step cannot be paid because the battery does not recharge.
+        """
+        amount = self.step_consumption(amount)
+        if energy >= amount:
+            return energy - amount, 0
+
+        if not self.can_recharge():
+            return None
+        return self.capacity - amount, self.recharge_time(energy)
@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+class RasterFrameRenderer:
+    """
+    Render the frames of a run straight into NumPy RGB arrays, without matplotlib, and encode them with Pillow.
+
+    It draws what FrameRenderer draws at the same size: the composited MapLayers image scaled up
+    to frame_size pixels a side, the contours, the trail, the avatar marker and the start and end markers.
+    The grids are scaled by whole pixels, the contour segments are sampled into pixels once,
+    and lines and markers are stamped as pixel masks, so a frame is a handful of array operations.
+    """
+
+    frame_size = 1000
+    # Matplotlib sizes in points, at the 100 dpi of the matplotlib frames
+    pixels_per_point = 100 / 72
+    trail_colors = np.array([[255, 255, 0], [255, 165, 0], [255, 69, 0], [255, 0, 0]], dtype=np.uint8)
+    marker_edge_width = 1
+    png_compress_level = 1
+
+    def __init__(self, layers, task=None):
+        self.layers = layers
+        self.shape = layers.shape
+        self.scale = max(1, int(round(self.frame_size / max(self.shape))))
+        self.size = (self.shape[0] * self.scale, self.shape[1] * self.scale)
+        self.trail_kernel = self.disk(2 * self.pixels_per_point)
+
+        # Every pixel the contours pass through, with the grid quad of its segment
+        self.contour_pixels, contour_segments = self.sample_segments(self.to_pixels(layers.contour_segments))
+        self.contour_quads = layers.segment_quads[contour_segments]
+
+        self.markers = []
+        if task:
+            # Start location (green circle) and end location (blue square)
+            self.markers.append(((task.start_row, task.start_col), self.marker_mask('o', 10), (0, 128, 0)))
+            self.markers.append(((task.des_row, task.des_col), self.marker_mask('s', 10), (0, 0, 255)))
+
+    def to_pixels(self, points):
+        """
+        Return the pixel (row, column) of data points given as (x, y) = (column, row), as matplotlib places them.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        return (points[..., ::-1] + 0.5) * self.scale - 0.5
+
+    def sample_segments(self, segments):
+        """
+        Sample line segments of pixel coordinates, (segments, 2, 2), at every pixel they pass through.
+        :return: (flat pixel indices, the segment of each)
+        """
+        if not len(segments):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        starts, deltas = segments[:, 0], segments[:, 1] - segments[:, 0]
+        counts = np.ceil(np.abs(deltas).max(axis=1)).astype(np.int64) + 1
+        segment_of = np.repeat(np.arange(len(segments)), counts)
+        offsets = np.arange(len(segment_of)) - np.repeat(np.cumsum(counts) - counts, counts)
+        fraction = offsets / np.maximum(counts - 1, 1)[segment_of]
+        points = np.rint(starts[segment_of] + fraction[:, None] * deltas[segment_of]).astype(np.int64)
+        inside = (points[:, 0] >= 0) & (points[:, 0] < self.size[0]) & (points[:, 1] >= 0) & (points[:, 1] < self.size[1])
+        return points[inside, 0] * self.size[1] + points[inside, 1], segment_of[inside]
+
+    @staticmethod
+    def disk(diameter):
+        """
+        Return the (row, column) offsets of the pixels of a disk, the pen lines are drawn with.
+        """
+        radius = max(diameter / 2, 0.5)
+        offsets = np.arange(-int(np.ceil(radius)), int(np.ceil(radius)) + 1)
+        rows, cols = np.meshgrid(offsets, offsets, indexing='ij')
+        inside = rows ** 2 + cols ** 2 <= radius ** 2
+        return rows[inside], cols[inside]
+
+    @classmethod
+    def marker_mask(cls, marker, size):
+        """
+        Return the (row, column) offsets of the pixels of a matplotlib marker of size points, with its edge.
+        """
+        half = (size + cls.marker_edge_width) * cls.pixels_per_point / 2
+        offsets = np.arange(-int(np.ceil(half)), int(np.ceil(half)) + 1)
+        rows, cols = np.meshgrid(offsets, offsets, indexing='ij')
+        if marker == 'o':
+            inside = rows ** 2 + cols ** 2 <= half ** 2
+        elif marker == 's':
+            inside = (np.abs(rows) <= half) & (np.abs(cols) <= half)
+        else:
+            # Triangles pointing along the marker, the apex and the base at half from the centre
+            along, across = {'>': (cols, rows), '<': (-cols, rows), 'v': (rows, cols), '^': (-rows, cols)}[marker]
+            inside = (along >= -half) & (np.abs(across) <= (half - along) / 2)
+        return rows[inside], cols[inside]
+
+    def stamp(self, image, row, col, mask, color):
+        """
+        Paint the pixels of mask centred on the pixel (row, col) in color, clipped to the image.
+        """
+        rows, cols = mask[0] + int(np.floor(row + 0.5)), mask[1] + int(np.floor(col + 0.5))
+        inside = (rows >= 0) & (rows < self.size[0]) & (cols >= 0) & (cols < self.size[1])
+        image[rows[inside], cols[inside]] = color
+
+    def render(self, known_mask, avatar_positions=None, save_path=None, show_colorbar=False, return_image=False):
+        """
+        Draw one frame: the map layers under known_mask, the recent avatar positions as the trail,
+        and the avatar marker pointing along its last move. Saved to save_path when given.
+        :return: the frame as an RGB array, which is drawn whether or not return_image is set.
+        """
+        known_mask = np.asarray(known_mask, dtype=bool)
+        if not known_mask.any():
+            print("Warning: All elevation data is masked. No detected terrain to plot.")
+
+        image = self.layers.frame_within(known_mask).repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+        flat_image = image.reshape(-1, 3)
+
+        # Contours in black at alpha 0.5, each pixel blended once
+        quads_known = known_mask[:-1, :-1] & known_mask[1:, :-1] & known_mask[:-1, 1:] & known_mask[1:, 1:]
+        pixels = np.unique(self.contour_pixels[quads_known.ravel()[self.contour_quads]])
+        flat_image[pixels] = flat_image[pixels] // 2
+
+        if avatar_positions:
+            self.draw_trail(image, avatar_positions)
+        for (row, col), mask, color in self.markers:
+            self.stamp(image, *self.to_pixels((col, row)), mask, color)
+        if show_colorbar:
+            image = self.draw_colorbar(image)
+
+        if save_path:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            Image.fromarray(image).save(save_path, compress_level=self.png_compress_level)
+        return image
+
+    def draw_trail(self, image, avatar_positions):
+        positions = np.asarray(avatar_positions, dtype=np.float64)
+        points = self.to_pixels(positions[:, ::-1])
+        if len(points) > 1:
+            pixels, segment_of = self.sample_segments(np.stack([points[:-1], points[1:]], axis=1))
+            rows, cols = np.divmod(pixels, self.size[1])
+            rows = (rows[:, None] + self.trail_kernel[0]).ravel()
+            cols = (cols[:, None] + self.trail_kernel[1]).ravel()
+            colors = np.repeat(self.trail_colors[segment_of % len(self.trail_colors)], len(self.trail_kernel[0]), axis=0)
+            inside = (rows >= 0) & (rows < self.size[0]) & (cols >= 0) & (cols < self.size[1])
+            image[rows[inside], cols[inside]] = colors[inside]
+
+        # Draw avatar's current position with direction
+        marker = '>'
+        if len(positions) > 1:
+            dy, dx = positions[-1] - positions[-2]
+            if abs(dx) > abs(dy):
+                marker = '>' if dx > 0 else '<'
+            else:
+                marker = '^' if dy < 0 else 'v'
+        self.stamp(image, *points[-1], self.marker_mask(marker, 8), (255, 0, 0))
+
+    def draw_colorbar(self, image):
+        """
+        Draw the elevation colour bar in the upper right corner, with its ticks on the left, as the last frame has it.
+        """
+        height, width = self.size
+        bar_width, bar_height = max(2, int(width * 0.03)), max(2, int(height * 0.3))
+        pad = int(2 * 10 * self.pixels_per_point)
+        top, left = pad, width - pad - bar_width
+        levels = np.linspace(1, 0, bar_height)[:, None].repeat(bar_width, axis=1)
+        image = image.copy()
+        image[top:top + bar_height, left:left + bar_width] = self.layers.cmap(levels, bytes=True)[..., :3]
+
+        canvas = Image.fromarray(image)
+        draw = ImageDraw.Draw(canvas)
+        draw.rectangle([left - 1, top - 1, left + bar_width, top + bar_height], outline=(0, 0, 0))
+        for value in self.colorbar_ticks(self.layers.min_value, self.layers.max_value):
+            row = top + (bar_height - 1) * (1 - self.layers.norm(value))
+            draw.line([left - 5, row, left - 1, row], fill=(0, 0, 0))
+            label = f"{value:.0f}"
+            draw.text((left - 8 - draw.textlength(label), row - 5), label, fill=(0, 0, 0))
+        return np.asarray(canvas)
+
+    @staticmethod
+    def colorbar_ticks(min_value, max_value, count=5):
+        """
+        Return round tick values within [min_value, max_value], at a step of 1, 2 or 5 times a power of ten.
+        """
+        if max_value <= min_value:
+            return np.array([min_value])
+        rough = (max_value - min_value) / count
+        magnitude = 10 ** np.floor(np.log10(rough))
+        step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= rough)
+        return np.arange(np.ceil(min_value / step), np.floor(max_value / step) + 1) * step
+
+    def close(self):
+        pass
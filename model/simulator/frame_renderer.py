@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.cm import ScalarMappable
+from matplotlib.collections import LineCollection
+from mpl_toolkits.axes_grid1.inset_locator import inset_axes
+
+
+class FrameRenderer:
+    """
+    Render the frames of a run on one matplotlib figure, created once per map and task.
+
+    The figure and the start and end markers are made in the constructor. The blended terrain and
+    hillshade image and the contours come from the MapLayers of the map, cut to the known grids of each
+    frame, and render() only changes the data of the artists showing them, the trail and the avatar marker.
+    """
+
+    trail_colors = ['yellow', 'orange', 'orangered', 'red']
+
+    def __init__(self, layers, task=None):
+        self.fig, self.ax = plt.subplots(figsize=(10, 10), dpi=100)
+        self.layers = layers
+        self.shape = layers.shape
+
+        ax = self.ax
+        self.frame_image = ax.imshow(layers.unknown_rgb)
+        self.contours = LineCollection([], colors='black', linewidths=0.5, alpha=0.5)
+        ax.add_collection(self.contours)
+        # The tight bounding box of the saved frames, which only the colorbar changes
+        self.tight_bbox = None
+
+        self.trail_lines = LineCollection([], linewidths=2, capstyle='projecting')
+        ax.add_collection(self.trail_lines)
+        self.avatar_marker, = ax.plot([], [], marker='>', color='red', markersize=8, linestyle='none')
+
+        if task:
+            # Start location (green circle) and end location (blue square)
+            ax.plot(task.start_col, task.start_row, marker='o', color='green', markersize=10, label="Start")
+            ax.plot(task.des_col, task.des_row, marker='s', color='blue', markersize=10, label="End")
+
+        ax.set_xlim(-0.5, self.shape[1] - 0.5)
+        ax.set_ylim(self.shape[0] - 0.5, -0.5)
+        ax.set_autoscale_on(False)
+        ax.set_axis_off()
+        self.fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+
+    def render(self, known_mask, avatar_positions=None, save_path=None, show_colorbar=False, return_image=False):
+        """
+        Draw one frame: the map layers under known_mask, the recent avatar positions as the trail,
+        and the avatar marker pointing along its last move. Saved to save_path when given.
+        :return: the frame as an RGB array when return_image is set, else None.
+        """
+        known_mask = np.asarray(known_mask, dtype=bool)
+        if not known_mask.any():
+            print("Warning: All elevation data is masked. No detected terrain to plot.")
+
+        # The detect map holds the map's values on the known grids, so the map layers cut to them are its layers
+        self.frame_image.set_data(self.layers.frame_within(known_mask))
+        self.contours.set_segments(self.layers.contours_within(known_mask))
+
+        self.draw_trail(avatar_positions)
+
+        colorbar = None
+        if show_colorbar:
+            axins = inset_axes(self.ax, width="3%", height="30%", loc='upper right', borderpad=2)
+            colorbar = self.fig.colorbar(ScalarMappable(norm=self.layers.norm, cmap=self.layers.cmap), cax=axins)
+            colorbar.ax.yaxis.set_label_position('left')
+            colorbar.ax.yaxis.set_ticks_position('left')
+            colorbar.set_label("")
+
+        if save_path:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            if colorbar is None and self.tight_bbox is None:
+                self.tight_bbox = self.fig.get_tightbbox(self.fig.canvas.get_renderer())
+            # Measuring the tight box draws the figure, so it is only measured again for the colorbar
+            self.fig.savefig(save_path, bbox_inches='tight' if colorbar is not None else self.tight_bbox,
+                             pad_inches=0)
+
+        image = None
+        if return_image:
+            self.fig.canvas.draw()
+            image = np.asarray(self.fig.canvas.buffer_rgba())[..., :3].copy()
+
+        if colorbar is not None:
+            colorbar.remove()
+        return image
+
+    def draw_trail(self, avatar_positions):
+        """
+        Point the trail segments and the avatar marker at avatar_positions, hiding both when there are none.
+        """
+        positions = np.asarray(avatar_positions if avatar_positions else np.empty((0, 2)), dtype=float)
+        points = positions[:, ::-1]
+        self.trail_lines.set_segments(np.stack([points[:-1], points[1:]], axis=1) if len(points) > 1 else [])
+        self.trail_lines.set_color([self.trail_colors[i % len(self.trail_colors)] for i in range(max(0, len(points) - 1))])
+
+        if not len(points):
+            self.avatar_marker.set_data([], [])
+            return
+
+        # Draw avatar's current position with direction
+        marker = '>'
+        if len(points) > 1:
+            dx, dy = points[-1] - points[-2]
+            if abs(dx) > abs(dy):
+                marker = '>' if dx > 0 else '<'
+            else:
+                marker = '^' if dy < 0 else 'v'
+        self.avatar_marker.set_marker(marker)
+        self.avatar_marker.set_data([points[-1, 0]], [points[-1, 1]])
+
+    def close(self):
+        plt.close(self.fig)
+
+
+# The renderer and trail of a frame worker process, and whether it returns its frames, set once by init_frame_worker()
+worker_renderer = None
+worker_trail = None
+worker_returns_images = False
+
+
+def init_frame_worker(renderer_class, layers, task, trail, return_images=False):
+    """
+    Initialize a process of the frame pool with a renderer of renderer_class for the map layers and the task,
+    and the trail of the run. With return_images set, the worker sends every frame back as an RGB array.
+    """
+    global worker_renderer, worker_trail, worker_returns_images
+    worker_renderer = renderer_class(layers, task)
+    worker_trail = trail
+    worker_returns_images = return_images
+
+
+def render_frame(job):
+    """
+    Render one frame in a frame worker, rebuilding its known mask from the trail.
+    :param job: (step, avatar positions, save path or None)
+    :return: (the save path, the frame as an RGB array or None).
+    """
+    step, avatar_positions, save_path = job
+    image = worker_renderer.render(worker_trail.maps_at(step)[1], avatar_positions, save_path,
+                                   return_image=worker_returns_images)
+    return save_path, image if worker_returns_images else None
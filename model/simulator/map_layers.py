@@ -0,0 +1,151 @@
+import zlib
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from contourpy import contour_generator, LineType
+from matplotlib.colors import LightSource
+from matplotlib.ticker import MaxNLocator
+
+
+class MapLayers:
+    """
+    The render layers of a map that do not depend on the run: the terrain colours, the hillshade and the contours.
+
+    Frames are cut from these under the known mask instead of recomputing them from the detect map:
+    the detect map holds the map's own values wherever it is known, so the layers of the full map
+    restricted to the known cells are the layers of the detect map. The colour layers are blended
+    ahead, so a frame image is one pick per grid between the known and the unknown blend.
+    The contours are kept as line segments, each with the grid quad it crosses, so a frame keeps
+    the segments whose quad has all four corners known, as contouring the masked detect map would.
+    """
+
+    version = 1
+    contour_levels = 15
+    light_source = LightSource(azdeg=315, altdeg=45)
+
+    def __init__(self, full_map, min_value, max_value, build=True):
+        self.full_map = np.asarray(full_map, dtype=np.float32)
+        self.shape = self.full_map.shape
+        self.min_value = float(min_value)
+        self.max_value = float(max_value)
+        self.norm = mcolors.Normalize(vmin=self.min_value, vmax=self.max_value)
+        self.cmap = plt.get_cmap('terrain').with_extremes(bad=(0, 0, 0, 0))
+        self.checksum = self.map_checksum(self.full_map, self.min_value, self.max_value)
+        self.terrain_rgba = None
+        self.hillshade = None
+        # The frame colours of every grid once known and while unknown, the layers already composited
+        self.known_rgb = None
+        self.unknown_rgb = None
+        self.flat_shade = 0.5
+        self.levels = None
+        self.contour_segments = None
+        self.segment_quads = None
+        if build:
+            self.build()
+
+    @classmethod
+    def map_checksum(cls, full_map, min_value, max_value):
+        checksum = zlib.crc32(np.ascontiguousarray(full_map, dtype=np.float32).tobytes())
+        return zlib.crc32(np.array([min_value, max_value, cls.version], dtype=np.float64).tobytes(), checksum)
+
+    def build(self):
+        self.terrain_rgba = self.cmap(self.norm(self.full_map), bytes=True)
+        self.hillshade, self.flat_shade = self.shade(self.full_map)
+        self.composite()
+        self.build_contours()
+
+    def composite(self):
+        """
+        Blend the frame layers as the frames stacked them, on a white page: the whole map in terrain colours
+        at alpha 0.6, the hillshade in gray at alpha 0.5, and the known grids in terrain colours at alpha 0.7.
+        An unknown grid is shaded as flat ground.
+        """
+        terrain = self.cmap(self.norm(self.full_map))[..., :3]
+        gray = plt.get_cmap('gray')
+        background = 0.6 * terrain + 0.4
+        unknown = 0.5 * gray(np.full(self.shape, self.flat_shade))[..., :3] + 0.5 * background
+        known = 0.7 * terrain + 0.3 * (0.5 * gray(self.hillshade)[..., :3] + 0.5 * background)
+        self.known_rgb = np.round(known * 255).astype(np.uint8)
+        self.unknown_rgb = np.round(unknown * 255).astype(np.uint8)
+
+    @classmethod
+    def shade(cls, full_map):
+        """
+        Hillshade full_map as LightSource.hillshade does, also returning the shade of a flat grid on the same scale,
+        which frames use for the grids that are not known yet.
+        """
+        # The first row is the top of the image, so dy is negative
+        e_dy, e_dx = np.gradient(np.asarray(full_map, dtype=np.float64), -1, 1)
+        normal = np.stack([-e_dx, -e_dy, np.ones_like(e_dx)], axis=-1)
+        normal /= np.sqrt(np.sum(normal ** 2, axis=-1))[..., None]
+        intensity = normal.dot(cls.light_source.direction)
+        flat = cls.light_source.direction[2]
+        imin, imax = intensity.min(), intensity.max()
+        if imax - imin > 1e-6:
+            intensity = (intensity - imin) / (imax - imin)
+            flat = (flat - imin) / (imax - imin)
+        return np.clip(intensity, 0, 1).astype(np.float32), float(np.clip(flat, 0, 1))
+
+    def build_contours(self):
+        """
+        Trace the contour_levels levels of the full map, placed as matplotlib places them, as line segments.
+        """
+        rows, cols = self.shape
+        zmin, zmax = float(self.full_map.min()), float(self.full_map.max())
+        levels = MaxNLocator(self.contour_levels + 1).tick_values(zmin, zmax)
+        inside = (levels > zmin) & (levels < zmax)
+        self.levels = levels[inside] if inside.any() else levels[:1]
+
+        segments = []
+        if rows > 1 and cols > 1:
+            generator = contour_generator(z=self.full_map.astype(np.float64), line_type=LineType.Separate)
+            for level in self.levels:
+                for line in generator.lines(level):
+                    segments.append(np.stack([line[:-1], line[1:]], axis=1))
+        self.contour_segments = (np.concatenate(segments).astype(np.float32) if segments
+                                 else np.empty((0, 2, 2), dtype=np.float32))
+        # The quad each segment crosses, by its midpoint; x is the column and y the row
+        middle = self.contour_segments.mean(axis=1)
+        quad_rows = np.clip(np.floor(middle[:, 1]).astype(np.int64), 0, max(rows - 2, 0))
+        quad_cols = np.clip(np.floor(middle[:, 0]).astype(np.int64), 0, max(cols - 2, 0))
+        self.segment_quads = quad_rows * max(cols - 1, 1) + quad_cols
+
+    def contours_within(self, known_mask):
+        """
+        Return the contour segments whose grid quad has all four corners in known_mask.
+        """
+        known_mask = np.asarray(known_mask, dtype=bool)
+        quads_known = known_mask[:-1, :-1] & known_mask[1:, :-1] & known_mask[:-1, 1:] & known_mask[1:, 1:]
+        return self.contour_segments[quads_known.ravel()[self.segment_quads]]
+
+    def frame_within(self, known_mask):
+        """
+        Return the composited frame image of known_mask as RGB bytes, a pick per grid between the two blends.
+        """
+        return np.where(np.asarray(known_mask, dtype=bool)[..., None], self.known_rgb, self.unknown_rgb)
+
+    def save(self, path):
+        np.savez_compressed(path, checksum=self.checksum, shape=np.array(self.shape), terrain_rgba=self.terrain_rgba,
+                            hillshade=self.hillshade, flat_shade=self.flat_shade, known_rgb=self.known_rgb,
+                            unknown_rgb=self.unknown_rgb, levels=self.levels,
+                            contour_segments=self.contour_segments, segment_quads=self.segment_quads)
+
+    @classmethod
+    def load(cls, path, full_map, min_value, max_value):
+        """
+        Load layers saved with save(), or return None when they were built from another map or elevation range.
+        """
+        layers = cls(full_map, min_value, max_value, build=False)
+        with np.load(path) as data:
+            if tuple(data["shape"]) != layers.shape or int(data["checksum"]) != layers.checksum:
+                return None
+            layers.terrain_rgba = data["terrain_rgba"]
+            layers.hillshade = data["hillshade"]
+            layers.flat_shade = float(data["flat_shade"])
+            layers.known_rgb = data["known_rgb"]
+            layers.unknown_rgb = data["unknown_rgb"]
+            layers.levels = data["levels"]
+            layers.contour_segments = data["contour_segments"]
+            layers.segment_quads = data["segment_quads"]
+        return layers
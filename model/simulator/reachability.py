@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class ReachabilityIndex:
+    """
+    Connected components of the traversable-edge graph of one TraversabilityMap.
+
+    Every grid gets the label of its component, so whether two grids are connected
+    for the avatar's slope limit is a single comparison.
+    The labels are found with a vectorized union-find: each round hooks the root of every
+    edge's larger end under the smaller one, then compresses the pointers until every grid
+    points straight at its root.
+    """
+
+    def __init__(self, traversability):
+        rows, cols = traversability.shape
+        self.shape = (rows, cols)
+        index = np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
+
+        # Edges are symmetric, so the south and east rasters cover the whole graph
+        source = np.concatenate([index[traversability.south], index[traversability.east]])
+        target = np.concatenate([index[traversability.south] + cols, index[traversability.east] + 1])
+
+        parent = np.arange(rows * cols, dtype=np.int64)
+        while True:
+            root_source = parent[source]
+            root_target = parent[target]
+            low = np.minimum(root_source, root_target)
+            high = np.maximum(root_source, root_target)
+            pending = low != high
+            if not pending.any():
+                break
+
+            # Keep only the edges that still join two components
+            source, target = source[pending], target[pending]
+            np.minimum.at(parent, high[pending], low[pending])
+
+            while True:
+                grandparent = parent[parent]
+                if np.array_equal(grandparent, parent):
+                    break
+                parent = grandparent
+
+        self.labels = parent.reshape(rows, cols)
+        self.component_sizes = np.bincount(parent, minlength=rows * cols)
+
+    def connected(self, start_x, start_y, end_x, end_y):
+        """
+        Check whether the avatar can travel from (start_x, start_y) to (end_x, end_y).
+        """
+        return bool(self.labels[start_x, start_y] == self.labels[end_x, end_y])
+
+    def component_size(self, x, y):
+        """
+        Return the number of grids reachable from (x, y), (x, y) included.
+        """
+        return int(self.component_sizes[self.labels[x, y]])
@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from model.simulator.trail import Trail
+
+
+class RunArchive:
+    """
+    A finished run saved as a directory of .npy files: the step columns of its Trail, the revealed-cell deltas,
+    the keyframes, and a metadata.json naming the map, avatar, brain, environment and task it ran with.
+
+    Loading memory-maps the arrays instead of reading them, so opening an archive costs about the same
+    whatever the length of the run, and only the pages of the steps that are looked at are read.
+    get_trail() wraps the mapped arrays in a read-only Trail: log_at(), maps_at() and iter_maps()
+    seek to any step from the keyframe before it, as they do on a live run.
+    """
+
+    version = 1
+    metadata_filename = "metadata.json"
+    column_names = ("index_x", "index_y", "time", "energy", "delta_end", "revealed_indices", "revealed_values",
+                    "keyframe_maps", "keyframe_masks", "keyframe_slots")
+
+    def __init__(self, path, metadata, columns):
+        self.path = path
+        self.metadata = metadata
+        self.columns = columns
+        self.trail = None
+
+    def __len__(self):
+        return self.metadata["steps"]
+
+    def get_path(self):
+        return self.path
+
+    def get_metadata(self):
+        return self.metadata
+
+    def get_column(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def save(cls, path, trail, metadata=None):
+        """
+        Save trail, with the metadata of its run, as an archive directory at path, replacing any archive there.
+        The archive is written next to path first and moved in place, so a half written archive is never loaded.
+        :return: the RunArchive of the saved files.
+        """
+        length = len(trail)
+        revealed = int(trail.delta_end[length - 1]) if length else 0
+        columns = {
+            "index_x": trail.get_index_x(),
+            "index_y": trail.get_index_y(),
+            "time": trail.get_time(),
+            "energy": trail.get_energy(),
+            "delta_end": trail.delta_end[:length],
+            "revealed_indices": trail.revealed_indices[:revealed],
+            "revealed_values": trail.revealed_values[:revealed],
+        }
+        # Keyframes shared by the trail are saved once, keyframe_slots giving the saved keyframe of each slot
+        saved = {}
+        slots = [saved.setdefault(id(keyframe), (len(saved), keyframe))[0] for keyframe in trail.keyframes]
+        keyframes = [keyframe for _, keyframe in saved.values()]
+        columns["keyframe_maps"] = np.array([detect_map for detect_map, _ in keyframes],
+                                            dtype=np.float32).reshape((len(keyframes),) + trail.shape)
+        columns["keyframe_masks"] = np.array([known_mask for _, known_mask in keyframes],
+                                             dtype=bool).reshape((len(keyframes),) + trail.shape)
+        columns["keyframe_slots"] = np.array(slots, dtype=np.int64)
+
+        metadata = dict(metadata or {})
+        metadata.update({
+            "version": cls.version,
+            "shape": list(trail.shape),
+            "steps": length,
+            "keyframe_interval": trail.keyframe_interval,
+        })
+
+        staging = path.rstrip(os.sep) + ".partial"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name, column in columns.items():
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(column))
+        with open(os.path.join(staging, cls.metadata_filename), "w") as file:
+            json.dump(metadata, file, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Open the archive directory at path, memory-mapping its arrays.
+        :return: the RunArchive, or None when path holds no archive of this version.
+        """
+        metadata_path = os.path.join(path, cls.metadata_filename)
+        if not os.path.isfile(metadata_path):
+            return None
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+        if metadata.get("version") != cls.version:
+            return None
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in cls.column_names}
+        return cls(path, metadata, columns)
+
+    def get_trail(self):
+        """
+        Return the archived run as a read-only Trail over the mapped arrays.
+        """
+        if self.trail is None:
+            columns = self.columns
+            keyframes = [(columns["keyframe_maps"][slot], columns["keyframe_masks"][slot])
+                         for slot in columns["keyframe_slots"].tolist()]
+            self.trail = Trail.from_columns(tuple(self.metadata["shape"]), self.metadata["keyframe_interval"],
+                                            columns["index_x"], columns["index_y"], columns["time"],
+                                            columns["energy"], columns["delta_end"], columns["revealed_indices"],
+                                            columns["revealed_values"], keyframes)
+        return self.trail
+
+    def log_at(self, step):
+        return self.get_trail()[step]
+
+    def maps_at(self, step):
+        return self.get_trail().maps_at(step)
+
+    def iter_maps(self, steps=None):
+        return self.get_trail().iter_maps(steps)
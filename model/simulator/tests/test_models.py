@@ -0,0 +1,399 @@
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from model.avatar.tests.helpers import make_test_avatar
+from model.simulator.cluster_graph import search_window
+from model.simulator import TraversabilityMap, CostModel, EnergyModel, ReachabilityIndex, Environment, \
+    DistanceField, ClusterGraph, Trail, Log, RunArchive, TrailJournal, TrailJournalReader, \
+    MapLayers, FrameRenderer, RasterFrameRenderer
+
+
+class TestSimulatorModels(unittest.TestCase):
+
+    def setUp(self):
+        """A small map with one steep step between the two middle columns"""
+        self.terrain = np.array([
+            [0, 1, 9, 9],
+            [0, 1, 9, 9],
+            [0, 2, 9, 9],
+        ], dtype=np.float32)
+        self.max_slope = 2.0
+
+    def test_traversability_matches_pairwise_check(self):
+        """Test every edge raster against the per-edge slope check"""
+        traversability = TraversabilityMap(self.terrain, self.max_slope)
+        rows, cols = self.terrain.shape
+
+        for x in range(rows):
+            for y in range(cols):
+                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                    nx, ny = x + dx, y + dy
+                    expected = (0 <= nx < rows and 0 <= ny < cols and
+                                abs(self.terrain[nx, ny] - self.terrain[x, y]) <= self.max_slope)
+                    self.assertEqual(bool(traversability.get_edge(dx, dy)[x, y]), expected)
+
+    def test_traversability_masked_by_known_grids(self):
+        """Test masked edges require both grids to be known"""
+        traversability = TraversabilityMap(self.terrain, self.max_slope)
+        known_mask = np.zeros_like(self.terrain, dtype=bool)
+        known_mask[0, 0] = True
+
+        masked = traversability.masked(known_mask)
+        self.assertFalse(masked[(0, 1)][0, 0])
+
+        known_mask[0, 1] = True
+        masked = traversability.masked(known_mask)
+        self.assertTrue(masked[(0, 1)][0, 0])
+        self.assertTrue(masked[(0, -1)][0, 1])
+        self.assertFalse(masked[(1, 0)][0, 0])
+
+    def test_cost_model_matches_scalar_formula(self):
+        """Test every cost raster against the per-edge time formula used by the brains"""
+        base_time = 3
+        cost_model = CostModel(self.terrain, base_time)
+        rows, cols = self.terrain.shape
+
+        for x in range(rows):
+            for y in range(cols):
+                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                    nx, ny = x + dx, y + dy
+                    if not (0 <= nx < rows and 0 <= ny < cols):
+                        continue
+                    elevation_difference = abs(self.terrain[x, y] - self.terrain[nx, ny])
+                    expected = math.ceil(base_time * (1 + 1.0 * (elevation_difference / 10)))
+                    self.assertEqual(cost_model.cost(x, y, nx, ny), expected)
+
+    def test_reachability_components(self):
+        """Test the steep step splits the map into two components"""
+        reachability = ReachabilityIndex(TraversabilityMap(self.terrain, self.max_slope))
+
+        self.assertTrue(reachability.connected(0, 0, 2, 1))
+        self.assertTrue(reachability.connected(0, 2, 2, 3))
+        self.assertFalse(reachability.connected(0, 0, 0, 3))
+        self.assertEqual(reachability.component_size(1, 0), 6)
+        self.assertEqual(reachability.component_size(1, 3), 6)
+
+    def test_distance_field_matches_relaxation(self):
+        """Test the reverse Dijkstra against relaxing every edge until nothing changes"""
+        traversability = TraversabilityMap(self.terrain, self.max_slope)
+        cost_model = CostModel(self.terrain, 3)
+        field = DistanceField(traversability, cost_model, 2, 1)
+        rows, cols = self.terrain.shape
+
+        expected = np.full((rows, cols), np.inf)
+        expected[2, 1] = 0
+        changed = True
+        while changed:
+            changed = False
+            for x in range(rows):
+                for y in range(cols):
+                    for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                        if traversability.get_edge(dx, dy)[x, y]:
+                            distance = cost_model.cost(x, y, x + dx, y + dy) + expected[x + dx, y + dy]
+                            if distance < expected[x, y]:
+                                expected[x, y] = distance
+                                changed = True
+
+        np.testing.assert_array_equal(field.distances, expected)
+        rows_path, cols_path = field.path_from(0, 0)
+        self.assertEqual((rows_path[-1], cols_path[-1]), (2, 1))
+        path_cost = sum(cost_model.cost(*a, *b) for a, b in
+                        zip(zip(rows_path, cols_path), zip(rows_path[1:], cols_path[1:])))
+        self.assertEqual(path_cost, expected[0, 0])
+        self.assertIsNone(field.path_from(0, 3))
+
+    def test_cluster_graph_route_and_reload(self):
+        """Test abstract routes agree with the distance field on reachability and survive a save and load"""
+        terrain = np.zeros((12, 12), dtype=np.float32)
+        terrain[:10, 6] = 50
+        traversability = TraversabilityMap(terrain, self.max_slope)
+        cost_model = CostModel(terrain, 3)
+        graph = ClusterGraph(traversability, cost_model, cluster_size=4)
+        field = DistanceField(traversability, cost_model, 0, 11)
+
+        route = graph.abstract_route(0, 11)
+        self.assertEqual((route[0], route[-1]), (0, 11))
+        route_cost = 0
+        for source, target in zip(route, route[1:]):
+            distance, _ = search_window(graph.cost_lists, 12, source, (0, 12, 0, 12), [target])
+            route_cost += distance[target]
+        self.assertGreaterEqual(route_cost, field.cost_to_go(0, 0))
+
+        terrain[:, 6] = 50
+        blocked = TraversabilityMap(terrain, self.max_slope)
+        self.assertIsNone(ClusterGraph(blocked, CostModel(terrain, 3), cluster_size=4).abstract_route(0, 11))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.npz")
+            graph.save(path)
+            loaded = ClusterGraph.load(path, traversability, cost_model, cluster_size=4)
+            self.assertEqual(loaded.abstract_route(0, 11), route)
+            self.assertIsNone(ClusterGraph.load(path, blocked, CostModel(terrain, 3), cluster_size=4))
+
+    def test_cluster_graph_agrees_with_reachability_on_random_maps(self):
+        """Test abstract routes exist exactly between the grids the reachability index connects"""
+        rng = np.random.default_rng(7)
+        for _ in range(40):
+            rows, cols = (int(size) for size in rng.integers(8, 30, 2))
+            terrain = rng.uniform(0, 3, (rows, cols)).astype(np.float32)
+            traversability = TraversabilityMap(terrain, 1.0)
+            reachability = ReachabilityIndex(traversability)
+            graph = ClusterGraph(traversability, CostModel(terrain, 3), cluster_size=int(rng.integers(3, 6)))
+
+            for start, goal in rng.integers(0, rows * cols, (20, 2)).tolist():
+                connected = reachability.connected(*divmod(start, cols), *divmod(goal, cols))
+                route = graph.abstract_route(start, goal)
+                self.assertEqual(route is not None, connected, f"{rows}x{cols} map, route {start} -> {goal}")
+
+    def make_energy_model(self, energy_recharge_rate, light_intensity=1.0):
+        avatar = make_test_avatar("Energy", sensor_range=3, battery_consumption=2, energy_recharge_rate=energy_recharge_rate)
+        return EnergyModel(avatar, Environment(light_intensity=light_intensity))
+
+    def test_energy_recharge_time_matches_step_loop(self):
+        """Test the closed-form recharge time against charging one time unit at a time"""
+        energy_model = self.make_energy_model(energy_recharge_rate=7, light_intensity=0.5)
+
+        for energy in [-20, 0, 3.5, 99, 196.5, 200]:
+            charged, ticks = energy, 0
+            while charged < energy_model.capacity:
+                charged += energy_model.recharge_rate
+                ticks += 1
+            self.assertEqual(energy_model.recharge_time(energy), ticks)
+
+    def test_energy_consume_includes_sensors_and_recharges(self):
+        """Test a step pays for the sensors and recharges to full when the battery is short"""
+        energy_model = self.make_energy_model(energy_recharge_rate=20)
+
+        self.assertEqual(energy_model.consume(100, 10), (88, 0))
+        self.assertEqual(energy_model.consume(5, 10), (188, 10))
+
+    def test_energy_consume_without_recharge(self):
+        """Test a step that cannot be paid is reported when the battery does not recharge"""
+        energy_model = self.make_energy_model(energy_recharge_rate=20, light_intensity=0)
+
+        self.assertEqual(energy_model.consume(100, 10), (88, 0))
+        self.assertIsNone(energy_model.consume(5, 10))
+
+
+    def test_trail_rebuilds_every_step(self):
+        """Test the delta trail rebuilds the detect map snapshot of every step, at random and in order"""
+        rng = np.random.default_rng(0)
+        full_map = rng.uniform(0, 10, (6, 7)).astype(np.float32)
+        trail = Trail(full_map.shape, keyframe_interval=3)
+        known_mask = np.zeros(full_map.shape, dtype=bool)
+        snapshots = []
+        for step in range(11):
+            revealed = rng.random(full_map.shape) < 0.1
+            if step == 4:
+                # A step carrying a full snapshot, as Logs did before the trail, becomes a delta
+                known_mask |= revealed
+                trail.append(Log(index_x=1, index_y=2, detect_map=np.where(known_mask, full_map, 0),
+                                 known_mask=known_mask.copy()))
+            else:
+                indices = np.flatnonzero(revealed & ~known_mask)
+                known_mask.flat[indices] = True
+                trail.append(Log(index_x=1, index_y=2, revealed_indices=indices, revealed_values=full_map.flat[indices]))
+            snapshots.append(known_mask.copy())
+
+        for step in [10, 0, 5, 3, -1]:
+            np.testing.assert_array_equal(trail[step].get_known_mask(), snapshots[step])
+            np.testing.assert_array_equal(trail[step].get_detect_map(), np.where(snapshots[step], full_map, 0))
+        for step, detect_map, known_mask in trail.iter_maps([1, 2, 7, 8]):
+            np.testing.assert_array_equal(known_mask, snapshots[step])
+            np.testing.assert_array_equal(detect_map, np.where(snapshots[step], full_map, 0))
+        self.assertEqual(len(list(trail.iter_maps())), len(trail))
+
+    def test_trail_columns(self):
+        """Test the step columns grow, keep integer values integer and give each position's elevation"""
+        full_map = np.arange(9 * 9, dtype=np.float32).reshape(9, 9)
+        trail = Trail(full_map.shape)
+        for step in range(100):
+            x, y = step % 9, (step // 9) % 9
+            # Until the last steps, only even steps reveal the grid under the avatar
+            indices = np.array([x * 9 + y] if step % 2 == 0 or step > 90 else [], dtype=np.int64)
+            indices = indices[~trail.known_mask.flat[indices]]
+            trail.record(x, y, step * 2, 100 - step if step < 50 else 100.5 - step, indices, full_map.flat[indices])
+
+        self.assertEqual(len(trail), 100)
+        self.assertEqual(trail[3].get_time(), 6)
+        self.assertIsInstance(trail[3].get_time(), int)
+        self.assertEqual(trail[60].get_energy(), 40.5)
+        np.testing.assert_array_equal(trail.get_index_x()[:10], np.arange(10) % 9)
+
+        elevations, known = trail.position_elevations()
+        for step in range(100):
+            x, y = trail[step].get_index_x(), trail[step].get_index_y()
+            self.assertEqual(known[step], trail[step].get_known_mask()[x, y])
+            self.assertEqual(elevations[step], full_map[x, y] if known[step] else 0)
+
+    def test_local_grids_from_trail_and_snapshot(self):
+        """Test the trail builds the same local grids as a Log holding a full snapshot"""
+        full_map = np.arange(5 * 6, dtype=np.float32).reshape(5, 6) * 1.5
+        trail = Trail(full_map.shape)
+        known_mask = np.zeros(full_map.shape, dtype=bool)
+        snapshots = []
+        for step, (x, y) in enumerate([(0, 0), (1, 0), (2, 3), (4, 5)]):
+            indices = np.flatnonzero(~known_mask)[step::3]
+            known_mask.flat[indices] = True
+            trail.record(x, y, step, 10 - step, indices, full_map.flat[indices])
+            snapshots.append(Log(index_x=x, index_y=y, detect_map=np.where(known_mask, full_map, 0),
+                                 known_mask=known_mask.copy()))
+
+        for log, snapshot in zip(trail, snapshots):
+            for size in [3, 5]:
+                np.testing.assert_array_equal(log.get_local_grid(size), snapshot.get_local_grid(size))
+                self.assertEqual(log.get_local_grid_str(size), snapshot.get_local_grid_str(size))
+
+        grid = trail[0].get_local_grid()
+        self.assertEqual(grid.shape, (3, 3))
+        self.assertFalse(grid["inside"][0].any())
+        self.assertEqual(trail[0].get_local_grid_str(), " ".join([" " * 15, "       x    ?  ", "       9    ?  "]))
+
+    def test_run_archive_replays_trail(self):
+        """Test a trail saved as a run archive is memory-mapped back and replays every step as the original"""
+        rng = np.random.default_rng(1)
+        full_map = rng.uniform(0, 10, (5, 8)).astype(np.float32)
+        trail = Trail(full_map.shape, keyframe_interval=4)
+        for step in range(14):
+            # Steps 4 to 9 reveal nothing, so keyframes are shared
+            revealed = rng.random(full_map.shape) < (0 if 4 <= step < 10 else 0.2)
+            indices = np.flatnonzero(revealed & ~trail.known_mask)
+            trail.record(step % 5, step % 8, step, 100 - step * 1.5, indices, full_map.flat[indices])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run")
+            RunArchive.save(path, trail, {"map": "test", "success": True})
+            archive = RunArchive.load(path)
+            self.assertEqual(len(archive), 14)
+            self.assertEqual(archive.get_metadata()["map"], "test")
+            self.assertIsInstance(archive.get_column("index_x"), np.memmap)
+            self.assertEqual(len(archive.get_column("keyframe_maps")), 3)
+
+            loaded = archive.get_trail()
+            np.testing.assert_array_equal(loaded.get_energy(), trail.get_energy())
+            for step in [13, 2, 9, 5]:
+                self.assertEqual((archive.log_at(step).get_index_x(), archive.log_at(step).get_time()),
+                                 (trail[step].get_index_x(), trail[step].get_time()))
+                for archived, original in zip(archive.maps_at(step), trail.maps_at(step)):
+                    np.testing.assert_array_equal(archived, original)
+            np.testing.assert_array_equal(loaded.local_grids(), trail.local_grids())
+            self.assertIsNone(RunArchive.load(directory))
+
+    def test_trail_journal_followed_and_recovered(self):
+        """Test a journaled trail is followed while it is written and recovered from a file cut short"""
+        full_map = np.arange(6 * 6, dtype=np.float32).reshape(6, 6) / 4
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.journal")
+            trail = Trail(full_map.shape, journal=TrailJournal(path, full_map.shape, flush_interval=4))
+            reader = TrailJournalReader(path)
+            for step in range(10):
+                indices = np.flatnonzero(~trail.known_mask)[:step]
+                trail.record(step % 6, step // 6, step * 3, 50 - step * 0.5, indices, full_map.flat[indices])
+                if step == 5:
+                    # Only the steps flushed so far reach the file
+                    self.assertEqual(reader.poll(), 4)
+                    self.assertFalse(reader.is_ended())
+            trail.close_journal()
+
+            followed = list(reader.follow(interval=0))
+            self.assertEqual([log.step for log in followed], list(range(4, 10)))
+            self.assertTrue(reader.is_ended())
+            reader.close()
+            followed_trail = reader.get_trail()
+            self.assertEqual(followed_trail[9].get_time(), 27)
+            self.assertIsInstance(followed_trail[9].get_time(), int)
+            np.testing.assert_array_equal(followed_trail.get_energy(), trail.get_energy())
+            np.testing.assert_array_equal(followed_trail[9].get_detect_map(), trail[9].get_detect_map())
+
+            # A crash in the middle of a record loses that record and the end of the journal
+            with open(path, "rb") as file:
+                data = file.read()
+            with open(path, "wb") as file:
+                file.write(data[:-TrailJournal.record.size - 20])
+            recovered, closed = TrailJournalReader.recover(path)
+            self.assertFalse(closed)
+            self.assertEqual(len(recovered), 9)
+            np.testing.assert_array_equal(recovered[8].get_known_mask(), trail[8].get_known_mask())
+
+    def test_map_layers_cut_to_known_grids(self):
+        """Test the map layers match the matplotlib hillshade, cut to the known grids and survive a save and load"""
+        rows, cols = np.mgrid[:20, :24]
+        terrain = (np.sin(rows / 4) * 30 + cols * 2).astype(np.float32)
+        layers = MapLayers(terrain, terrain.min(), terrain.max())
+        np.testing.assert_allclose(layers.hillshade,
+                                   MapLayers.light_source.hillshade(terrain, vert_exag=1, dx=1, dy=1), atol=1e-6)
+
+        known_mask = np.zeros(terrain.shape, dtype=bool)
+        self.assertEqual(len(layers.contours_within(known_mask)), 0)
+        known_mask[5:12, 3:15] = True
+        segments = layers.contours_within(known_mask)
+        self.assertTrue(0 < len(segments) < len(layers.contour_segments))
+        # Every kept segment lies within the known block, x being the column and y the row
+        self.assertTrue((segments[..., 0] >= 3).all() and (segments[..., 0] <= 14).all())
+        self.assertTrue((segments[..., 1] >= 5).all() and (segments[..., 1] <= 11).all())
+        self.assertEqual(len(layers.contours_within(np.ones(terrain.shape, dtype=bool))), len(layers.contour_segments))
+
+        frame = layers.frame_within(known_mask)
+        np.testing.assert_array_equal(frame[known_mask], layers.known_rgb[known_mask])
+        np.testing.assert_array_equal(frame[~known_mask], layers.unknown_rgb[~known_mask])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "layers.npz")
+            layers.save(path)
+            loaded = MapLayers.load(path, terrain, terrain.min(), terrain.max())
+            np.testing.assert_array_equal(loaded.frame_within(known_mask), frame)
+            np.testing.assert_array_equal(loaded.contours_within(known_mask), segments)
+            self.assertIsNone(MapLayers.load(path, terrain + 1, terrain.min(), terrain.max()))
+
+    def test_raster_frame_renderer_draws_layers_and_avatar(self):
+        """Test the NumPy frames scale the layers by whole pixels and stamp the avatar, and save what they return"""
+        terrain = np.zeros((20, 25), dtype=np.float32)
+        terrain[:, 12:] = 10
+        layers = MapLayers(terrain, terrain.min(), terrain.max())
+        renderer = RasterFrameRenderer(layers)
+        self.assertEqual(renderer.scale, 40)
+        self.assertEqual(renderer.size, (800, 1000))
+
+        known_mask = np.zeros(terrain.shape, dtype=bool)
+        known_mask[2:8, 2:8] = True
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "frames", "frame.png")
+            image = renderer.render(known_mask, [(5, 3), (5, 4), (5, 5)], path)
+            np.testing.assert_array_equal(np.asarray(Image.open(path)), image)
+
+        self.assertEqual(image.shape, (800, 1000, 3))
+        # A grid is a block of scale pixels of its layer colour, away from the trail and the contours
+        np.testing.assert_array_equal(image[3 * 40:4 * 40, 3 * 40:4 * 40], np.broadcast_to(layers.known_rgb[3, 3], (40, 40, 3)))
+        np.testing.assert_array_equal(image[15 * 40 + 20, 20 * 40 + 20], layers.unknown_rgb[15, 20])
+        # The avatar marker sits on the centre of its grid
+        np.testing.assert_array_equal(image[5 * 40 + 20, 5 * 40 + 20], [255, 0, 0])
+
+    def test_frame_renderers_return_frames_without_files(self):
+        """Test both frame renderers hand back their frame in memory when no file is saved"""
+        terrain = np.zeros((20, 25), dtype=np.float32)
+        terrain[:, 12:] = 10
+        layers = MapLayers(terrain, terrain.min(), terrain.max())
+        known_mask = np.zeros(terrain.shape, dtype=bool)
+        known_mask[2:8, 2:8] = True
+
+        renderer = FrameRenderer(layers)
+        try:
+            self.assertIsNone(renderer.render(known_mask, [(5, 4), (5, 5)]))
+            image = renderer.render(known_mask, [(5, 4), (5, 5)], return_image=True)
+        finally:
+            renderer.close()
+        raster = RasterFrameRenderer(layers).render(known_mask, [(5, 4), (5, 5)])
+        for frame in (image, raster):
+            self.assertEqual(frame.dtype, np.uint8)
+            self.assertEqual(frame.shape[2], 3)
+            # The avatar marker is drawn in pure red
+            self.assertTrue((frame == [255, 0, 0]).all(axis=-1).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import csv
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from model.avatar.tests.helpers import make_test_avatar
+from model.simulator import Simulator, Task, FrameRenderer
+
+
+def make_simulator(directory, terrain, task):
+    """Build an off-database simulator on terrain, writing its frames and map layers under directory"""
+    simulator = Simulator(database_available=False)
+    simulator.result_directory_path = os.path.join(directory, "cache")
+    simulator.archive_directory_path = os.path.join(directory, "archive")
+    simulator.map_manager.map_path = directory
+    simulator.target_map = terrain
+    simulator.target_map_name = "OutputMap"
+    simulator.map_minValue, simulator.map_maxValue = float(terrain.min()), float(terrain.max())
+    simulator.target_task = task
+    simulator.set_avatar_no_db(make_test_avatar("Output"))
+    simulator.set_brain("astar_planner")
+    simulator.set_frame_backend("numpy")
+    return simulator
+
+
+class TestSimulatorOutput(unittest.TestCase):
+
+    def setUp(self):
+        """A gentle slope crossed corner to corner"""
+        rows, cols = np.mgrid[:12, :12]
+        self.terrain = ((rows + cols) * 0.5).astype(np.float32)
+        self.task = Task(0, 0, 11, 11)
+        self.directory = tempfile.TemporaryDirectory()
+        self.simulator = make_simulator(self.directory.name, self.terrain, self.task)
+        self.published = []
+        self.simulator.set_frame_listener(lambda index, step, frame: self.published.append((index, step, frame)))
+
+    def tearDown(self):
+        if self.simulator.frame_renderer is not None:
+            self.simulator.frame_renderer.close()
+        self.directory.cleanup()
+
+    def frame_files(self):
+        names = os.listdir(self.simulator.result_directory_path)
+        return sorted((name for name in names if name.endswith(".png")), key=lambda name: int(name[14:-4]))
+
+    def test_streamed_csv_rows_match_trail(self):
+        """Test the CSV rows written while the brain runs hold every step of the trail"""
+        trail, success = self.simulator.run_streamed()
+        self.assertTrue(success)
+
+        with open(os.path.join(self.simulator.result_directory_path, "log_export.csv"), newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), len(trail))
+        self.assertEqual([int(row["log_id"]) for row in rows], list(range(len(trail))))
+        self.assertEqual([(int(row["x"]), int(row["y"])) for row in rows],
+                         list(zip(trail.get_index_x().tolist(), trail.get_index_y().tolist())))
+
+    def test_streamed_frames_thinned_with_files(self):
+        """Test thinning keeps evenly spread frame files numbered in order and publishes every frame once"""
+        self.simulator.max_image = 4
+        trail, _ = self.simulator.run_streamed(render=True)
+
+        stride = self.simulator.frame_stride
+        self.assertGreater(stride, 1)
+        self.assertEqual(self.simulator.frame_steps, list(range(0, len(trail), stride)))
+        self.assertEqual(self.frame_files(), [f"elevation_map_{index}.png" for index in range(len(self.simulator.frame_steps))])
+        self.assertEqual([index for index, _, _ in self.published], list(range(len(self.published))))
+
+        frames_by_step = {step: frame for _, step, frame in self.published}
+        for index, step in enumerate(self.simulator.frame_steps):
+            path = os.path.join(self.simulator.result_directory_path, f"elevation_map_{index}.png")
+            np.testing.assert_array_equal(np.asarray(Image.open(path)), frames_by_step[step])
+
+    def test_streamed_frames_thinned_without_files(self):
+        """Test thinning runs without frame files, also when they are turned off during the run"""
+        self.simulator.max_image = 4
+        self.simulator.set_frame_files(False)
+        self.simulator.run_streamed(render=True)
+        self.assertGreater(self.simulator.frame_stride, 1)
+        self.assertEqual(self.frame_files(), [])
+        self.assertEqual([index for index, _, _ in self.published], list(range(len(self.published))))
+
+        def turn_files_off(index, step, frame):
+            self.published.append((index, step, frame))
+            if index == 2:
+                self.simulator.set_frame_files(False)
+
+        self.published = []
+        self.simulator.set_frame_files(True)
+        self.simulator.set_frame_listener(turn_files_off)
+        self.simulator.clear_directory()
+        self.simulator.run_streamed(render=True)
+        self.assertEqual([index for index, _, _ in self.published], list(range(len(self.published))))
+        # The files of steps 0, 1 and 2 were saved before they were turned off, only step 0 stays on the final stride
+        self.assertGreater(self.simulator.frame_stride, 2)
+        self.assertEqual(self.frame_files(), ["elevation_map_0.png"])
+
+    def test_progressive_reveal_matches_cell_loop(self):
+        """Test the threshold masks of the progressive reveal against growing the reveal one grid at a time"""
+        full_map = np.arange(7 * 9, dtype=np.float32).reshape(7, 9) + 1
+        trail_known_mask = np.zeros(full_map.shape, dtype=bool)
+        trail_known_mask[0, :3] = True
+        position, expansion_steps = (5, 2), 4
+
+        reveals = list(Simulator.progressive_reveal(full_map, trail_known_mask, position, expansion_steps))
+        self.assertEqual(len(reveals), expansion_steps + 1)
+
+        height, width = full_map.shape
+        max_radius = max(np.hypot(position[0] - x, position[1] - y)
+                         for x, y in [(0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)])
+        known_mask = trail_known_mask.copy()
+        detected_map = np.where(known_mask, full_map, 0)
+        for step, (step_detected_map, step_known_mask) in enumerate(reveals):
+            current_radius = (step / expansion_steps) * max_radius
+            for i in range(height):
+                for j in range(width):
+                    if np.sqrt((i - position[0]) ** 2 + (j - position[1]) ** 2) <= current_radius:
+                        detected_map[i, j] = full_map[i, j]
+                        known_mask[i, j] = True
+
+            np.testing.assert_array_equal(step_known_mask, known_mask)
+            np.testing.assert_array_equal(step_detected_map, detected_map)
+            self.assertEqual(int(step_known_mask.sum()), int(known_mask.sum()))
+        self.assertTrue(reveals[-1][1].all())
+        # The trail's own mask is left untouched
+        self.assertEqual(int(trail_known_mask.sum()), 3)
+
+    def test_reused_figure_drops_previous_frame_artists(self):
+        """Test a frame drawn on the reused figure matches the same frame drawn on a new figure"""
+        self.simulator.set_frame_backend("matplotlib")
+        first_mask = np.zeros(self.terrain.shape, dtype=bool)
+        first_mask[:6, :6] = True
+        second_mask = np.zeros(self.terrain.shape, dtype=bool)
+        second_mask[6:, 6:] = True
+        second_positions = [(8, 8), (8, 9)]
+
+        self.simulator.plot_elevation_map(first_mask, [(0, 0), (1, 0), (1, 1), (2, 1), (2, 2)],
+                                          show_colorbar=True, return_image=True)
+        renderer = self.simulator.frame_renderer
+        artists = (len(renderer.fig.axes), len(renderer.ax.collections), len(renderer.ax.lines), len(renderer.ax.images))
+        reused = self.simulator.plot_elevation_map(second_mask, second_positions, return_image=True)
+        self.assertIs(self.simulator.frame_renderer, renderer)
+        self.assertEqual((len(renderer.fig.axes), len(renderer.ax.collections), len(renderer.ax.lines),
+                          len(renderer.ax.images)), artists)
+        self.assertEqual(len(renderer.fig.axes), 1)
+
+        fresh_renderer = FrameRenderer(self.simulator.get_map_layers(), self.task)
+        try:
+            fresh = fresh_renderer.render(second_mask, second_positions, return_image=True)
+        finally:
+            fresh_renderer.close()
+        np.testing.assert_array_equal(reused, fresh)
+
+    def render_results(self, workers):
+        """Render the frames of result_trail with workers processes and return the published and saved frames"""
+        self.published = []
+        self.simulator.clear_directory()
+        self.simulator.path_finding_counter = 0
+        self.simulator.render_workers = workers
+        self.simulator.plot_results()
+        saved = [np.asarray(Image.open(os.path.join(self.simulator.result_directory_path, name)))
+                 for name in self.frame_files()]
+        return self.published, saved
+
+    def test_pool_frames_match_serial_frames(self):
+        """Test the frame pool saves and publishes the same frames in the same order as rendering in process"""
+        self.simulator.result_trail, _ = self.simulator.run_brain()
+        self.simulator.max_image = 12
+        self.simulator.pool_frames_per_worker = 1
+
+        serial_published, serial_saved = self.render_results(1)
+        self.assertEqual(self.simulator.frame_render_stats[2], 1)
+        pool_published, pool_saved = self.render_results(3)
+        self.assertEqual(self.simulator.frame_render_stats[2], 3)
+
+        self.assertEqual(len(serial_saved), len(range(0, len(self.simulator.result_trail), 2)))
+        self.assertEqual(len(pool_saved), len(serial_saved))
+        for serial, pool in zip(serial_saved, pool_saved):
+            np.testing.assert_array_equal(pool, serial)
+        self.assertEqual([(index, step) for index, step, _ in pool_published],
+                         [(index, step) for index, step, _ in serial_published])
+        for (_, _, serial), (_, _, pool) in zip(serial_published, pool_published):
+            np.testing.assert_array_equal(pool, serial)
+
+    def test_pool_skipped_for_few_frames(self):
+        """Test runs with fewer than pool_frames_per_worker frames per worker are rendered in process"""
+        self.simulator.result_trail, _ = self.simulator.run_brain()
+        self.simulator.max_image = 12
+        self.simulator.pool_frames_per_worker = 8
+
+        _, saved = self.render_results(4)
+        self.assertEqual(self.simulator.frame_render_stats[2], 1)
+        self.assertEqual(len(saved), self.simulator.frame_render_stats[0])
+
+    def save_archives(self, max_run_archives):
+        """Save two archives renamed as older runs, then save one more run keeping max_run_archives"""
+        self.simulator.result_trail, _ = self.simulator.run_brain()
+        for index in range(2):
+            path = self.simulator.save_run_archive().get_path()
+            os.rename(path, os.path.join(self.simulator.archive_directory_path, f"20000101-00000{index}_old"))
+        self.simulator.max_run_archives = max_run_archives
+        return os.path.basename(self.simulator.save_run_archive().get_path())
+
+    def test_run_archives_pruned_to_one(self):
+        """Test keeping one run archive deletes every older archive"""
+        newest = self.save_archives(1)
+        self.assertEqual(self.simulator.get_run_archive_names(), [newest])
+
+    def test_run_archives_pruned_to_none(self):
+        """Test keeping no run archives deletes the saved archive as well"""
+        self.save_archives(0)
+        self.assertEqual(self.simulator.get_run_archive_names(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+import numpy as np
+
+from model.simulator.Log import Log
+
+
+class Trail:
+    """
+    The Logs of one run, stored as columns instead of one Log object per step.
+
+    The position, time and energy of every step are kept in growable NumPy arrays, so summaries
+    over the run are vectorized operations on get_index_x(), get_index_y(), get_time() and get_energy().
+    Indexing or iterating a Trail gives Log views of single steps.
+
+    The detect map is kept as a delta per step: the flat indices and values of the cells revealed
+    at that step, all steps sharing two flat arrays. Cells are only ever revealed, so the detect map
+    after a step is the sum of the deltas up to it. Every keyframe_interval steps a keyframe, a full
+    copy of the detect map and known mask, is kept as well: rebuilding any step copies the keyframe
+    before it and applies at most keyframe_interval - 1 deltas.
+
+    A trail given a TrailJournal also appends every recorded step to it, so the run can be
+    followed from another process and recovered after a crash.
+    """
+
+    keyframe_interval = 256
+    initial_capacity = 64
+
+    def __init__(self, shape=(0, 0), keyframe_interval=None, journal=None):
+        if keyframe_interval is not None:
+            self.keyframe_interval = keyframe_interval
+        self.shape = tuple(shape)
+        self.length = 0
+        self.journal = journal
+
+        # Step columns, with room for more steps than length. Time and energy stay integer
+        # until a non-integer value is recorded, so the values read back keep their type.
+        self.index_x = np.zeros(self.initial_capacity, dtype=np.int64)
+        self.index_y = np.zeros(self.initial_capacity, dtype=np.int64)
+        self.time = np.zeros(self.initial_capacity, dtype=np.int64)
+        self.energy = np.zeros(self.initial_capacity, dtype=np.int64)
+        # The deltas of step i are revealed_indices[delta_end[i - 1]:delta_end[i]]
+        self.delta_end = np.zeros(self.initial_capacity, dtype=np.int64)
+        self.revealed_indices = np.zeros(self.initial_capacity, dtype=np.int64)
+        self.revealed_values = np.zeros(self.initial_capacity, dtype=np.float32)
+        # Local grids of every step, built when first asked for, per size
+        self.local_grid_cache = {}
+
+        self.keyframes = []
+        self.revealed_since_keyframe = 0
+        # The detect map and known mask after the last step
+        self.detect_map = np.zeros(self.shape, dtype=np.float32)
+        self.known_mask = np.zeros(self.shape, dtype=bool)
+        # The last rebuilt step, so the detect map and known mask of one Log cost one rebuild
+        self.rebuilt_step = None
+        self.rebuilt_maps = None
+
+    @classmethod
+    def from_columns(cls, shape, keyframe_interval, index_x, index_y, time, energy, delta_end,
+                     revealed_indices, revealed_values, keyframes):
+        """
+        Return a Trail over columns saved from another trail, such as the memory-mapped arrays of a RunArchive.
+        The columns are used as they are, without copying, so the trail is for replaying rather than recording.
+        """
+        trail = cls(shape, keyframe_interval)
+        trail.length = len(index_x)
+        trail.index_x, trail.index_y, trail.time, trail.energy = index_x, index_y, time, energy
+        trail.delta_end, trail.revealed_indices, trail.revealed_values = delta_end, revealed_indices, revealed_values
+        trail.keyframes = list(keyframes)
+        if trail.length:
+            first = (trail.length - 1) - (trail.length - 1) % trail.keyframe_interval
+            np.copyto(trail.detect_map, trail.keyframes[first // trail.keyframe_interval][0])
+            np.copyto(trail.known_mask, trail.keyframes[first // trail.keyframe_interval][1])
+            trail.apply_deltas(trail.detect_map, trail.known_mask, first + 1, trail.length - 1)
+            trail.revealed_since_keyframe = int(delta_end[trail.length - 1] - delta_end[first])
+        return trail
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return (self.log_at(step) for step in range(self.length))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.log_at(step) for step in range(self.length)[index]]
+        return self.log_at(range(self.length)[index])
+
+    def get_index_x(self):
+        return self.index_x[:self.length]
+
+    def get_index_y(self):
+        return self.index_y[:self.length]
+
+    def get_time(self):
+        return self.time[:self.length]
+
+    def get_energy(self):
+        return self.energy[:self.length]
+
+    def log_at(self, step):
+        """
+        Return a Log view of step, reading its maps from the trail.
+        """
+        return Log.view(self, step, self.index_x[step].item(), self.index_y[step].item(),
+                        self.time[step].item(), self.energy[step].item())
+
+    def delta_at(self, step):
+        """
+        Return the (flat indices, values) of the cells revealed at step.
+        """
+        start = self.delta_end[step - 1] if step > 0 else 0
+        return self.revealed_indices[start:self.delta_end[step]], self.revealed_values[start:self.delta_end[step]]
+
+    @staticmethod
+    def grown(column, size):
+        """
+        Return column with room for at least size entries, doubling its capacity when it is full.
+        """
+        if size <= len(column):
+            return column
+        bigger = np.zeros(max(size, 2 * len(column)), dtype=column.dtype)
+        bigger[:len(column)] = column
+        return bigger
+
+    @staticmethod
+    def stored(column, step, value):
+        """
+        Store value at step, turning an integer column into a float column first when value is not an integer.
+        """
+        if column.dtype.kind == "i" and not isinstance(value, (int, np.integer)):
+            column = column.astype(np.float64)
+        column[step] = value
+        return column
+
+    def append(self, log):
+        """
+        Record a Log as the next step. A Log carrying a full detect map snapshot is turned into a delta.
+        """
+        revealed_indices, revealed_values = log.revealed_indices, log.revealed_values
+        if log.detect_map is not None and np.size(log.detect_map) > 0:
+            known_mask = np.asarray(log.known_mask, dtype=bool)
+            revealed_indices = np.flatnonzero(known_mask & ~self.known_mask)
+            revealed_values = np.asarray(log.detect_map).flat[revealed_indices]
+        self.record(log.index_x, log.index_y, log.time, log.energy, revealed_indices, revealed_values)
+
+    def record(self, x, y, time, energy, revealed_indices, revealed_values):
+        """
+        Record the next step: the position, time and energy, and the cells revealed since the previous step.
+        """
+        step = self.length
+        if step == len(self.index_x):
+            self.index_x, self.index_y, self.time, self.energy, self.delta_end = (
+                self.grown(column, step + 1) for column in (self.index_x, self.index_y, self.time, self.energy, self.delta_end))
+        self.index_x[step] = x
+        self.index_y[step] = y
+        self.time = self.stored(self.time, step, time)
+        self.energy = self.stored(self.energy, step, energy)
+
+        start = self.delta_end[step - 1] if step > 0 else 0
+        end = start + len(revealed_indices)
+        self.revealed_indices = self.grown(self.revealed_indices, end)
+        self.revealed_values = self.grown(self.revealed_values, end)
+        self.revealed_indices[start:end] = revealed_indices
+        self.revealed_values[start:end] = revealed_values
+        self.delta_end[step] = end
+        self.length += 1
+
+        self.detect_map.flat[revealed_indices] = revealed_values
+        self.known_mask.flat[revealed_indices] = True
+        self.revealed_since_keyframe += len(revealed_indices)
+        self.local_grid_cache.clear()
+        if self.journal is not None:
+            self.journal.write(x, y, time, energy, revealed_indices, revealed_values)
+
+        if step % self.keyframe_interval == 0:
+            if self.keyframes and self.revealed_since_keyframe == 0:
+                # Nothing changed since the previous keyframe, share it
+                self.keyframes.append(self.keyframes[-1])
+            else:
+                self.keyframes.append((self.detect_map.copy(), self.known_mask.copy()))
+            self.revealed_since_keyframe = 0
+
+    def close_journal(self):
+        """
+        Close the journal of the trail, marking the run as finished in it.
+        """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def apply_deltas(self, detect_map, known_mask, first, last):
+        """
+        Apply the deltas of the steps first to last, both included, to detect_map and known_mask.
+        """
+        start = self.delta_end[first - 1] if first > 0 else 0
+        end = self.delta_end[last] if last >= first else start
+        detect_map.flat[self.revealed_indices[start:end]] = self.revealed_values[start:end]
+        known_mask.flat[self.revealed_indices[start:end]] = True
+
+    def maps_at(self, step):
+        """
+        Rebuild the detect map and known mask after step, negative steps counting from the end.
+        :return: (detect_map, known_mask), read-only arrays.
+        """
+        step = range(self.length)[step]
+        if self.rebuilt_step != step:
+            if step == self.length - 1:
+                detect_map, known_mask = self.detect_map.copy(), self.known_mask.copy()
+            else:
+                first = step - step % self.keyframe_interval
+                detect_map, known_mask = (array.copy() for array in self.keyframes[first // self.keyframe_interval])
+                self.apply_deltas(detect_map, known_mask, first + 1, step)
+            detect_map.setflags(write=False)
+            known_mask.setflags(write=False)
+            self.rebuilt_step, self.rebuilt_maps = step, (detect_map, known_mask)
+        return self.rebuilt_maps
+
+    def iter_maps(self, steps=None):
+        """
+        Replay the detect map and known mask after each of steps, which must be increasing (every step by default).
+        Moving forward only applies the deltas in between, and a jump past a keyframe starts from it,
+        so replaying the whole trail is one pass over the deltas.
+        :return: a generator of (step, detect_map, known_mask); the arrays are reused, valid until the next step.
+        """
+        detect_map = np.zeros(self.shape, dtype=np.float32)
+        known_mask = np.zeros(self.shape, dtype=bool)
+        current = -1
+        for step in range(self.length) if steps is None else steps:
+            step = int(step)
+            if step < current:
+                raise ValueError("iter_maps needs increasing steps")
+            first = step - step % self.keyframe_interval
+            if first > current:
+                keyframe_map, keyframe_mask = self.keyframes[first // self.keyframe_interval]
+                np.copyto(detect_map, keyframe_map)
+                np.copyto(known_mask, keyframe_mask)
+                current = first
+            self.apply_deltas(detect_map, known_mask, current + 1, step)
+            current = step
+            yield step, detect_map, known_mask
+
+    def revealed_at(self):
+        """
+        Return the step each cell was revealed at as a flat array, len(self) for cells never revealed.
+        """
+        revealed_at = np.full(self.detect_map.size, self.length, dtype=np.int64)
+        delta_steps = np.repeat(np.arange(self.length), np.diff(self.delta_end[:self.length], prepend=0))
+        # A cell is revealed once; keep the first step anyway should a delta repeat it
+        revealed_at[self.revealed_indices[:len(delta_steps)][::-1]] = delta_steps[::-1]
+        return revealed_at
+
+    def position_elevations(self):
+        """
+        Return, for every step, the elevation of the grid the avatar stands on and whether it was known then.
+        A cell keeps the value it was revealed with, so this reads the final detect map once per step
+        and compares the step each position was revealed at with the step itself.
+        :return: (elevations, known) arrays; elevations are 0 where not known.
+        """
+        positions = self.get_index_x() * self.shape[1] + self.get_index_y()
+        known = self.revealed_at()[positions] <= np.arange(self.length)
+        return np.where(known, self.detect_map.ravel()[positions], 0).astype(np.float32), known
+
+    def local_grids(self, size=3):
+        """
+        Return the local grid of every step, as in Log.get_local_grid(), in one
+        (steps, width, width) array built from the final detect map and revealed_at().
+        """
+        if size not in self.local_grid_cache:
+            cells, inside = Log.grid_cells(self.shape, self.get_index_x(), self.get_index_y(), size)
+            known = inside & (self.revealed_at()[cells] <= np.arange(self.length)[:, None, None])
+            self.local_grid_cache[size] = Log.make_local_grid(self.detect_map.ravel()[cells], known, inside)
+        return self.local_grid_cache[size]
+
+    def local_grid_at(self, step, size=3):
+        """
+        Return the local grid of one step. The latest step is read from the current maps, so a consumer
+        following the run step by step does not rebuild the grids of the whole trail at every step.
+        """
+        if step == self.length - 1 and size not in self.local_grid_cache:
+            cells, inside = Log.grid_cells(self.shape, self.index_x[step:step + 1], self.index_y[step:step + 1], size)
+            known = inside & self.known_mask.ravel()[cells]
+            return Log.make_local_grid(self.detect_map.ravel()[cells], known, inside)[0]
+        return self.local_grids(size)[step]
+
+    def nbytes(self):
+        """
+        Return (bytes of the step columns, bytes of the deltas, bytes of the keyframes and current maps) held by the trail.
+        """
+        columns = sum(column.nbytes for column in (self.index_x, self.index_y, self.time, self.energy, self.delta_end))
+        deltas = self.revealed_indices.nbytes + self.revealed_values.nbytes
+        keyframes = {id(keyframe): keyframe[0].nbytes + keyframe[1].nbytes for keyframe in self.keyframes}
+        return columns, deltas, sum(keyframes.values()) + self.detect_map.nbytes + self.known_mask.nbytes
+
+    def snapshot_nbytes(self):
+        """
+        Return the bytes a full detect map and known mask copy per step would take.
+        """
+        return self.length * (self.detect_map.nbytes + self.known_mask.nbytes)
@@ -0,0 +1,160 @@
+import struct
+import time
+
+import numpy as np
+
+from model.simulator.trail import Trail
+
+
+class TrailJournal:
+    """
+    An append-only binary file the steps of a run are written to as a Trail records them,
+    so the progress of a long run survives a crash and can be followed from another process.
+
+    The file starts with a header holding the map shape. Each step is then a fixed record header
+    (flags, x, y, time, energy, number of revealed cells) followed by the flat indices and values
+    of the revealed cells. close() writes an end record. Writes go through a buffer that is flushed
+    every flush_interval steps, so a crash loses at most the last flush_interval steps; a reader
+    ignores a record cut short by the crash.
+    """
+
+    magic = b"MTRJ"
+    version = 1
+    header = struct.Struct("<4sIqq")
+    record = struct.Struct("<Bqqddq")
+    # Record flags: time and energy were integers, the record ends the journal
+    time_is_int = 1
+    energy_is_int = 2
+    end_of_journal = 128
+
+    flush_interval = 64
+
+    def __init__(self, path, shape, flush_interval=None):
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        self.path = path
+        self.shape = tuple(shape)
+        self.unflushed = 0
+        self.file = open(path, "wb", buffering=1 << 16)
+        self.file.write(self.header.pack(self.magic, self.version, *self.shape))
+        self.file.flush()
+
+    def write(self, x, y, time, energy, revealed_indices, revealed_values):
+        """
+        Append one step, flushing the buffer to the file every flush_interval steps.
+        """
+        flags = ((self.time_is_int if isinstance(time, (int, np.integer)) else 0)
+                 | (self.energy_is_int if isinstance(energy, (int, np.integer)) else 0))
+        self.file.write(self.record.pack(flags, x, y, time, energy, len(revealed_indices)))
+        self.file.write(np.ascontiguousarray(revealed_indices, dtype="<i8").tobytes())
+        self.file.write(np.ascontiguousarray(revealed_values, dtype="<f4").tobytes())
+        self.unflushed += 1
+        if self.unflushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.unflushed = 0
+
+    def close(self):
+        """
+        Write the end record and close the file; a journal that was never closed belongs to an interrupted run.
+        """
+        if self.file.closed:
+            return
+        self.file.write(self.record.pack(self.end_of_journal, 0, 0, 0, 0, 0))
+        self.file.close()
+
+
+class TrailJournalReader:
+    """
+    Rebuild the Trail of a TrailJournal, following the file while it is still being written.
+
+    poll() reads the records written since the previous call into get_trail(); a record whose bytes
+    are not all written yet is left for the next poll. follow() polls until the journal ends.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buffer = b""
+        self.trail = None
+        self.ended = False
+
+    def get_trail(self):
+        return self.trail
+
+    def is_ended(self):
+        return self.ended
+
+    def poll(self):
+        """
+        Read the complete records written since the previous call.
+        :return: the number of steps added to the trail.
+        """
+        self.buffer += self.file.read()
+        offset = 0
+        if self.trail is None:
+            if len(self.buffer) < TrailJournal.header.size:
+                return 0
+            magic, version, rows, cols = TrailJournal.header.unpack_from(self.buffer)
+            if magic != TrailJournal.magic or version != TrailJournal.version:
+                raise ValueError(f"{self.path} is not a trail journal")
+            self.trail = Trail((rows, cols))
+            offset = TrailJournal.header.size
+
+        steps = 0
+        while not self.ended and len(self.buffer) - offset >= TrailJournal.record.size:
+            flags, x, y, time_value, energy, count = TrailJournal.record.unpack_from(self.buffer, offset)
+            if flags & TrailJournal.end_of_journal:
+                self.ended = True
+                offset += TrailJournal.record.size
+                break
+            start = offset + TrailJournal.record.size
+            end = start + count * 12
+            if len(self.buffer) < end:
+                break
+            indices = np.frombuffer(self.buffer, dtype="<i8", count=count, offset=start)
+            values = np.frombuffer(self.buffer, dtype="<f4", count=count, offset=start + count * 8)
+            self.trail.record(x, y, int(time_value) if flags & TrailJournal.time_is_int else time_value,
+                              int(energy) if flags & TrailJournal.energy_is_int else energy, indices, values)
+            offset = end
+            steps += 1
+        self.buffer = self.buffer[offset:]
+        return steps
+
+    def follow(self, interval=0.1, timeout=None):
+        """
+        Yield the Log of every step as it is written, until the journal ends,
+        or until no step arrived for timeout seconds when a timeout is given.
+        """
+        last_step_time = time.monotonic()
+        while True:
+            first = len(self.trail) if self.trail is not None else 0
+            if self.poll():
+                last_step_time = time.monotonic()
+                for step in range(first, len(self.trail)):
+                    yield self.trail[step]
+            if self.ended:
+                return
+            if timeout is not None and time.monotonic() - last_step_time > timeout:
+                return
+            time.sleep(interval)
+
+    def close(self):
+        self.file.close()
+
+    @classmethod
+    def recover(cls, path):
+        """
+        Read a whole journal, such as the one of a run that crashed.
+        :return: (trail, whether the journal was closed); the trail holds every step that reached the file.
+        """
+        reader = cls(path)
+        try:
+            reader.poll()
+        finally:
+            reader.close()
+        if reader.trail is None:
+            raise ValueError(f"{path} is not a trail journal")
+        return reader.trail, reader.ended
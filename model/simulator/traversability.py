@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class TraversabilityMap:
+    """
+    Precomputed movability of every edge of the grid for one map and one slope limit.
+
+    Each direction is stored as a boolean raster with the shape of the map:
+    north[i, j] is True when the avatar standing on (i, j) can move to (i - 1, j),
+    and likewise south (i + 1, j), west (i, j - 1) and east (i, j + 1).
+    Edges leaving the map are always False.
+    """
+
+    def __init__(self, terrain, max_slope):
+        terrain = np.asarray(terrain, dtype=np.float32)
+        rows, cols = terrain.shape
+        self.shape = (rows, cols)
+        self.max_slope = max_slope
+
+        vertical = np.abs(terrain[1:, :] - terrain[:-1, :]) <= max_slope
+        horizontal = np.abs(terrain[:, 1:] - terrain[:, :-1]) <= max_slope
+
+        self.north = np.zeros((rows, cols), dtype=bool)
+        self.south = np.zeros((rows, cols), dtype=bool)
+        self.west = np.zeros((rows, cols), dtype=bool)
+        self.east = np.zeros((rows, cols), dtype=bool)
+        self.north[1:, :] = vertical
+        self.south[:-1, :] = vertical
+        self.west[:, 1:] = horizontal
+        self.east[:, :-1] = horizontal
+
+        # Look up the raster by the (dx, dy) move used in the brains
+        self.edges = {(-1, 0): self.north, (1, 0): self.south, (0, -1): self.west, (0, 1): self.east}
+
+    def can_move(self, x, y, target_x, target_y):
+        """
+        Check whether the avatar can move from (x, y) to the neighbouring grid (target_x, target_y).
+        """
+        return bool(self.edges[(target_x - x, target_y - y)][x, y])
+
+    def get_edge(self, dx, dy):
+        """
+        Return the boolean raster of the (dx, dy) move.
+        """
+        return self.edges[(dx, dy)]
+
+    def masked(self, known_mask):
+        """
+        Return the edge rasters restricted to edges whose two grids are both known.
+        :param known_mask: 2D boolean array of the revealed grids.
+        :return: dict mapping each (dx, dy) move to its masked boolean raster.
+        """
+        known_mask = np.asarray(known_mask, dtype=bool)
+        return {(dx, dy): edge & known_mask & self.shift_to_source(known_mask, dx, dy)
+                for (dx, dy), edge in self.edges.items()}
+
+    @staticmethod
+    def shift_to_source(grid, dx, dy):
+        """
+        Shift a raster so that the value at (i, j) is the one of the neighbour (i + dx, j + dy).
+        Neighbours outside the map read as False.
+        """
+        rows, cols = grid.shape
+        shifted = np.zeros_like(grid)
+        shifted[max(0, -dx):rows - max(0, dx), max(0, -dy):cols - max(0, dy)] = \
+            grid[max(0, dx):rows - max(0, -dx), max(0, dy):cols - max(0, -dy)]
+        return shifted
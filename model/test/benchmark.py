@@ -0,0 +1,428 @@
+import math
+import os
+import tempfile
+import time
+from itertools import cycle
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from matplotlib.colors import LightSource
+
+from model.avatar import Sensor, DetectionMask
+from model.avatar.tests.helpers import make_test_avatar
+from model.simulator import Environment, CostModel, TraversabilityMap, DistanceField, ReachabilityIndex, MapManager, Task, \
+    ClusterGraph, Simulator, FrameRenderer, RasterFrameRenderer, MapLayers
+from model.brain import BrainAStar, BrainAStarPlanner, BrainDial, BrainDStarLite, BrainHPAStar
+
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def generate_synthetic_terrain(size=1000, seed=0):
+    """
+    Generate a smooth random elevation map, roughly as rough as the bundled crater maps.
+    """
+    rng = np.random.default_rng(seed)
+    terrain = np.cumsum(np.cumsum(rng.normal(0, 0.2, (size, size)), axis=0), axis=1)
+    return terrain.astype(np.float32)
+
+
+def generate_obstacle_terrain(size=300, walls=60, seed=0):
+    """
+    Generate a flat map crossed by random cliff walls, so the sensors keep revealing obstacles.
+    """
+    rng = np.random.default_rng(seed)
+    terrain = np.zeros((size, size), dtype=np.float32)
+    for _ in range(walls):
+        x, y = rng.integers(0, size, 2)
+        length = rng.integers(size // 10, size // 3)
+        if rng.random() < 0.5:
+            terrain[x, y:y + length] = 100.0
+        else:
+            terrain[x:x + length, y] = 100.0
+    return terrain
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def legacy_step(terrain, avatar, x, y):
+    """
+    One brain step as it was computed before the cost model: slope check and cost of every neighbour.
+    """
+    rows, cols = terrain.shape
+    total = 0
+    for dx, dy in DIRECTIONS:
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < rows and 0 <= ny < cols and avatar.get_movable(terrain[x][y], terrain[nx][ny]):
+            base_time = avatar.calculate_time_per_grid()
+            elevation_difference = abs(terrain[x][y] - terrain[nx][ny])
+            total += math.ceil(base_time * (1 + 1.0 * (elevation_difference / 10)))
+    return total
+
+
+def model_step(traversability, cost_model, x, y):
+    """
+    The same step answered from the precomputed edge rasters.
+    """
+    total = 0
+    for dx, dy in DIRECTIONS:
+        if traversability.edges[(dx, dy)][x, y]:
+            total += cost_model.edges[(dx, dy)][x, y]
+    return total
+
+
+def benchmark_cost_model(size=1000, steps=100000):
+    terrain = generate_synthetic_terrain(size)
+    avatar = make_test_avatar("Benchmark", sensor_range=5, battery_consumption=2)
+    positions = np.random.default_rng(1).integers(0, size, (steps, 2)).tolist()
+
+    def run_legacy():
+        return sum(legacy_step(terrain, avatar, x, y) for x, y in positions)
+
+    def build_models():
+        return (TraversabilityMap(terrain, avatar.max_slope),
+                CostModel(terrain, avatar.calculate_time_per_grid()))
+
+    (traversability, cost_model), build_time = timed(build_models)
+
+    def run_model():
+        return sum(model_step(traversability, cost_model, x, y) for x, y in positions)
+
+    legacy_total, legacy_time = timed(run_legacy)
+    model_total, model_time = timed(run_model)
+    assert legacy_total == model_total, "The cost model disagrees with the legacy formula"
+
+    print(f"[cost model] {size}x{size} map, {steps} steps")
+    print(f"  legacy per-edge formula : {legacy_time / steps * 1e6:8.2f} us/step")
+    print(f"  precomputed rasters     : {model_time / steps * 1e6:8.2f} us/step "
+          f"(+ {build_time * 1000:.1f} ms one-off build)")
+
+
+def benchmark_distance_field(size=1000, queries=1000):
+    terrain = generate_synthetic_terrain(size)
+    avatar = make_test_avatar("Benchmark", sensor_range=5, battery_consumption=2)
+    traversability = TraversabilityMap(terrain, avatar.max_slope)
+    cost_model = CostModel(terrain, avatar.calculate_time_per_grid())
+
+    # Put the destination in the largest component so the field covers as much of the map as possible
+    labels = ReachabilityIndex(traversability).labels
+    destination = tuple(int(i) for i in np.argwhere(labels == np.bincount(labels.ravel()).argmax())[0])
+    field, build_time = timed(DistanceField, traversability, cost_model, *destination)
+    reachable = np.argwhere(np.isfinite(field.distances))
+    starts = reachable[np.random.default_rng(2).integers(0, len(reachable), queries)].tolist()
+
+    def answer_queries():
+        return [field.path_from(x, y) for x, y in starts]
+
+    _, query_time = timed(answer_queries)
+
+    print(f"[distance field] {size}x{size} map, {len(reachable)} grids reach the destination")
+    print(f"  reverse Dijkstra build  : {build_time * 1000:8.1f} ms (once per destination)")
+    print(f"  path from a cached field: {query_time / queries * 1000:8.3f} ms/start")
+
+
+def make_brain(brain_class, terrain, avatar, task):
+    brain = brain_class()
+    brain.set_original_map(terrain)
+    brain.set_avatar(avatar)
+    brain.set_environment(Environment())
+    brain.set_task(task)
+    brain.reset()
+    return brain
+
+
+def largest_component_task(terrain, avatar, distance):
+    """
+    Return a task inside the largest component of the terrain whose ends are about distance grids apart.
+    """
+    labels = ReachabilityIndex(TraversabilityMap(terrain, avatar.max_slope)).labels
+    cells = np.argwhere(labels == np.bincount(labels.ravel()).argmax())
+    start = cells[0]
+    end = cells[np.abs(np.abs(cells - start).sum(axis=1) - distance).argmin()]
+    return Task(int(start[0]), int(start[1]), int(end[0]), int(end[1]))
+
+
+def benchmark_dial(size=1000):
+    avatar = make_test_avatar("Benchmark", sensor_range=5, battery_consumption=2)
+    map_manager = MapManager()
+    runs = [(name, map_manager.get_mapByName(name)[0], Task(5, 5, 90, 90)) for name in map_manager.get_map_names()]
+    terrain = generate_synthetic_terrain(size)
+    # Every Log keeps a snapshot of the detect map, so the synthetic run is kept short
+    runs.append((f"synthetic {size}x{size}", terrain, largest_component_task(terrain, avatar, 100)))
+
+    print("[dial] full runs, wall time and simulated time")
+    for name, run_terrain, task in runs:
+        results = []
+        for brain_class in [BrainAStar, BrainDial]:
+            brain = make_brain(brain_class, run_terrain, avatar, task)
+            (trail, success), run_time = timed(brain.run)
+            results.append(f"{brain_class.__name__} {run_time * 1000:7.1f} ms, "
+                           f"time {trail[-1].get_time():5d}{'' if success else ' (failed)'}")
+        print(f"  {name:22s}: " + " | ".join(results))
+
+    # One plan across the fully revealed synthetic map, where the search visits the most grids
+    task = largest_component_task(terrain, avatar, size)
+    print(f"[dial] one plan on the revealed {size}x{size} map")
+    for brain_class in [BrainAStarPlanner, BrainDial]:
+        brain = make_brain(brain_class, terrain, avatar, task)
+        brain.known_mask[:] = True
+        brain.detect_map[:] = terrain
+        brain.planning_cost_lists = None
+        plan, plan_time = timed(brain.plan, task.start_row, task.start_col, task.des_row, task.des_col)
+        print(f"  {brain_class.__name__:22s}: {plan_time * 1000:8.1f} ms, {len(plan[0])} grids")
+
+
+def benchmark_dstar_lite(size=300):
+    avatar = make_test_avatar("Benchmark", sensor_range=5, battery_consumption=2)
+    terrain = generate_obstacle_terrain(size)
+    task = largest_component_task(terrain, avatar, 2 * size)
+
+    print(f"[dstar lite] full runs on a {size}x{size} map revealed by the sensors")
+    for brain_class in [BrainAStarPlanner, BrainDial, BrainDStarLite]:
+        brain = make_brain(brain_class, terrain, avatar, task)
+        replans = []
+        plan = brain.plan
+
+        def counted_plan(*args):
+            replans.append(None)
+            return plan(*args)
+
+        brain.plan = counted_plan
+        (trail, success), run_time = timed(brain.run)
+        print(f"  {brain_class.__name__:22s}: {run_time * 1000:8.1f} ms, {len(replans)} plans, "
+              f"{len(trail)} steps, time {trail[-1].get_time()}{'' if success else ' (failed)'}")
+
+
+def benchmark_hpa(map_file="1000x1000Louth_Crater_ice_mound_subPart.tif"):
+    avatar = make_test_avatar("Benchmark", sensor_range=5, battery_consumption=2)
+    map_manager = MapManager()
+    terrain = map_manager.read_tif_to_array(os.path.join(map_manager.map_path, map_file))
+    rows, cols = terrain.shape
+    task = Task(5, 5, rows - 10, cols - 10)
+    traversability = TraversabilityMap(terrain, avatar.max_slope)
+    cost_model = CostModel(terrain, avatar.calculate_time_per_grid())
+
+    cluster_graph, build_time = timed(ClusterGraph, traversability, cost_model)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clusters.npz")
+        cluster_graph.save(path)
+        _, load_time = timed(ClusterGraph.load, path, traversability, cost_model)
+
+    print(f"[hpa] {map_file}, {len(cluster_graph.node_cells)} abstract nodes")
+    print(f"  cluster graph build     : {build_time * 1000:8.1f} ms, load from disk {load_time * 1000:.1f} ms")
+    for revealed in [False, True]:
+        print(f"  one plan on the {'revealed' if revealed else 'unknown'} map")
+        for brain_class in [BrainAStarPlanner, BrainDial, BrainHPAStar]:
+            brain = make_brain(brain_class, terrain, avatar, task)
+            brain.set_cluster_graph(cluster_graph)
+            brain.planning_cost_lists = None
+            if revealed:
+                brain.known_mask[:] = True
+                brain.detect_map[:] = terrain
+            plan, plan_time = timed(brain.plan, task.start_row, task.start_col, task.des_row, task.des_col)
+            print(f"    {brain_class.__name__:20s}: {plan_time * 1000:8.1f} ms, {len(plan[0])} grids planned ahead")
+
+
+def legacy_positions(detection_range, fov, direction):
+    """
+    The detectable offsets of one sensor as generate_mask computed them before the stencil, one offset at a time.
+    """
+    positions = set()
+    for dx in range(-detection_range, detection_range + 1):
+        for dy in range(-detection_range, detection_range + 1):
+            distance = np.sqrt(dx ** 2 + dy ** 2)
+            if distance <= detection_range:
+                angle = np.degrees(np.arctan2(dy, dx)) % 360
+                min_angle = (direction - fov / 2) % 360
+                max_angle = (direction + fov / 2) % 360
+                if min_angle < max_angle:
+                    in_fov = min_angle <= angle <= max_angle
+                else:
+                    in_fov = angle >= min_angle or angle <= max_angle
+                if in_fov:
+                    positions.add((dx, dy))
+    return positions
+
+
+def benchmark_detection_mask(ranges=(5, 50, 200)):
+    print("[detection mask] generate_mask for one 360 degree sensor")
+    for detection_range in ranges:
+        sensor = Sensor(name=f"Benchmark_Range_{detection_range}", range_=detection_range, fov=360,
+                        battery_consumption=1, description="Sensor for benchmarks", direction=0,
+                        database_available=False)
+        detection_mask = DetectionMask(avatar_id=None, database_available=False)
+
+        legacy, legacy_time = timed(legacy_positions, detection_range, 360, 0)
+        DetectionMask.stencil_cache.clear()
+        _, first_time = timed(detection_mask.refresh_sensors_without_database, [sensor])
+        _, cached_time = timed(detection_mask.refresh_sensors_without_database, [sensor])
+        assert detection_mask.detectable_positions == legacy, "The stencil disagrees with the legacy loop"
+
+        print(f"  range {detection_range:4d}: legacy {legacy_time * 1000:9.2f} ms | stencil {first_time * 1000:7.2f} ms"
+              f" | cached stencil {cached_time * 1000:7.2f} ms")
+
+
+def legacy_apply_mask(detection_mask, detect_map, full_map, x, y, known_mask):
+    """
+    apply_mask as it was before the stencil: one bounds check and assignment per detectable offset.
+    """
+    rows, cols = np.shape(full_map)
+    for dx, dy in detection_mask.detectable_positions:
+        new_x, new_y = x + dx, y + dy
+        if 0 <= new_x < rows and 0 <= new_y < cols:
+            detect_map[new_x, new_y] = full_map[new_x, new_y]
+            known_mask[new_x, new_y] = True
+    return detect_map
+
+
+def benchmark_apply_mask(size=1000, steps=2000, ranges=(5, 20, 50)):
+    terrain = generate_synthetic_terrain(size)
+    # A random walk, so most steps reveal only a thin ring of new cells like in a real run
+    walk = np.cumsum(np.random.default_rng(3).integers(-1, 2, (steps, 2)), axis=0) + size // 2
+    positions = np.clip(walk, 0, size - 1).tolist()
+
+    print(f"[apply mask] {size}x{size} map, {steps} steps of a random walk")
+    for detection_range in ranges:
+        sensor = Sensor(name=f"Benchmark_Range_{detection_range}", range_=detection_range, fov=360,
+                        battery_consumption=1, description="Sensor for benchmarks", direction=0,
+                        database_available=False)
+        detection_mask = DetectionMask(avatar_id=None, database_available=False)
+        detection_mask.refresh_sensors_without_database([sensor])
+
+        def run(apply):
+            detect_map = np.zeros_like(terrain)
+            known_mask = np.zeros(terrain.shape, dtype=bool)
+            for x, y in positions:
+                apply(detect_map, terrain, x, y, known_mask)
+            return known_mask
+
+        legacy_known, legacy_time = timed(run, lambda *args: legacy_apply_mask(detection_mask, *args))
+        known, stencil_time = timed(run, detection_mask.apply_mask)
+        assert np.array_equal(legacy_known, known), "apply_mask disagrees with the legacy loop"
+
+        print(f"  range {detection_range:3d}: legacy {legacy_time / steps * 1e6:9.1f} us/step | "
+              f"stencil {stencil_time / steps * 1e6:7.1f} us/step")
+
+
+def legacy_progressive_reveal(full_map, known_mask, position, expansion_steps):
+    """
+    The reveal of Simulator.plot_full_map as it was: a distance check per grid in Python at every step.
+    """
+    known_mask = known_mask.copy()
+    detected_map = np.zeros_like(full_map, dtype=np.float32)
+    detected_map[known_mask] = full_map[known_mask]
+    height, width = full_map.shape
+    corner_coords = [(0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)]
+    max_radius = max(np.hypot(position[0] - x, position[1] - y) for x, y in corner_coords)
+    for step in range(expansion_steps + 1):
+        current_radius = (step / expansion_steps) * max_radius
+        for i in range(full_map.shape[0]):
+            for j in range(full_map.shape[1]):
+                if np.sqrt((i - position[0]) ** 2 + (j - position[1]) ** 2) <= current_radius:
+                    detected_map[i, j] = full_map[i, j]
+                    known_mask[i, j] = True
+        yield detected_map.copy(), known_mask.copy()
+
+
+def benchmark_progressive_reveal(size=1000, expansion_steps=10):
+    terrain = generate_synthetic_terrain(size)
+    known_mask = np.random.default_rng(4).random(terrain.shape) < 0.05
+    position = (size // 3, size // 5)
+
+    legacy, legacy_time = timed(lambda: list(legacy_progressive_reveal(terrain, known_mask, position, expansion_steps)))
+    reveals, threshold_time = timed(lambda: list(Simulator.progressive_reveal(terrain, known_mask, position, expansion_steps)))
+    for (legacy_map, legacy_known), (detected_map, step_known) in zip(legacy, reveals):
+        assert np.array_equal(legacy_known, step_known) and np.array_equal(legacy_map, detected_map), \
+            "progressive_reveal disagrees with the legacy loop"
+
+    print(f"[progressive reveal] {size}x{size} map, {expansion_steps + 1} steps: legacy {legacy_time:7.2f} s | "
+          f"threshold masks {threshold_time * 1000:7.2f} ms")
+
+
+def legacy_plot_elevation_map(full_map, min_value, max_value, task, elevation_data, known_mask, avatar_positions,
+                              save_path):
+    """
+    Simulator.plot_elevation_map as it was before FrameRenderer: a new figure and new artists for every frame.
+    """
+    fig, ax = plt.subplots(figsize=(10, 10), dpi=100)
+    norm = mcolors.Normalize(vmin=min_value, vmax=max_value)
+    ax.imshow(full_map, cmap='terrain', norm=norm, alpha=0.6)
+    masked_data = np.ma.masked_array(elevation_data, mask=~known_mask)
+    cmap = plt.get_cmap('terrain')
+    cmap.set_bad(alpha=0)
+    fill_value = elevation_data[known_mask].mean() if known_mask.any() else 0.0
+    hillshade = LightSource(azdeg=315, altdeg=45).hillshade(masked_data.filled(fill_value), vert_exag=1, dx=1, dy=1)
+    ax.imshow(hillshade, cmap='gray', alpha=0.5)
+    ax.imshow(masked_data, cmap=cmap, norm=norm, alpha=0.7)
+    ax.contour(masked_data, levels=15, colors='black', linewidths=0.5, alpha=0.5)
+    colors = cycle(['yellow', 'orange', 'orangered', 'red'])
+    for start_pos, end_pos in zip(avatar_positions, avatar_positions[1:]):
+        ax.plot([start_pos[1], end_pos[1]], [start_pos[0], end_pos[0]], color=next(colors), linewidth=2)
+    ax.plot(avatar_positions[-1][1], avatar_positions[-1][0], marker='>', color='red', markersize=8)
+    ax.plot(task.start_col, task.start_row, marker='o', color='green', markersize=10)
+    ax.plot(task.des_col, task.des_row, marker='s', color='blue', markersize=10)
+    ax.set_axis_off()
+    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    plt.savefig(save_path, bbox_inches='tight', pad_inches=0)
+    plt.close(fig)
+
+
+def benchmark_frame_rendering(size=100, frames=40, detection_range=5):
+    terrain = generate_synthetic_terrain(size)
+    task = Task(size // 2, size // 2, size - 1, size - 1)
+    sensor = Sensor(name="Benchmark_Frames", range_=detection_range, fov=360, battery_consumption=1,
+                    description="Sensor for benchmarks", direction=0, database_available=False)
+    detection_mask = DetectionMask(avatar_id=None, database_available=False)
+    detection_mask.refresh_sensors_without_database([sensor])
+    walk = np.cumsum(np.random.default_rng(5).integers(-1, 2, (frames * 4, 2)), axis=0) + size // 2
+    positions = [tuple(position) for position in np.clip(walk, 0, size - 1).tolist()]
+
+    # The detect map of every frame, revealed along the walk
+    detect_map = np.zeros_like(terrain)
+    known_mask = np.zeros(terrain.shape, dtype=bool)
+    frame_maps = []
+    for step, (x, y) in enumerate(positions):
+        detection_mask.apply_mask(detect_map, terrain, x, y, known_mask)
+        if step % 4 == 3:
+            frame_maps.append((detect_map.copy(), known_mask.copy(), positions[max(0, step - 6):step + 1]))
+
+    def render_legacy(directory):
+        for index, (frame_map, frame_mask, recent_positions) in enumerate(frame_maps):
+            legacy_plot_elevation_map(terrain, terrain.min(), terrain.max(), task, frame_map, frame_mask,
+                                      recent_positions, os.path.join(directory, f"elevation_map_{index}.png"))
+
+    def render(directory, renderer_class=FrameRenderer):
+        renderer = renderer_class(layers, task)
+        for index, (_, frame_mask, recent_positions) in enumerate(frame_maps):
+            renderer.render(frame_mask, recent_positions, os.path.join(directory, f"elevation_map_{index}.png"))
+        renderer.close()
+
+    layers, layers_time = timed(MapLayers, terrain, terrain.min(), terrain.max())
+    with tempfile.TemporaryDirectory() as directory:
+        _, legacy_time = timed(render_legacy, directory)
+        _, renderer_time = timed(render, directory)
+        _, raster_time = timed(render, directory, RasterFrameRenderer)
+        path = os.path.join(directory, "layers.npz")
+        layers.save(path)
+        _, load_time = timed(MapLayers.load, path, terrain, terrain.min(), terrain.max())
+
+    print(f"[frame rendering] {size}x{size} map, {frames} frames: figure per frame {frames / legacy_time:6.2f} "
+          f"frames/s | FrameRenderer {frames / renderer_time:6.2f} frames/s "
+          f"| RasterFrameRenderer {frames / raster_time:6.2f} frames/s")
+    print(f"  map layers: built in {layers_time * 1000:7.2f} ms | loaded in {load_time * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    benchmark_cost_model()
+    benchmark_distance_field()
+    benchmark_dial()
+    benchmark_dstar_lite()
+    benchmark_hpa()
+    benchmark_detection_mask()
+    benchmark_apply_mask()
+    benchmark_progressive_reveal()
+    benchmark_frame_rendering()
@@ -5,6 +5,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import QTimer, pyqtSignal
 import os
+import queue
 
 from view.CommandPromptWidget import CommandPromptWidget
 from view.MapModel import MapModel, MiniMapView, MainMapView
@@ -73,14 +74,15 @@ class MainPage(QMainWindow):
         main_widget.setLayout(main_layout)
         self.setCentralWidget(main_widget)
 
+        # Frames of the animation, queued by the Visualizer
+        self.frame_queue = None
+        self.property = None
+        self.property_name = None
+
         # Timer to update image every 100ms (10 FPS)
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_image)
         self.timer.start(100) # default animation speed is 10 FPS
-        self.pic_counter = float('inf')
-        self.update_image()
-        self.property = None
-        self.property_name = None
 
     def process_command(self, command):
         """Emit the command to Visualizer."""
@@ -91,16 +93,21 @@ class MainPage(QMainWindow):
         """Display output in the command prompt's activity log."""
         self.command_prompt.display_output(message)
 
+    def set_frame_queue(self, frame_queue: queue.Queue):
+        """Set the queue of (step, image) frames the animation is played from."""
+        self.frame_queue = frame_queue
+
     def update_image(self):
-        """Initialize the map image."""
-        cache_path = os.path.join(os.getcwd(), 'cache_directory')
-        pic_path = os.path.join(cache_path, f'elevation_map_{self.pic_counter}.png')
-        if os.path.exists(pic_path):
-            self.main_map.update_mainmap(pic_path)
-            self.display_properties(self.property_name + self.property[self.pic_counter]) if self.pic_counter < len(self.property) else None
-            self.pic_counter += 1
-        else:
-            self.pic_counter = float('inf')
+        """Show the next frame of the animation, if one is waiting in the frame queue."""
+        if self.frame_queue is None:
+            return
+        try:
+            step, image = self.frame_queue.get_nowait()
+        except queue.Empty:
+            return
+        self.main_map.show_frame(image)
+        if self.property is not None and step < len(self.property):
+            self.display_properties(self.property_name + self.property[step])
 
     def update_minimap(self, mini_map_image_path):
         """Update the map image."""
@@ -152,7 +159,6 @@ class MainPage(QMainWindow):
 
                 self.property.append(formatted)
 
-        self.pic_counter = 0
         self.property_name = ""
 
 
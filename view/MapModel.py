@@ -1,7 +1,8 @@
 import os
 
+import numpy as np
 from PyQt6.QtCore import QObject, pyqtSignal, QPointF, Qt
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem
 
 class MapModel(QObject):
@@ -133,3 +134,29 @@ class MainMapView(QGraphicsView):
             self.scene.addItem(self.background_item)
         else:
             print(f"[ERROR] Main map image not found at: {image_path}")
+
+    def frame_to_image(self, frame):
+        """
+        Build the QImage of a frame, an RGB array, over the array's memory and scale it to the main map.
+        The scaled image owns its pixels, so the frame can be released once it is returned.
+        Safe to call outside the GUI thread.
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        height, width = frame.shape[:2]
+        image = QImage(frame.data, width, height, frame.strides[0], QImage.Format.Format_RGB888)
+        return image.scaled(
+            self.main_map_width - 4, self.main_map_height - 4,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+
+    def show_frame(self, image):
+        """
+        Show a frame made by frame_to_image, replacing the pixmap of the background item.
+        """
+        pixmap = QPixmap.fromImage(image)
+        if self.background_item:
+            self.background_item.setPixmap(pixmap)
+        else:
+            self.background_item = QGraphicsPixmapItem(pixmap)
+            self.scene.addItem(self.background_item)